@@ -0,0 +1,186 @@
+"""
+网络监测数据分析与可视化 - 告警事件模块
+监控邮件的主题形如 [ALARM:115]HOST_5XX<32位十六进制监控项> / [RECOVER:115]HOST_5XX<...>，
+每个不同的主题只解析一次，得到类型、告警编号、告警类型与监控项；
+按(监控项, 告警编号)哈希分组后排序，连续的ALARM合并为一次事件（告警风暴），其后的RECOVER为恢复时间，
+事件配对、未恢复事件数随时间的变化与各监控项的平均恢复时间（MTTR）都以数组运算完成
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+# 告警邮件主题：[ALARM:n]或[RECOVER:n] + 告警类型 + 32位十六进制监控项
+ALARM_SUBJECT = re.compile(r'^\[(ALARM|RECOVER):(\d+)\]([A-Za-z0-9_]+?)([0-9a-f]{32})$')
+
+# 未恢复事件数的时间粒度
+OPEN_INCIDENTS_FREQ = '1h'
+
+# 输出的监控项个数
+TOP_HOSTS = 20
+
+
+def _empty_events():
+    return pd.DataFrame({
+        'time': pd.Series(dtype='datetime64[ns]'),
+        'recover': pd.Series(dtype=bool),
+        'alarm_id': pd.Series(dtype='int32'),
+        'alert_type': pd.Categorical(pd.Series([], dtype=str)),
+        'host': pd.Categorical(pd.Series([], dtype=str)),
+    })
+
+
+def parse_subjects(subjects):
+    """
+    解析邮件主题，每个不同的主题只做一次正则匹配
+
+    Args:
+        subjects: 主题Series
+
+    Returns:
+        DataFrame，与subjects逐行对应：kind（'ALARM'/'RECOVER'，非告警邮件为缺失值）、alarm_id、alert_type、host
+    """
+    codes, uniques = pd.factorize(subjects, use_na_sentinel=True)
+    parsed = pd.Series(np.asarray(uniques, dtype=object), dtype=object).str.extract(ALARM_SUBJECT.pattern)
+    parsed.columns = ['kind', 'alarm_id', 'alert_type', 'host']
+    # 末尾追加一行缺失值，编码-1（主题缺失）正好取到该行
+    parsed.loc[len(parsed)] = np.nan
+    return parsed.iloc[codes].reset_index(drop=True)
+
+
+def alert_events(times, subjects):
+    """
+    一块email数据中的告警邮件
+
+    Args:
+        times: 邮件时间（datetime64），时间缺失的邮件不计入
+        subjects: 邮件主题
+
+    Returns:
+        DataFrame：time、recover（是否为RECOVER）、alarm_id、alert_type（分类）、host（分类）
+    """
+    parsed = parse_subjects(subjects)
+    times = pd.Series(np.asarray(times, dtype='datetime64[ns]'))
+    valid = (parsed['kind'].notna() & times.notna()).to_numpy()
+    if not valid.any():
+        return _empty_events()
+    parsed = parsed[valid]
+    return pd.DataFrame({
+        'time': times[valid].to_numpy(),
+        'recover': (parsed['kind'] == 'RECOVER').to_numpy(),
+        'alarm_id': parsed['alarm_id'].astype('int32').to_numpy(),
+        'alert_type': pd.Categorical(parsed['alert_type'].astype(str)),
+        'host': pd.Categorical(parsed['host'].astype(str)),
+    })
+
+
+def merge_alert_events(current, part):
+    """合并两组告警邮件，分类列取类别的并集"""
+    if current is None or len(current) == 0:
+        return part if part is not None else current
+    if part is None or len(part) == 0:
+        return current
+    merged = pd.concat([current, part], ignore_index=True)
+    for column in ('alert_type', 'host'):
+        merged[column] = union_categoricals([current[column], part[column]])
+    return merged
+
+
+def pair_incidents(events):
+    """
+    将告警邮件配对为事件区间
+
+    同一(监控项, 告警编号)的邮件按时间排序后，一段连续的ALARM为一次事件（第一封的时间为开始，封数为风暴大小），
+    紧随其后的RECOVER为恢复时间；其后再出现的RECOVER（或没有先行ALARM的RECOVER）不属于任何事件
+
+    Args:
+        events: alert_events（或merge_alert_events）的结果
+
+    Returns:
+        (事件DataFrame[host, alert_type, alarm_id, start, end, alarms, duration_minutes]（未恢复的end为NaT）,
+         孤立的RECOVER封数)
+    """
+    if events is None or len(events) == 0:
+        incidents = pd.DataFrame({
+            'host': pd.Series(dtype=object), 'alert_type': pd.Series(dtype=object),
+            'alarm_id': pd.Series(dtype='int32'), 'start': pd.Series(dtype='datetime64[ns]'),
+            'end': pd.Series(dtype='datetime64[ns]'), 'alarms': pd.Series(dtype='int64'),
+            'duration_minutes': pd.Series(dtype='float64'),
+        })
+        return incidents, 0
+
+    # (监控项, 告警编号)经哈希表编码为整数键，再按键、时间排序；同一时刻ALARM排在RECOVER之前
+    host_codes = events['host'].cat.codes.to_numpy(dtype=np.int64)
+    alarm_ids = events['alarm_id'].to_numpy(dtype=np.int64)
+    keys, _ = pd.factorize(host_codes * (int(alarm_ids.max()) + 1) + alarm_ids)
+    recover = events['recover'].to_numpy()
+    times = events['time'].to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((recover, times, keys))
+    keys, recover, times = keys[order], recover[order], times[order]
+
+    same_key = np.zeros(len(keys), dtype=bool)
+    same_key[1:] = keys[1:] == keys[:-1]
+    after_alarm = np.zeros(len(keys), dtype=bool)
+    after_alarm[1:] = same_key[1:] & ~recover[:-1]
+
+    # 每段连续ALARM的第一封开始一次事件；紧接在ALARM之后的RECOVER结束该事件
+    starts = np.flatnonzero(~recover & ~after_alarm)
+    incident_of = np.cumsum(~recover & ~after_alarm) - 1
+    alarms = np.bincount(incident_of[~recover], minlength=len(starts))
+    following = starts + alarms
+    closed = following < len(keys)
+    closed[closed] = recover[following[closed]] & after_alarm[following[closed]]
+
+    end = np.full(len(starts), np.datetime64('NaT'), dtype='datetime64[ns]')
+    end[closed] = times[following[closed]]
+    rows = order[starts]
+    incidents = pd.DataFrame({
+        'host': events['host'].to_numpy()[rows].astype(object),
+        'alert_type': events['alert_type'].to_numpy()[rows].astype(object),
+        'alarm_id': events['alarm_id'].to_numpy()[rows],
+        'start': times[starts],
+        'end': end,
+        'alarms': alarms.astype(np.int64),
+    })
+    incidents['duration_minutes'] = (incidents['end'] - incidents['start']).dt.total_seconds() / 60
+    incidents = incidents.sort_values(['start', 'host', 'alarm_id'], kind='stable').reset_index(drop=True)
+    orphans = int((recover & ~after_alarm).sum())
+    return incidents, orphans
+
+
+def open_incidents(incidents, freq=OPEN_INCIDENTS_FREQ):
+    """
+    各时间点（按freq取整的时间网格）未恢复的事件数
+
+    Returns:
+        以时间为索引的Series：开始时间不晚于该时刻、且尚未恢复（或恢复时间晚于该时刻）的事件数
+    """
+    if len(incidents) == 0:
+        return pd.Series(dtype='int64')
+    last = incidents['end'].max() if incidents['end'].notna().any() else incidents['start'].max()
+    grid = pd.date_range(incidents['start'].min().floor(freq), max(last, incidents['start'].max()).ceil(freq),
+                         freq=freq)
+    points = grid.to_numpy()
+    started = np.searchsorted(np.sort(incidents['start'].to_numpy()), points, side='right')
+    ended = np.searchsorted(np.sort(incidents['end'].dropna().to_numpy()), points, side='right')
+    return pd.Series(started - ended, index=grid, name='open_incidents')
+
+
+def mttr_by_host(incidents):
+    """
+    各监控项的平均恢复时间
+
+    Returns:
+        DataFrame，以监控项为索引：incidents（事件数）、recovered（已恢复数）、alarms（告警封数）、
+        mttr_minutes（已恢复事件的平均时长），按事件数降序
+    """
+    stats = incidents.groupby('host', sort=True).agg(
+        incidents=('start', 'size'),
+        recovered=('end', 'count'),
+        alarms=('alarms', 'sum'),
+        mttr_minutes=('duration_minutes', 'mean'),
+    )
+    return stats.sort_values('incidents', ascending=False, kind='stable')
@@ -0,0 +1,200 @@
+"""
+网络监测数据分析与可视化 - 考勤一致性模块
+员工编号与其源IP（只由该员工登录或发信使用的IP）、内部邮箱对应后，login、weblog、email、tcpLog中属于员工的事件
+按(员工, 时间)排成实体时间线；每个员工日的打卡区间[checkin, checkout]（缺少签退时到当天结束）与当天整天
+各用两次searchsorted定位事件区间，得到区间内与区间外的事件数，标记不在公司（区间外或当天未签到）时的网络活动
+与打卡期间没有任何网络活动的员工日
+"""
+
+import numpy as np
+import pandas as pd
+
+from entity_features import mailbox_users, user_keys
+from entity_timeline import TIMELINE_SOURCES, EntityIndex
+from ip_index import INVALID_IP
+from log_loader import LOG_SOURCES
+
+
+# 打卡区间前后仍视为在公司的时间
+ATTENDANCE_MARGIN = pd.Timedelta(minutes=10)
+
+# 一个员工日打卡区间外的事件数达到该值时标记
+OFFSITE_THRESHOLD = 10
+
+# 各日志中对应员工编号的用户列（登录用户、发件人的内部邮箱），其余事件按源IP对应
+USER_COLUMNS = {'login': 'user', 'email': 'from'}
+
+# 一天的秒数
+DAY_SECONDS = 86400
+
+
+def _seconds(times):
+    """时间数组转换为秒（int64），NaT需由调用方事先去掉"""
+    return np.asarray(times, dtype='datetime64[ns]').astype('datetime64[s]').astype(np.int64)
+
+
+def _row_users(df, log_type, domain):
+    """各行的用户（员工编号取值空间），没有用户列或不是内部邮箱时为None"""
+    column = USER_COLUMNS.get(log_type)
+    if column is None or column not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    if log_type == 'email':
+        return mailbox_users(df[column], domain)
+    return user_keys(df[column])
+
+
+def employee_ips(frames, employees, domain):
+    """
+    员工与源IP的对应：员工以登录用户或发件人出现的记录中的源IP，被多个员工使用的IP（如网关、服务器）不对应
+
+    Args:
+        frames: 日志类型 -> DataFrame
+        employees: 员工编号（字符串）
+        domain: 内部邮件域名
+
+    Returns:
+        以源IP（uint32）为索引、员工编号为值的Series，按IP排序
+    """
+    pairs = []
+    for log_type in USER_COLUMNS:
+        df = frames.get(log_type)
+        if df is None or 'sip' not in df.columns:
+            continue
+        users = _row_users(df, log_type, domain)
+        sips = df['sip'].to_numpy()
+        valid = pd.Index(users).isin(employees) & (sips != INVALID_IP)
+        pairs.append(pd.DataFrame({'sip': sips[valid], 'employee': users[valid]}))
+    if not pairs:
+        return pd.Series(dtype=object, index=pd.Index([], dtype=np.uint32))
+    pairs = pd.concat(pairs, ignore_index=True).drop_duplicates()
+    owners = pairs.groupby('sip')['employee']
+    single = owners.transform('size') == 1
+    return pairs[single.to_numpy()].set_index('sip')['employee'].sort_index()
+
+
+def employee_events(frames, employees, owners, domain):
+    """
+    属于员工的事件：有用户列且为员工的按用户对应，否则按源IP对应（见employee_ips）
+
+    Args:
+        frames: 日志类型 -> DataFrame，只使用TIMELINE_SOURCES中的日志
+        employees: 员工编号（升序的pd.Index）
+        owners: employee_ips的结果
+
+    Returns:
+        EntityIndex，实体为employees中的员工
+    """
+    codes, seconds, sources, rows = [], [], [], []
+    for log_type in TIMELINE_SOURCES:
+        df = frames.get(log_type)
+        if df is None or LOG_SOURCES[log_type]['datetimes'][0] not in df.columns:
+            continue
+        employee = np.full(len(df), -1, dtype=np.int64)
+        if 'sip' in df.columns:
+            owner = owners.index.get_indexer(df['sip'].to_numpy())
+            matched = owner >= 0
+            employee[matched] = employees.get_indexer(owners.to_numpy()[owner[matched]])
+        by_user = employees.get_indexer(pd.Index(_row_users(df, log_type, domain)))
+        employee = np.where(by_user >= 0, by_user, employee)
+
+        times = df[LOG_SOURCES[log_type]['datetimes'][0]].to_numpy(dtype='datetime64[ns]')
+        positions = np.flatnonzero((employee >= 0) & ~np.isnat(times))
+        codes.append(employee[positions])
+        seconds.append(_seconds(times[positions]))
+        sources.append(np.full(len(positions), TIMELINE_SOURCES.index(log_type), dtype=np.int8))
+        rows.append(positions)
+
+    if not codes:
+        return EntityIndex(employees, *(np.zeros(0, dtype=np.int64) for _ in range(4)))
+    return EntityIndex(employees, np.concatenate(codes), np.concatenate(seconds),
+                       np.concatenate(sources), np.concatenate(rows).astype(np.int64))
+
+
+def checkin_intervals(checking):
+    """
+    打卡记录转换为员工日区间
+
+    Returns:
+        DataFrame：employee（字符串）、day（当天0点的秒数）、checkin、checkout（秒，打卡时间缺失时为-1），
+        同一员工日有多条记录时取最早的checkin与最晚的checkout；签到与签退各自独立，只缺签退的记录保留签到时间
+    """
+    days = pd.to_datetime(pd.Series(np.asarray(checking['day'], dtype=object)), format='%Y-%m-%d',
+                          errors='coerce').to_numpy(dtype='datetime64[ns]')
+    times = {}
+    for column in ('checkin', 'checkout'):
+        values = checking[column].to_numpy(dtype='datetime64[ns]')
+        valid = ~np.isnat(values)
+        times[column] = np.full(len(checking), -1, dtype=np.int64)
+        times[column][valid] = _seconds(values[valid])
+    intervals = pd.DataFrame({'employee': user_keys(checking['id']), **times})
+    intervals = intervals[~np.isnat(days)]
+    intervals['day'] = _seconds(days[~np.isnat(days)])
+    # 缺失的打卡时间不参与取最早/最晚
+    intervals['checkin'] = intervals['checkin'].where(intervals['checkin'] >= 0)
+    intervals['checkout'] = intervals['checkout'].where(intervals['checkout'] >= 0)
+    intervals = intervals.groupby(['employee', 'day'], sort=True).agg(checkin=('checkin', 'min'),
+                                                                      checkout=('checkout', 'max'))
+    return intervals.fillna(-1).astype(np.int64).reset_index()
+
+
+def employee_day_activity(index, intervals, margin=ATTENDANCE_MARGIN):
+    """
+    每个员工日的打卡区间与当天事件的包含关系
+
+    员工日为有打卡记录或有事件的(员工, 日期)；当天整天与打卡区间（前后扩展margin，截断到当天；
+    有签到而缺少签退时区间到当天结束）各对全部员工日一次searchsorted定位，区间内各来源的事件数由按来源的前缀和相减得到
+
+    Args:
+        index: employee_events的结果
+        intervals: checkin_intervals的结果
+        margin: 打卡区间前后仍视为在公司的时间
+
+    Returns:
+        DataFrame：employee、date、checkin、checkout（未签到/未签退为NaT）、partial（有签到但缺少签退）、
+        events（当天事件数）、inside（打卡区间内）、offsite（区间外或未签到时）与各来源的offsite_<日志>，
+        按员工、日期排序
+    """
+    event_days = pd.DataFrame({'code': index.codes, 'day': index.seconds // DAY_SECONDS * DAY_SECONDS})
+    days = pd.DataFrame({
+        'code': index.keys.get_indexer(intervals['employee']),
+        'day': intervals['day'].to_numpy(),
+        'checkin': intervals['checkin'].to_numpy(),
+        'checkout': intervals['checkout'].to_numpy(),
+    })
+    days = days[days['code'] >= 0]
+    days = days.merge(event_days.drop_duplicates(), on=['code', 'day'], how='outer', sort=True)
+    days[['checkin', 'checkout']] = days[['checkin', 'checkout']].fillna(-1)
+    codes = days['code'].to_numpy(dtype=np.int64)
+    day_start = days['day'].to_numpy(dtype=np.int64)
+    day_end = day_start + DAY_SECONDS - 1
+    # 只有没有签到的员工日视为未打卡；缺少签退的员工日区间到当天结束
+    checked = (days['checkin'] >= 0).to_numpy()
+    closed = checked & (days['checkout'] >= 0).to_numpy()
+
+    # 当天整天与打卡区间的事件区间；未打卡的员工日区间为空（下界大于上界）
+    start, end = index.locate(codes, day_start, day_end)
+    shift = int(pd.Timedelta(margin).total_seconds())
+    lower = np.where(checked, np.maximum(days['checkin'].to_numpy(dtype=np.int64) - shift, day_start), day_end + 1)
+    upper = np.where(closed, np.minimum(days['checkout'].to_numpy(dtype=np.int64) + shift, day_end), day_end)
+    inner_start, inner_end = index.locate(codes, lower, upper)
+
+    # 各来源事件数的前缀和，区间内某来源的事件数为两端前缀和之差
+    prefix = np.zeros((len(TIMELINE_SOURCES), len(index) + 1), dtype=np.int64)
+    for position in range(len(TIMELINE_SOURCES)):
+        prefix[position, 1:] = np.cumsum(index.sources == position)
+    total = prefix[:, end] - prefix[:, start]
+    inside = prefix[:, inner_end] - prefix[:, inner_start]
+
+    result = pd.DataFrame({
+        'employee': index.keys[codes],
+        'date': pd.to_datetime(day_start, unit='s'),
+        'checkin': pd.to_datetime(np.where(checked, days['checkin'], np.nan), unit='s'),
+        'checkout': pd.to_datetime(np.where(closed, days['checkout'], np.nan), unit='s'),
+        'partial': checked & ~closed,
+        'events': total.sum(axis=0),
+        'inside': inside.sum(axis=0),
+    })
+    result['offsite'] = result['events'] - result['inside']
+    for position, log_type in enumerate(TIMELINE_SOURCES):
+        result[f'offsite_{log_type}'] = total[position] - inside[position]
+    return result
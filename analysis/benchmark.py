@@ -0,0 +1,226 @@
+"""
+网络监测数据分析与可视化 - 规模基准测试模块
+用合成日志在1倍、10倍、100倍等数据量下依次运行各分析阶段，记录每个阶段的耗时与内存，
+结果写入JSON报告，可与其他版本的报告逐阶段对比
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_processor import LogDataProcessor
+from log_loader import LOG_SOURCES
+from metrics import max_rss_mb
+from sketches import DEFAULT_SKETCH_ERROR
+from synthetic_logs import SYNTHETIC_SEED, LogProfile, generate_logs, load_manifest
+
+
+# 默认测试的数据量倍数
+BENCHMARK_SCALES = [1, 10, 100]
+
+# 依次计时的阶段（LogDataProcessor的方法）
+BENCHMARK_STAGES = [
+    'load_all_data',
+    'analyze_login_security',
+    'analyze_employee_behavior',
+    'analyze_network_traffic',
+    'analyze_traffic_graph',
+    'analyze_alert_incidents',
+    'score_entity_behavior',
+    'check_attendance',
+    'detect_security_threats',
+    'correlate_threats',
+    'generate_visualization_data',
+]
+
+# 报告格式版本，字段变化时递增
+REPORT_VERSION = 1
+
+
+def prepare_data(profile, work_dir, scale, seed):
+    """生成某个倍数的合成日志，已有相同参数的生成结果时直接复用"""
+    data_dir = Path(work_dir) / f'x{scale}'
+    manifest = load_manifest(data_dir)
+    if manifest is not None and manifest['scale'] == scale and manifest['seed'] == seed \
+            and manifest['source'] == str(profile.data_dir):
+        return data_dir, manifest
+    return data_dir, generate_logs(profile, data_dir, scale, seed)
+
+
+def benchmark_stages(data_dir, memory=True, **options):
+    """
+    在data_dir上依次运行各阶段并计时
+
+    Args:
+        data_dir: 日志数据目录
+        memory: 是否用tracemalloc记录各阶段的内存分配峰值（会增加耗时；只包含Python与numpy的分配，
+            Arrow字符串列等由其他分配器管理的内存由load_all_data的dataframe_mb与max_rss_mb反映）
+        options: 传给LogDataProcessor的其他参数
+
+    Returns:
+        dict: 阶段名称 -> {'seconds', 'peak_mb', 'retained_mb', 'max_rss_mb'}，
+              load_all_data另有加载后各类日志DataFrame的总内存dataframe_mb
+    """
+    processor = LogDataProcessor(data_dir, **options)
+    stages = {}
+    if memory:
+        tracemalloc.start()
+    try:
+        for name in BENCHMARK_STAGES:
+            if memory:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            # 各阶段的打印输出不计入报告
+            with contextlib.redirect_stdout(io.StringIO()):
+                getattr(processor, name)()
+            stage = {'seconds': time.perf_counter() - start}
+            if memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stage['peak_mb'] = (peak - before) / 1024**2
+                stage['retained_mb'] = (current - before) / 1024**2
+            stage['max_rss_mb'] = max_rss_mb()
+            if name == 'load_all_data':
+                stage['dataframe_mb'] = sum(
+                    getattr(processor, source['attr']).memory_usage(deep=True).sum()
+                    for source in LOG_SOURCES.values()
+                ) / 1024**2
+            stages[name] = stage
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return stages
+
+
+def run_benchmark(source_dir, work_dir, scales=BENCHMARK_SCALES, seed=SYNTHETIC_SEED, memory=True, **options):
+    """
+    在各数据量倍数下生成合成日志并运行基准测试
+
+    分析结果写入work_dir下的output目录（每个倍数覆盖上一次），缓存写入work_dir下的cache目录
+
+    Args:
+        source_dir: 样例数据目录
+        work_dir: 合成日志与分析输出的工作目录
+        scales: 数据量倍数列表
+        seed: 合成日志的随机种子
+        memory: 是否记录各阶段的内存分配峰值
+        options: 传给LogDataProcessor的其他参数
+
+    Returns:
+        dict: 基准测试报告
+    """
+    work_dir = Path(work_dir).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    profile = LogProfile(source_dir)
+
+    report = {
+        'version': REPORT_VERSION,
+        'created': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'seed': seed,
+        'options': {key: str(value) for key, value in options.items()},
+        'scales': [],
+    }
+
+    for scale in scales:
+        print(f"\n=== {scale} 倍数据量 ===")
+        data_dir, manifest = prepare_data(profile, work_dir, scale, seed)
+        print(f"合成日志: {sum(manifest['rows'].values())} 行，{manifest['bytes'] / (1024**2):.1f} MB")
+
+        stages = benchmark_stages(data_dir, memory=memory, output_dir=work_dir / 'output', **options)
+        for name, stage in stages.items():
+            line = f"  {name}: {stage['seconds']:.2f} 秒"
+            if memory:
+                line += f"，分配峰值 {stage['peak_mb']:.1f} MB"
+            if 'dataframe_mb' in stage:
+                line += f"，DataFrame {stage['dataframe_mb']:.1f} MB"
+            print(line)
+
+        report['scales'].append({
+            'scale': scale,
+            'rows': manifest['rows'],
+            'bytes': manifest['bytes'],
+            'total_seconds': sum(stage['seconds'] for stage in stages.values()),
+            'stages': stages,
+        })
+
+    return report
+
+
+def compare_reports(baseline, current):
+    """
+    逐倍数、逐阶段对比两份报告的耗时与内存
+
+    Returns:
+        list: 每项为{'scale', 'stage', 'seconds', 'baseline_seconds', 'ratio', 'peak_mb', 'baseline_peak_mb'}
+    """
+    baseline_scales = {entry['scale']: entry for entry in baseline['scales']}
+    rows = []
+    for entry in current['scales']:
+        base = baseline_scales.get(entry['scale'])
+        if base is None:
+            continue
+        for name, stage in entry['stages'].items():
+            base_stage = base['stages'].get(name)
+            if base_stage is None:
+                continue
+            rows.append({
+                'scale': entry['scale'],
+                'stage': name,
+                'seconds': stage['seconds'],
+                'baseline_seconds': base_stage['seconds'],
+                'ratio': stage['seconds'] / base_stage['seconds'] if base_stage['seconds'] > 0 else None,
+                'peak_mb': stage.get('peak_mb'),
+                'baseline_peak_mb': base_stage.get('peak_mb'),
+            })
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='网络监测数据分析系统 - 规模基准测试')
+    parser.add_argument('--source', default=str(Path(__file__).parent.parent / '选题二——企业日志数据'),
+                        help='合成日志的样例数据目录')
+    parser.add_argument('--work-dir', default='benchmark', help='合成日志与分析输出的工作目录')
+    parser.add_argument('--scales', type=int, nargs='+', default=BENCHMARK_SCALES, help='数据量倍数')
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED, help='合成日志的随机种子')
+    parser.add_argument('--output', default='benchmark_report.json', help='报告文件路径')
+    parser.add_argument('--compare', default=None, help='与之对比的旧报告路径')
+    parser.add_argument('--no-memory', action='store_true', help='不记录内存分配峰值（计时不受tracemalloc影响）')
+    parser.add_argument('--cache', action='store_true', help='使用列式缓存（默认每次解析CSV）')
+    parser.add_argument('--streaming', action='store_true', help='流式模式')
+    parser.add_argument('--sketch', action='store_true', help='近似模式')
+    parser.add_argument('--workers', type=int, default=None, help='并行加载文件的工作数')
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.source, args.work_dir, scales=args.scales, seed=args.seed, memory=not args.no_memory,
+        use_cache=args.cache, streaming=args.streaming, max_workers=args.workers,
+        sketch_error=DEFAULT_SKETCH_ERROR if args.sketch else None
+    )
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n基准测试报告已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n与 {args.compare} 对比（耗时倍数 = 当前 / 旧报告）:")
+        for row in compare_reports(baseline, report):
+            ratio = f"{row['ratio']:.2f}x" if row['ratio'] is not None else '-'
+            print(f"  {row['scale']}倍 {row['stage']}: {row['baseline_seconds']:.2f} -> {row['seconds']:.2f} 秒 ({ratio})")
@@ -9,225 +9,408 @@ from datetime import datetime, timedelta
 import os
 import json
 from pathlib import Path
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import warnings
 warnings.filterwarnings('ignore')
 
+from log_cache import ColumnarCache
+from alert_incidents import TOP_HOSTS, mttr_by_host, open_incidents, pair_incidents
+from attendance import (ATTENDANCE_MARGIN, OFFSITE_THRESHOLD, checkin_intervals, employee_day_activity,
+                        employee_events, employee_ips)
+from dataset_catalog import CATALOG_NAME, DatasetCatalog, file_stats, merge_stats
+from entity_features import (ANOMALY_THRESHOLD, BASELINE_DAYS, BASELINE_METHODS, FEATURES, TOP_ANOMALIES,
+                             FeatureMatrix, entity_day_anomalies, load_scores)
+from entity_timeline import CONTEXT_EVENTS, CONTEXT_WINDOW, EntityTimeline
+from host_classifier import DEFAULT_HOST_CLASSIFIER, HostClassifier
+from log_loader import DATETIME_FORMAT, LOG_SOURCES, load_log_file, iter_log_csv, apply_categories, empty_log_frame
+from streaming import INTERNAL_EMAIL_DOMAIN, error_bounds, make_accumulator
+from sketches import DEFAULT_SKETCH_ERROR
+from partial_store import PartialStore
+from ip_index import decode_index, decode_ips, encode_ips, subnet_rollup
+from window_detection import BRUTE_FORCE_THRESHOLD, BRUTE_FORCE_WINDOW, NIGHT_THRESHOLD, NIGHT_WINDOW, window_label
+from pipeline import Stage, StageScheduler
+from metrics import RunMetrics, measure_call
+from threat_detectors import THREAT_DETECTORS, combine_detections, run_detectors
+from traffic_graph import GRAPH_SOURCES, TrafficGraph, merge_edges
+from viz_export import (CHART_BUDGETS, DEFAULT_RESOLUTION, VIZ_FORMATS, downsample, time_labels, topology,
+                        write_visualization)
+
 
 class LogDataProcessor:
     """企业日志数据处理器"""
     
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, output_dir='output', use_cache=True, rebuild_cache=False,
+                 max_workers=None, executor='thread', streaming=False, chunksize=100000,
+                 incremental=False, sketch_error=None,
+                 brute_force_threshold=BRUTE_FORCE_THRESHOLD, brute_force_window=BRUTE_FORCE_WINDOW,
+                 night_threshold=NIGHT_THRESHOLD, night_window=NIGHT_WINDOW,
+                 stage_workers=None, trace_memory=False, profile_stages=False, prometheus_file=None,
+                 viz_formats=('json',), viz_resolution=DEFAULT_RESOLUTION,
+                 graph_sources=('tcplog',), graph_weight='bytes',
+                 start_date=None, end_date=None, log_types=None, context_window=CONTEXT_WINDOW,
+                 baseline_days=BASELINE_DAYS, baseline_method='mad', attendance_margin=ATTENDANCE_MARGIN,
+                 host_rules=None):
         """
         初始化数据处理器
         
         Args:
             data_dir: 数据目录路径
+            output_dir: 分析结果的输出目录；列式缓存、分区目录与增量聚合状态保存在与其同级的cache目录
+            use_cache: 是否使用列式缓存
+            rebuild_cache: 是否忽略已有缓存并重新解析全部CSV
+            max_workers: 并行加载文件的工作线程/进程数，None表示CPU核数
+            executor: 并行方式，'thread'使用线程池，'process'使用进程池
+            streaming: 流式模式，tcpLog与weblog按块读取并只保留聚合结果
+            chunksize: 流式模式下每块读取的行数
+            incremental: 增量模式，按天存储可合并的聚合状态，只重新计算源文件有变化的日期
+            sketch_error: 近似模式的误差参数，None表示精确统计；近似模式下TOP N与流量分位数由
+                可合并的草图估计，JSON中给出每个近似值的误差上界
+            brute_force_threshold: 暴力破解检测的窗口内登录失败次数阈值
+            brute_force_window: 暴力破解检测的时间窗口（pd.Timedelta）
+            night_threshold: 凌晨登录检测的窗口内登录次数阈值
+            night_window: 凌晨登录检测的时间窗口（pd.Timedelta）
+            stage_workers: 并发执行分析阶段的线程数，None表示CPU核数，1表示按顺序执行
+            trace_memory: 是否用tracemalloc记录每个阶段的内存分配峰值（各阶段改为按顺序执行）
+            profile_stages: 是否对每个阶段做cProfile分析，结果保存到output/profiles（各阶段改为按顺序执行）
+            prometheus_file: 另外写出Prometheus文本格式指标的文件路径，None表示不写出
+            viz_formats: 可视化数据的导出格式（VIZ_FORMATS），json总是写出
+            viz_resolution: 可视化数据中流量时间序列的粒度，如'1h'、'1D'
+            graph_sources: 参与构建流量图的日志（GRAPH_SOURCES），默认只用tcpLog
+            graph_weight: 流量图PageRank的边权，'bytes'（流量字节数）或'flows'（连接数）
+            start_date: 只分析该日期（包含）及以后的日期分区，'YYYY-MM-DD'，None表示不限
+            end_date: 只分析该日期（包含）及以前的日期分区，None表示不限
+            log_types: 只加载这些日志类型（LOG_SOURCES），None表示全部；其余日志按空表分析
+            context_window: 威胁关联时在威胁时段前后扩展的时间（pd.Timedelta）
+            baseline_days: 实体行为基线的天数（每个实体日与之前该天数内的同类日期比较）
+            baseline_method: 实体行为基线方法（BASELINE_METHODS），'mad'或'zscore'
+            attendance_margin: 考勤一致性检查时打卡区间前后仍视为在公司的时间（pd.Timedelta）
+            host_rules: 外部网站与网站分类规则表的JSON文件（见HostClassifier.from_json），None表示默认规则表
         """
         self.data_dir = Path(data_dir)
-        self.output_dir = Path('output')
-        self.output_dir.mkdir(exist_ok=True)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = self.output_dir.parent / 'cache'
+        self.cache = ColumnarCache(self.cache_dir, enabled=use_cache, rebuild=rebuild_cache)
+        # 数据目录下的日期分区（构造时扫描一次），加载时按日期范围与日志类型筛选
+        self.catalog = DatasetCatalog(self.data_dir, self.cache_dir / CATALOG_NAME)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.log_types = [log_type for log_type in LOG_SOURCES if log_types is None or log_type in log_types]
+        self.partitions = []
+        # 整表加载的各类日志按源IP与用户建立的实体时间线，加载后建立
+        self.timeline = None
+        self.context_window = context_window
+        self.baseline_days = baseline_days
+        self.baseline_method = baseline_method
+        self.attendance_margin = attendance_margin
+        self.host_rules = host_rules
+        self.host_classifier = HostClassifier.from_json(host_rules) if host_rules else DEFAULT_HOST_CLASSIFIER
+        self.max_workers = max_workers
+        self.executor = executor
+        self.streaming = streaming
+        self.chunksize = chunksize
         
+        # 各类日志的聚合状态，流式/增量模式下在加载时累积，否则在分析时由整表生成
+        self.aggregates = {}
+        self.incremental = incremental
+        self.sketch_error = sketch_error
+        self.brute_force_threshold = brute_force_threshold
+        self.brute_force_window = brute_force_window
+        self.night_threshold = night_threshold
+        self.night_window = night_window
+        # 登录明细事件只保留暴力破解与凌晨登录检测仍可能用到的部分
+        self.burst_limits = {
+            'failure_events': (brute_force_threshold, brute_force_window),
+            'night_events': (night_threshold, night_window),
+        }
+        self.stage_workers = stage_workers
+        # 上次运行各分析阶段的耗时（秒）
+        self.stage_timings = {}
+        self.trace_memory = trace_memory
+        self.profile_stages = profile_stages
+        self.prometheus_file = prometheus_file
+        self.viz_formats = viz_formats
+        self.viz_resolution = viz_resolution
+        self.graph_sources = list(graph_sources)
+        self.graph_weight = graph_weight
+        # 各阶段与每个文件读取的运行指标，每次run_full_analysis重新开始记录
+        self.metrics = self._new_metrics()
+        self.partial_store = PartialStore(
+            self.cache_dir / 'partials', enabled=incremental, rebuild=rebuild_cache,
+            options={'sketch_error': sketch_error, 'log_types': self.log_types,
+                     'host_rules': self.host_classifier.to_dict(), 'burst_limits': self.burst_limits}
+        )
+    
+    def _new_metrics(self):
+        profile_dir = self.output_dir / 'profiles' if self.profile_stages else None
+        return RunMetrics(trace_memory=self.trace_memory, profile_dir=profile_dir)
+    
+    def _make_executor(self):
+        """创建文件加载使用的线程池或进程池"""
+        if self.executor == 'process':
+            return ProcessPoolExecutor(max_workers=self.max_workers)
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+    
+    def _stream_log_file(self, path, log_type):
+        """流式模式下按块读取单个文件并累积到新的聚合状态，同时得到文件统计（见file_stats）"""
+        accumulator = make_accumulator(log_type, self.sketch_error, self.host_classifier, self.burst_limits)
+        stats = None
+        for chunk in iter_log_csv(path, log_type, self.chunksize):
+            accumulator.update(chunk)
+            stats = merge_stats(stats, file_stats(chunk, log_type))
+        return accumulator, stats
+    
+    def _merge_aggregates(self, day_aggregates):
+        """将一天的聚合状态按日期顺序合并到总体聚合状态"""
+        for log_type, accumulator in day_aggregates.items():
+            if log_type in self.aggregates:
+                self.aggregates[log_type].merge(accumulator)
+            else:
+                self.aggregates[log_type] = accumulator
+    
+    def _summary(self, log_type):
+        """某类日志的聚合统计结果，整表模式下首次调用时由已加载的数据生成"""
+        if log_type not in self.aggregates:
+            df = getattr(self, LOG_SOURCES[log_type]['attr'])
+            self.aggregates[log_type] = make_accumulator(log_type, self.sketch_error, self.host_classifier, self.burst_limits).update(df)
+        return self.aggregates[log_type].summary()
+    
     def load_all_data(self):
-        """加载所有30天的数据"""
+        """加载日期范围内全部分区中所选类型的日志"""
         print("开始加载数据...")
         
-        login_data = []
-        weblog_data = []
-        tcplog_data = []
-        email_data = []
-        checking_data = []
+        frames = {log_type: [] for log_type in LOG_SOURCES}
+        self.aggregates = {}
+        
+        # 流式模式下tcpLog与weblog不整表加载，增量模式下所有日志只保留按天的聚合状态
+        streamed = ('tcplog', 'weblog') if self.streaming else ()
+        aggregated = set(LOG_SOURCES) if self.incremental else set(streamed)
+        
+        # 按日期范围与日志类型筛选日期分区，只读取选中分区中所选类型的文件
+        day_dirs = self.catalog.select(self.start_date, self.end_date, self.log_types)
+        self.partitions = day_dirs
+        if len(day_dirs) < len(self.catalog.partitions) or len(self.log_types) < len(LOG_SOURCES):
+            print(f"选中 {len(day_dirs)}/{len(self.catalog.partitions)} 个日期分区，"
+                  f"日志类型: {', '.join(self.log_types)}")
+        
+        # 增量模式下源文件未变化的日期直接复用已存储的聚合状态
+        stored = {}
+        if self.incremental:
+            for date_str, day_dir in day_dirs:
+                partial = self.partial_store.load(date_str, day_dir)
+                if partial is not None:
+                    stored[date_str] = partial
         
-        # 遍历所有日期文件夹
-        for day in range(1, 31):
-            date_str = f"2017-11-{day:02d}"
-            day_dir = self.data_dir / date_str
+        with self._make_executor() as pool:
+            # 提交所有(日期, 日志类型)加载任务
+            tasks = {}
+            for date_str, day_dir in day_dirs:
+                if date_str in stored:
+                    continue
+                for log_type in self.log_types:
+                    source = LOG_SOURCES[log_type]
+                    if log_type in streamed:
+                        continue
+                    path = day_dir / source['file']
+                    key, cache_file, cache_entry = self.cache.plan(path)
+                    future = pool.submit(measure_call, load_log_file, path, log_type, cache_file, cache_entry)
+                    tasks[(date_str, log_type)] = (key, cache_file, future)
             
-            if not day_dir.exists():
-                continue
+            # 按日期顺序收集结果，保持与逐个加载相同的输出
+            for date_str, day_dir in day_dirs:
+                print(f"加载 {date_str} 数据...")
                 
-            print(f"加载 {date_str} 数据...")
-            
-            # 加载各类日志
-            try:
-                login_df = pd.read_csv(day_dir / 'login.csv', encoding='utf-8')
-                login_data.append(login_df)
-            except Exception as e:
-                print(f"  Login数据加载失败: {e}")
-            
-            try:
-                weblog_df = pd.read_csv(day_dir / 'weblog.csv', encoding='utf-8')
-                weblog_data.append(weblog_df)
-            except Exception as e:
-                print(f"  Weblog数据加载失败: {e}")
-            
-            try:
-                tcplog_df = pd.read_csv(day_dir / 'tcpLog.csv', encoding='utf-8')
-                tcplog_data.append(tcplog_df)
-            except Exception as e:
-                print(f"  Tcplog数据加载失败: {e}")
-            
-            try:
-                email_df = pd.read_csv(day_dir / 'email.csv', encoding='gbk')
-                email_data.append(email_df)
-            except Exception as e:
-                print(f"  Email数据加载失败: {e}")
-            
-            try:
-                checking_df = pd.read_csv(day_dir / 'checking.csv', encoding='utf-8')
-                checking_data.append(checking_df)
-            except Exception as e:
-                print(f"  Checking数据加载失败: {e}")
+                if date_str in stored:
+                    partial = stored[date_str]
+                    for message in partial['errors']:
+                        print(message)
+                    print(f"  复用已存储的当日聚合")
+                    self._merge_aggregates(partial['aggregates'])
+                    continue
+                
+                cache_status = []
+                errors = []
+                day_aggregates = {}
+                
+                for log_type in self.log_types:
+                    source = LOG_SOURCES[log_type]
+                    try:
+                        if log_type in streamed:
+                            (accumulator, stats), timing = measure_call(
+                                self._stream_log_file, day_dir / source['file'], log_type
+                            )
+                            self.metrics.record_file(date_str, log_type, source['file'], timing, accumulator.rows)
+                            if stats is not None:
+                                self.catalog.record(date_str, log_type, stats)
+                            day_aggregates[log_type] = accumulator
+                            continue
+                        
+                        key, cache_file, future = tasks[(date_str, log_type)]
+                        (df, fingerprint, hit), timing = future.result()
+                    except Exception as e:
+                        errors.append(f"  {source['label']}数据加载失败: {e}")
+                        print(errors[-1])
+                        continue
+                    
+                    self.metrics.record_file(date_str, log_type, source['file'], timing, len(df), hit)
+                    self.catalog.record(date_str, log_type, file_stats(df, log_type))
+                    self.cache.record(key, cache_file, fingerprint, hit)
+                    cache_status.append(f"{source['file']}={'命中' if hit else '未命中'}")
+                    if log_type in aggregated:
+                        day_aggregates[log_type] = make_accumulator(log_type, self.sketch_error, self.host_classifier, self.burst_limits).update(df)
+                    else:
+                        frames[log_type].append(df)
+                
+                if self.cache.enabled and cache_status:
+                    print(f"  缓存: {' '.join(cache_status)}")
+                
+                if self.incremental:
+                    self.partial_store.save(date_str, day_dir, day_aggregates, errors)
+                self._merge_aggregates(day_aggregates)
+        
+        self.cache.save_manifest()
+        self.catalog.save()
+        if self.cache.enabled:
+            print(f"缓存命中 {self.cache.hits} 个文件，重新解析 {self.cache.misses} 个文件")
+        if self.incremental:
+            print(f"复用 {len(stored)} 天的已存储聚合，重新计算 {len(day_dirs) - len(stored)} 天")
         
         # 合并数据
-        self.login_df = pd.concat(login_data, ignore_index=True) if login_data else pd.DataFrame()
-        self.weblog_df = pd.concat(weblog_data, ignore_index=True) if weblog_data else pd.DataFrame()
-        self.tcplog_df = pd.concat(tcplog_data, ignore_index=True) if tcplog_data else pd.DataFrame()
-        self.email_df = pd.concat(email_data, ignore_index=True) if email_data else pd.DataFrame()
-        self.checking_df = pd.concat(checking_data, ignore_index=True) if checking_data else pd.DataFrame()
+        for log_type, source in LOG_SOURCES.items():
+            data = frames[log_type]
+            df = pd.concat(data, ignore_index=True) if data else pd.DataFrame()
+            setattr(self, source['attr'], apply_categories(df, log_type))
         
         print(f"\n数据加载完成:")
-        print(f"  Login记录: {len(self.login_df)}")
-        print(f"  Weblog记录: {len(self.weblog_df)}")
-        print(f"  Tcplog记录: {len(self.tcplog_df)}")
-        print(f"  Email记录: {len(self.email_df)}")
-        print(f"  Checking记录: {len(self.checking_df)}")
+        for log_type, source in LOG_SOURCES.items():
+            if log_type not in self.log_types:
+                print(f"  {source['label']}记录: 未选择")
+            elif log_type in aggregated:
+                rows = self.aggregates[log_type].rows if log_type in self.aggregates else 0
+                print(f"  {source['label']}记录: {rows} (聚合)")
+            else:
+                print(f"  {source['label']}记录: {len(getattr(self, source['attr']))}")
+        
+        # 整表加载的各类日志按列的内存占用，写入run_metrics.json的frames
+        self.metrics.record_frames({
+            log_type: getattr(self, source['attr'])
+            for log_type, source in LOG_SOURCES.items() if log_type in self.log_types and log_type not in aggregated
+        })
+        if self.metrics.frames:
+            print(f"\n内存占用:")
+            for log_type, frame in self.metrics.frames.items():
+                per_row = f"，每行 {frame['bytes_per_row']:.0f} 字节" if frame['bytes_per_row'] else ""
+                print(f"  {LOG_SOURCES[log_type]['label']}: {frame['total_mb']:.2f} MB{per_row}")
+        
+        # 实体时间线只包含整表加载的日志（流式/增量模式下聚合的日志没有逐行记录）
+        self.timeline = EntityTimeline({
+            log_type: getattr(self, LOG_SOURCES[log_type]['attr'])
+            for log_type in self.log_types if log_type not in aggregated
+        })
+        print(f"\n实体时间线: 源IP {len(self.timeline.index['sip'])} 个事件（{len(self.timeline.index['sip'].keys)} 个IP），"
+              f"用户 {len(self.timeline.index['user'])} 个事件（{len(self.timeline.index['user'].keys)} 个用户）")
         
         return self
     
-    def analyze_login_security(self):
-        """分析登录安全问题"""
+    def analyze_login_security(self, login=None):
+        """
+        分析登录安全问题
+        
+        Args:
+            login: 登录日志的聚合统计，None表示由当前数据生成（其他分析方法同）
+        """
         print("\n=== 分析1: 登录安全态势 ===")
         
+        if login is None:
+            login = self._summary('login')
+        
         # 1. 登录失败率分析
-        login_stats = self.login_df.groupby('state').size()
-        total_logins = len(self.login_df)
-        error_rate = login_stats.get('error', 0) / total_logins if total_logins > 0 else 0
+        total_logins = login['total_logins']
+        error_rate = login['error_logins'] / total_logins if total_logins > 0 else 0
         
         print(f"总登录次数: {total_logins}")
-        print(f"成功登录: {login_stats.get('success', 0)}")
-        print(f"失败登录: {login_stats.get('error', 0)}")
+        print(f"成功登录: {login['success_logins']}")
+        print(f"失败登录: {login['error_logins']}")
         print(f"失败率: {error_rate:.2%}")
         
         # 2. 异常登录行为检测 - 高频失败用户
-        if 'user' in self.login_df.columns:
-            error_logins = self.login_df[self.login_df['state'] == 'error']
-            user_errors = error_logins.groupby('user').size().sort_values(ascending=False)
+        if login['has_user']:
+            user_errors = login['user_errors'].sort_values(ascending=False)
             
             print(f"\n登录失败次数TOP10用户:")
             for user, count in user_errors.head(10).items():
                 print(f"  用户 {user}: {count} 次失败")
         
         # 3. 协议使用分析
-        proto_stats = self.login_df.groupby('proto').agg({
-            'state': lambda x: (x == 'error').sum(),
-            'user': 'count'
-        }).rename(columns={'state': 'errors', 'user': 'total'})
-        proto_stats['error_rate'] = proto_stats['errors'] / proto_stats['total']
+        proto_stats = login['proto_stats']
         
         print(f"\n各协议登录统计:")
         print(proto_stats)
         
-        # 4. 时间分布分析
-        if 'time' in self.login_df.columns:
-            self.login_df['datetime'] = pd.to_datetime(self.login_df['time'])
-            self.login_df['hour'] = self.login_df['datetime'].dt.hour
-            self.login_df['date'] = self.login_df['datetime'].dt.date
-            
-            # 非工作时间登录（可疑）
-            non_work_hours = self.login_df[
-                (self.login_df['hour'] < 7) | (self.login_df['hour'] > 22)
-            ]
-            print(f"\n非工作时间登录次数: {len(non_work_hours)} ({len(non_work_hours)/total_logins:.2%})")
+        # 4. 时间分布分析 - 非工作时间登录（可疑）
+        if login['has_time']:
+            non_work_hours = login['non_work_hours']
+            print(f"\n非工作时间登录次数: {non_work_hours} ({non_work_hours/total_logins:.2%})")
         
         # 保存结果
         result = {
             'total_logins': int(total_logins),
-            'success_logins': int(login_stats.get('success', 0)),
-            'error_logins': int(login_stats.get('error', 0)),
+            'success_logins': int(login['success_logins']),
+            'error_logins': int(login['error_logins']),
             'error_rate': float(error_rate),
-            'protocol_stats': proto_stats.to_dict('index'),
-            'top_error_users': user_errors.head(20).to_dict() if 'user' in self.login_df.columns else {}
+            'protocol_stats': proto_stats.to_dict('index') if proto_stats is not None else {},
+            'top_error_users': user_errors.head(20).to_dict() if login['has_user'] else {}
         }
+        if login['has_user'] and 'user_errors' in login['sketches']:
+            result['top_error_users_error'] = error_bounds(
+                login, 'user_errors', user_errors.head(20)
+            ).to_dict()
         
         with open(self.output_dir / 'login_security_analysis.json', 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2, default=str)
         
         return result
     
-    def analyze_employee_behavior(self):
+    def analyze_employee_behavior(self, checking=None, weblog=None, email=None):
         """分析员工行为异常"""
         print("\n=== 分析2: 员工行为分析 ===")
         
-        # 1. 打卡异常分析
-        self.checking_df['checkin'] = pd.to_datetime(self.checking_df['checkin'], errors='coerce')
-        self.checking_df['checkout'] = pd.to_datetime(self.checking_df['checkout'], errors='coerce')
-        
-        # 计算工作时长
-        valid_checks = self.checking_df[
-            self.checking_df['checkin'].notna() & 
-            self.checking_df['checkout'].notna()
-        ].copy()
-        
-        valid_checks['work_hours'] = (
-            valid_checks['checkout'] - valid_checks['checkin']
-        ).dt.total_seconds() / 3600
-        
-        # 异常工作时长
-        overtime_workers = valid_checks[valid_checks['work_hours'] > 12]
-        undertime_workers = valid_checks[valid_checks['work_hours'] < 4]
+        # 1. 打卡异常分析（checkin/checkout已在加载时解析，无效值为NaT）
+        if checking is None:
+            checking = self._summary('checking')
         
-        print(f"有效打卡记录: {len(valid_checks)}")
-        print(f"平均工作时长: {valid_checks['work_hours'].mean():.2f} 小时")
-        print(f"超时工作(>12h): {len(overtime_workers)} 次")
-        print(f"工时不足(<4h): {len(undertime_workers)} 次")
+        print(f"有效打卡记录: {checking['total_records']}")
+        print(f"平均工作时长: {checking['avg_work_hours']:.2f} 小时")
+        print(f"超时工作(>12h): {checking['overtime_count']} 次")
+        print(f"工时不足(<4h): {checking['undertime_count']} 次")
         
         # 2. 员工网页访问分析
-        if 'sip' in self.weblog_df.columns:
-            # 提取员工IP
-            employee_ips = self.weblog_df['sip'].value_counts()
-            
+        web = weblog if weblog is not None else self._summary('weblog')
+        if web['has_sip']:
             # 访问外部网站分析
-            external_domains = [
-                'baidu.com', 'taobao.com', 'sina.com', 'qq.com', 
-                'ifeng.com', 'so.com', 'acfun.tv', '6.cn', 'amazon.cn', 'alibaba.com'
-            ]
-            
-            self.weblog_df['is_external'] = self.weblog_df['host'].apply(
-                lambda x: any(domain in str(x).lower() for domain in external_domains)
-            )
-            
-            external_access = self.weblog_df[self.weblog_df['is_external']]
-            employee_external = external_access.groupby('sip').size().sort_values(ascending=False)
+            top_external = web['external_by_sip'].sort_values(ascending=False).head(20)
+            employee_external = decode_index(top_external)
             
+            if self.host_rules:
+                print(f"\n网站规则表: {self.host_rules}")
             print(f"\n外部网站访问TOP10员工:")
             for ip, count in employee_external.head(10).items():
                 print(f"  IP {ip}: {count} 次")
         
         # 3. 邮件行为分析
-        if 'from' in self.email_df.columns:
-            # 外部邮件检测
-            self.email_df['is_external_sender'] = ~self.email_df['from'].str.contains(
-                'hightech.com', na=False
-            )
-            
-            external_emails = self.email_df[self.email_df['is_external_sender']]
-            
-            # 垃圾邮件检测（包含特定关键词）
-            spam_keywords = ['新葡京', '赌博', '彩票', 'qq.com', '红包', '中奖']
-            self.email_df['is_spam'] = self.email_df['subject'].apply(
-                lambda x: any(kw in str(x) for kw in spam_keywords)
-            )
-            
-            spam_emails = self.email_df[self.email_df['is_spam']]
-            
+        if email is None:
+            email = self._summary('email')
+        if email['has_from']:
             print(f"\n邮件统计:")
-            print(f"  总邮件数: {len(self.email_df)}")
-            print(f"  外部邮件: {len(external_emails)}")
-            print(f"  疑似垃圾邮件: {len(spam_emails)}")
+            print(f"  总邮件数: {email['total_emails']}")
+            print(f"  外部邮件: {email['external_emails']}")
+            print(f"  疑似垃圾邮件: {email['spam_emails']}")
             
             # 接收垃圾邮件最多的员工
-            if len(spam_emails) > 0 and 'to' in spam_emails.columns:
-                spam_receivers = spam_emails['to'].value_counts().head(10)
+            if email['spam_emails'] > 0 and len(email['spam_receivers']) > 0:
+                spam_receivers = email['spam_receivers'].head(10)
                 print(f"\n接收垃圾邮件TOP10:")
                 for receiver, count in spam_receivers.items():
                     print(f"  {receiver}: {count} 封")
@@ -235,66 +418,73 @@ class LogDataProcessor:
         # 保存结果
         result = {
             'checking_stats': {
-                'total_records': int(len(valid_checks)),
-                'avg_work_hours': float(valid_checks['work_hours'].mean()) if len(valid_checks) > 0 else 0,
-                'overtime_count': int(len(overtime_workers)),
-                'undertime_count': int(len(undertime_workers))
+                'total_records': int(checking['total_records']),
+                'avg_work_hours': float(checking['avg_work_hours']) if checking['total_records'] > 0 else 0,
+                'overtime_count': int(checking['overtime_count']),
+                'undertime_count': int(checking['undertime_count'])
             },
             'web_access': {
-                'total_access': int(len(self.weblog_df)),
-                'external_access': int(len(external_access)) if 'is_external' in self.weblog_df.columns else 0,
-                'top_external_users': employee_external.head(20).to_dict() if 'sip' in self.weblog_df.columns else {}
+                'total_access': int(web['total_access']),
+                'external_access': int(web['external_access']),
+                'top_external_users': employee_external.head(20).to_dict() if web['has_sip'] else {}
             },
             'email_stats': {
-                'total_emails': int(len(self.email_df)),
-                'external_emails': int(len(external_emails)) if 'is_external_sender' in self.email_df.columns else 0,
-                'spam_emails': int(len(spam_emails)) if 'is_spam' in self.email_df.columns else 0
+                'total_emails': int(email['total_emails']),
+                'external_emails': int(email['external_emails']),
+                'spam_emails': int(email['spam_emails'])
             }
         }
         
+        if web['has_sip'] and 'external_by_sip' in web['sketches']:
+            result['web_access']['top_external_users_error'] = decode_index(
+                error_bounds(web, 'external_by_sip', top_external)
+            ).to_dict()
+        if email['has_from'] and 'spam_receivers' in email['sketches']:
+            top_receivers = email['spam_receivers'].head(20)
+            result['email_stats']['top_spam_receivers'] = top_receivers.to_dict()
+            result['email_stats']['top_spam_receivers_error'] = error_bounds(
+                email, 'spam_receivers', top_receivers
+            ).to_dict()
+        
         with open(self.output_dir / 'employee_behavior_analysis.json', 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2, default=str)
         
         return result
     
-    def analyze_network_traffic(self):
+    def analyze_network_traffic(self, tcplog=None):
         """分析网络流量异常"""
         print("\n=== 分析3: 网络流量分析 ===")
         
+        traffic = tcplog if tcplog is not None else self._summary('tcplog')
+        
         # 1. TCP流量统计
-        if 'uplink_length' in self.tcplog_df.columns:
-            self.tcplog_df['total_traffic'] = (
-                self.tcplog_df['uplink_length'] + self.tcplog_df['downlink_length']
-            )
-            
-            total_traffic = self.tcplog_df['total_traffic'].sum()
-            avg_traffic = self.tcplog_df['total_traffic'].mean()
+        if traffic['has_traffic']:
+            total_traffic = traffic['total_traffic']
+            avg_traffic = traffic['avg_traffic']
             
             print(f"总流量: {total_traffic / (1024**3):.2f} GB")
             print(f"平均连接流量: {avg_traffic / 1024:.2f} KB")
             
             # 异常大流量连接
-            large_traffic = self.tcplog_df[
-                self.tcplog_df['total_traffic'] > self.tcplog_df['total_traffic'].quantile(0.99)
-            ]
-            
-            print(f"\n异常大流量连接(TOP 1%): {len(large_traffic)} 条")
+            large_estimate = traffic['large_traffic_estimate']
+            if large_estimate is not None:
+                print(f"\n异常大流量连接(TOP 1%): 约 {large_estimate['count']} 条 "
+                      f"(±{large_estimate['count_error']}，阈值约 {large_estimate['threshold'] / 1024:.2f} KB)")
+            elif traffic['large_traffic_count'] is None:
+                print(f"\n异常大流量连接(TOP 1%): 流式/增量模式下不计算")
+            else:
+                print(f"\n异常大流量连接(TOP 1%): {traffic['large_traffic_count']} 条")
             
             # 按协议统计流量
-            proto_traffic = self.tcplog_df.groupby('proto')['total_traffic'].agg(['sum', 'mean', 'count'])
-            proto_traffic['sum_gb'] = proto_traffic['sum'] / (1024**3)
+            proto_traffic = traffic['proto_traffic']
             
             print(f"\n各协议流量统计:")
             print(proto_traffic.sort_values('sum', ascending=False))
         
         # 2. 时间分布分析
-        if 'stime' in self.tcplog_df.columns:
-            self.tcplog_df['datetime'] = pd.to_datetime(self.tcplog_df['stime'])
-            self.tcplog_df['hour'] = self.tcplog_df['datetime'].dt.hour
-            self.tcplog_df['date'] = self.tcplog_df['datetime'].dt.date
-            
+        if traffic['hourly_traffic'] is not None:
             # 每小时流量统计
-            hourly_traffic = self.tcplog_df.groupby('hour')['total_traffic'].sum()
+            hourly_traffic = traffic['hourly_traffic']
             
             print(f"\n流量高峰时段:")
             for hour in hourly_traffic.nlargest(5).index:
@@ -302,256 +492,620 @@ class LogDataProcessor:
                 print(f"  {hour}:00 - {traffic_gb:.2f} GB")
         
         # 3. IP地址分析
-        if 'sip' in self.tcplog_df.columns:
+        if traffic['ip_traffic'] is not None:
             # 源IP流量统计
-            ip_traffic = self.tcplog_df.groupby('sip')['total_traffic'].sum().sort_values(ascending=False)
+            top_ips = traffic['ip_traffic'].sort_values(ascending=False).head(20)
+            ip_traffic = decode_index(top_ips)
             
             print(f"\n流量TOP10源IP:")
-            for ip, traffic in ip_traffic.head(10).items():
-                print(f"  {ip}: {traffic / (1024**2):.2f} MB")
+            for ip, traffic_bytes in ip_traffic.head(10).items():
+                print(f"  {ip}: {traffic_bytes / (1024**2):.2f} MB")
+            
+            # 按子网汇总源IP流量
+            subnet_traffic = {
+                f'/{prefix}': subnet_rollup(traffic['network_traffic'], prefix).sort_values(ascending=False)
+                for prefix in (16, 24)
+            }
+            
+            print(f"\n流量TOP5子网(/24):")
+            for subnet, traffic_bytes in subnet_traffic['/24'].head(5).items():
+                print(f"  {subnet}: {traffic_bytes / (1024**3):.2f} GB")
         
         # 保存结果
         result = {
-            'total_traffic_gb': float(total_traffic / (1024**3)) if 'uplink_length' in self.tcplog_df.columns else 0,
-            'avg_connection_kb': float(avg_traffic / 1024) if 'uplink_length' in self.tcplog_df.columns else 0,
-            'total_connections': int(len(self.tcplog_df)),
-            'protocol_stats': proto_traffic.to_dict('index') if 'uplink_length' in self.tcplog_df.columns else {},
-            'top_traffic_ips': ip_traffic.head(20).to_dict() if 'sip' in self.tcplog_df.columns else {}
+            'total_traffic_gb': float(total_traffic / (1024**3)) if traffic['has_traffic'] else 0,
+            'avg_connection_kb': float(avg_traffic / 1024) if traffic['has_traffic'] else 0,
+            'total_connections': int(traffic['total_connections']),
+            'protocol_stats': proto_traffic.to_dict('index') if traffic['has_traffic'] else {},
+            'top_traffic_ips': ip_traffic.head(20).to_dict() if traffic['ip_traffic'] is not None else {},
+            'top_traffic_subnets': {
+                prefix: rolled.head(20).to_dict() for prefix, rolled in subnet_traffic.items()
+            } if traffic['ip_traffic'] is not None else {}
         }
         
+        if traffic['ip_traffic'] is not None and 'ip_traffic' in traffic['sketches']:
+            result['top_traffic_ips_error'] = decode_index(
+                error_bounds(traffic, 'ip_traffic', top_ips)
+            ).to_dict()
+        if traffic['large_traffic_estimate'] is not None:
+            result['large_traffic_connections'] = traffic['large_traffic_estimate']
+        
         with open(self.output_dir / 'network_traffic_analysis.json', 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2, default=str)
         
         return result
     
-    def detect_security_threats(self):
-        """检测安全威胁"""
+    def detect_security_threats(self, detections=None):
+        """
+        检测安全威胁，依次汇总THREAT_DETECTORS中各检测器的结果
+        
+        Args:
+            detections: 各检测器的结果（检测器名称 -> Detection），None表示在此依次执行各检测器
+        """
         print("\n=== 分析4: 安全威胁检测 ===")
         
-        threats = []
+        if detections is None:
+            detections = run_detectors(self, self._summary)
         
-        # 1. 暴力破解检测
-        if 'user' in self.login_df.columns and 'state' in self.login_df.columns:
-            error_logins = self.login_df[self.login_df['state'] == 'error']
-            user_errors = error_logins.groupby('user').size()
-            
-            # 失败次数超过10次的用户
-            brute_force_suspects = user_errors[user_errors > 10]
-            
-            for user, count in brute_force_suspects.items():
-                threats.append({
-                    'type': '暴力破解',
-                    'severity': 'high' if count > 20 else 'medium',
-                    'description': f'用户 {user} 登录失败 {count} 次',
-                    'user': str(user),
-                    'count': int(count)
-                })
-            
-            print(f"检测到疑似暴力破解: {len(brute_force_suspects)} 个用户")
+        result, messages = combine_detections(detections)
+        for message in messages:
+            print(message)
         
-        # 2. 非工作时间异常活动
-        if 'hour' in self.login_df.columns:
-            night_logins = self.login_df[
-                (self.login_df['hour'] >= 0) & (self.login_df['hour'] < 6)
-            ]
-            
-            if len(night_logins) > 0:
-                night_users = night_logins['user'].value_counts()
-                
-                for user, count in night_users.items():
-                    if count > 5:
-                        threats.append({
-                            'type': '非工作时间活动',
-                            'severity': 'medium',
-                            'description': f'用户 {user} 在凌晨(0-6点)登录 {count} 次',
-                            'user': str(user),
-                            'count': int(count)
-                        })
-                
-                print(f"检测到凌晨登录: {len(night_logins)} 次")
+        print(f"\n总计检测到 {result['total_threats']} 个安全威胁")
+        print(f"  高危威胁: {result['high_severity']}")
+        print(f"  中危威胁: {result['medium_severity']}")
         
-        # 3. 数据泄露风险 - 大量外发邮件
-        if 'from' in self.email_df.columns:
-            internal_senders = self.email_df[
-                self.email_df['from'].str.contains('hightech.com', na=False)
-            ]
-            
-            sender_counts = internal_senders['from'].value_counts()
-            
-            # 发送超过50封邮件的员工
-            heavy_senders = sender_counts[sender_counts > 50]
-            
-            for sender, count in heavy_senders.items():
-                threats.append({
-                    'type': '异常邮件发送',
-                    'severity': 'medium',
-                    'description': f'{sender} 发送了 {count} 封邮件',
-                    'user': str(sender),
-                    'count': int(count)
-                })
-            
-            print(f"检测到大量发送邮件: {len(heavy_senders)} 个账户")
+        with open(self.output_dir / 'security_threats.json', 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
         
-        # 4. 异常流量检测
-        if 'total_traffic' in self.tcplog_df.columns and 'sip' in self.tcplog_df.columns:
-            ip_traffic = self.tcplog_df.groupby('sip')['total_traffic'].sum()
-            
-            # 流量超过平均值3倍的IP
-            avg_traffic = ip_traffic.mean()
-            abnormal_ips = ip_traffic[ip_traffic > avg_traffic * 3]
-            
-            for ip, traffic in abnormal_ips.items():
-                threats.append({
-                    'type': '异常流量',
-                    'severity': 'high' if traffic > avg_traffic * 5 else 'medium',
-                    'description': f'IP {ip} 产生异常流量 {traffic/(1024**2):.2f} MB',
-                    'ip': str(ip),
-                    'traffic_mb': float(traffic / (1024**2))
-                })
-            
-            print(f"检测到异常流量IP: {len(abnormal_ips)} 个")
+        return result
+    
+    def analyze_alert_incidents(self, email=None):
+        """告警邮件分析：ALARM/RECOVER配对为事件区间，统计未恢复事件数与各监控项的平均恢复时间"""
+        print("\n=== 告警事件分析 ===")
+        
+        if email is None:
+            email = self._summary('email')
+        events = email['alerts']
+        incidents, orphans = pair_incidents(events)
+        recovered = incidents['end'].notna()
+        alarms = int((~events['recover']).sum()) if events is not None else 0
+        recovers = int(events['recover'].sum()) if events is not None else 0
+        
+        print(f"告警邮件: {alarms + recovers} 封（ALARM {alarms}，RECOVER {recovers}）")
+        print(f"配对为 {len(incidents)} 次事件，已恢复 {int(recovered.sum())} 次，"
+              f"未恢复 {int((~recovered).sum())} 次，未配对的RECOVER {orphans} 封")
+        
+        mttr = incidents.loc[recovered, 'duration_minutes']
+        if len(mttr):
+            print(f"平均恢复时间（MTTR）: {mttr.mean():.1f} 分钟，中位数 {mttr.median():.1f} 分钟")
+        open_counts = open_incidents(incidents)
+        if len(open_counts):
+            print(f"未恢复事件数峰值: {int(open_counts.max())}（{open_counts.idxmax().strftime(DATETIME_FORMAT)}）")
+        
+        top_hosts = mttr_by_host(incidents).head(TOP_HOSTS)
+        result = {
+            'alert_emails': alarms + recovers,
+            'alarms': alarms,
+            'recovers': recovers,
+            'incidents': len(incidents),
+            'recovered': int(recovered.sum()),
+            'unrecovered': int((~recovered).sum()),
+            'orphan_recovers': orphans,
+            'mttr_minutes': float(mttr.mean()) if len(mttr) else None,
+            'median_recovery_minutes': float(mttr.median()) if len(mttr) else None,
+            'storm_sizes': {int(size): int(count) for size, count in
+                            incidents['alarms'].value_counts().sort_index().items()},
+            'top_hosts': top_hosts.astype(object).where(top_hosts.notna(), None).to_dict('index'),
+            'open_incidents': {ts.strftime('%Y-%m-%d %H:%M'): int(count) for ts, count in open_counts.items()},
+        }
+        
+        with open(self.output_dir / 'alert_incidents.json', 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+        # 全部事件区间
+        incidents.assign(
+            start=incidents['start'].dt.strftime(DATETIME_FORMAT),
+            end=incidents['end'].dt.strftime(DATETIME_FORMAT),
+        ).to_csv(self.output_dir / 'alert_incidents.csv', index=False)
+        
+        return result
+    
+    def score_entity_behavior(self, login=None, weblog=None, email=None, tcplog=None, checking=None):
+        """
+        实体行为基线分析：各日志按(实体, 日期)汇总的特征对齐为稠密数组，
+        每个实体日与该实体自身之前的基线比较，偏离分数超过阈值的实体日为异常
+        """
+        print("\n=== 实体行为基线分析 ===")
+        
+        summaries = {'login': login, 'weblog': weblog, 'email': email, 'tcplog': tcplog, 'checking': checking}
+        for log_type, summary in summaries.items():
+            if summary is None:
+                summaries[log_type] = self._summary(log_type)
+        
+        feature_dir = self.output_dir / 'entity_features'
+        feature_dir.mkdir(exist_ok=True)
+        print(f"基线: 之前 {self.baseline_days} 天内的同类日期（工作日/周末），方法 {self.baseline_method}，"
+              f"阈值 {ANOMALY_THRESHOLD}")
+        
+        entities = {}
+        anomalies = []
+        for kind in FEATURES:
+            matrix = FeatureMatrix(kind, [summary['entity_days'][kind] for summary in summaries.values()
+                                          if kind in summary['entity_days']])
+            if len(matrix) == 0 or len(matrix.dates) == 0:
+                # 没有该类实体的数据（如只加载了tcpLog时的用户），不计算基线
+                entities[kind] = {'entities': len(matrix), 'days': len(matrix.dates), 'features': matrix.features,
+                                  'anomalies': 0}
+                print(f"  {'源IP' if kind == 'sip' else '用户'}: 无数据，跳过")
+                continue
+            # 增量模式下复用上次保存的数组中特征值未变化的日期的分数
+            previous = load_scores(feature_dir / f'{kind}.npz') if self.incremental else None
+            scored = matrix.score(window=self.baseline_days, method=self.baseline_method, previous=previous)
+            matrix.save(feature_dir / f'{kind}.npz', scored)
+            found = entity_day_anomalies(matrix, scored['scores'])
+            found['kind'] = kind
+            anomalies.append((matrix, scored, found))
+            entities[kind] = {'entities': len(matrix), 'days': len(matrix.dates), 'features': matrix.features,
+                              'anomalies': len(found)}
+            print(f"  {'源IP' if kind == 'sip' else '用户'}: {len(matrix)} 个实体 × {len(matrix.dates)} 天 × "
+                  f"{len(matrix.features)} 个特征，异常实体日 {len(found)} 个"
+                  + (f"（复用已保存的前 {matrix.reused_days} 天分数）" if matrix.reused_days else ""))
+        
+        # 各实体类型的异常合并后按分数排序，输出各特征的取值、基线与分数
+        records = []
+        for matrix, scored, found in anomalies:
+            keys = decode_ips(found['entity']) if matrix.kind == 'sip' else found['entity'].to_numpy()
+            for row, key in zip(found.head(TOP_ANOMALIES).itertuples(index=False), keys):
+                cell = (row.entity_pos, row.date_pos)
+                deviations = {
+                    feature: {
+                        'value': float(matrix.values[cell][position]),
+                        'baseline': float(scored['baseline'][cell][position]),
+                        'score': round(float(scored['scores'][cell][position]), 3),
+                    }
+                    for position, feature in enumerate(matrix.features)
+                    if scored['scores'][cell][position] >= ANOMALY_THRESHOLD
+                }
+                records.append({'entity': matrix.kind, 'key': key, 'date': row.date.strftime('%Y-%m-%d'),
+                                'score': round(float(row.score), 3), 'feature': row.feature,
+                                'deviations': deviations})
+        records.sort(key=lambda record: (-record['score'], record['date']))
+        records = records[:TOP_ANOMALIES]
+        
+        daily = pd.DataFrame(columns=list(FEATURES))
+        if anomalies:
+            daily = pd.concat([found[['date', 'kind']] for _, _, found in anomalies], ignore_index=True)
+            daily = daily.groupby(['date', 'kind']).size().unstack(fill_value=0).reindex(columns=list(FEATURES),
+                                                                                         fill_value=0)
+        
+        if records:
+            print(f"\n偏离最大的实体日TOP10:")
+            for record in records[:10]:
+                print(f"  {record['date']} {record['key']}: {record['feature']} 分数 {record['score']:.1f}")
+        
+        result = {
+            'method': self.baseline_method,
+            'baseline_days': self.baseline_days,
+            'threshold': ANOMALY_THRESHOLD,
+            'entities': entities,
+            'daily_anomalies': {
+                date.strftime('%Y-%m-%d'): {kind: int(count) for kind, count in counts.items()}
+                for date, counts in daily.iterrows()
+            },
+            'top_anomalies': records,
+        }
+        with open(self.output_dir / 'entity_anomalies.json', 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+        
+        return result
+    
+    def check_attendance(self):
+        """
+        考勤一致性检查：员工的网络活动（按登录用户、内部邮箱与其专用源IP对应）与当天的打卡区间比较，
+        标记不在公司时的网络活动与打卡期间没有网络活动的员工日；只使用整表加载的日志
+        """
+        print("\n=== 考勤一致性检查 ===")
+        
+        if self.timeline is None:
+            self.timeline = EntityTimeline({})
+        # 增量模式下或未选择checking时没有逐行的打卡记录
+        checking = self.checking_df if 'checkin' in self.checking_df.columns else empty_log_frame('checking')
+        
+        intervals = checkin_intervals(checking)
+        employees = pd.Index(np.sort(intervals['employee'].unique()))
+        owners = employee_ips(self.timeline.frames, employees, INTERNAL_EMAIL_DOMAIN)
+        index = employee_events(self.timeline.frames, employees, owners, INTERNAL_EMAIL_DOMAIN)
+        activity = employee_day_activity(index, intervals, self.attendance_margin)
+        
+        checked = activity['checkin'].notna()
+        partial = activity['partial']
+        offsite = activity[activity['offsite'] >= OFFSITE_THRESHOLD].sort_values(
+            ['offsite', 'date'], ascending=[False, True], kind='stable')
+        idle = activity[checked & (activity['inside'] == 0)]
         
-        # 5. 垃圾邮件攻击
-        if 'is_spam' in self.email_df.columns:
-            spam_count = self.email_df['is_spam'].sum()
+        print(f"员工 {len(employees)} 人，对应源IP {len(owners)} 个，员工事件 {len(index)} 条"
+              f"（{'、'.join(self.timeline.sources) or '无'}），打卡区间前后扩展 {window_label(self.attendance_margin)}")
+        print(f"员工日 {len(activity)} 个（已打卡 {int(checked.sum())} 个，其中缺少签退 {int(partial.sum())} 个）")
+        print(f"不在公司时的网络活动（区间外事件>={OFFSITE_THRESHOLD}）: {len(offsite)} 个员工日"
+              f"（其中未打卡 {int(offsite['checkin'].isna().sum())} 个）")
+        print(f"打卡期间无网络活动: {len(idle)} 个员工日")
+        
+        def record(row, kind, severity):
+            return {
+                'type': kind,
+                'severity': severity,
+                'employee': row.employee,
+                'date': row.date.strftime('%Y-%m-%d'),
+                'checkin': row.checkin.strftime(DATETIME_FORMAT) if pd.notna(row.checkin) else None,
+                'checkout': row.checkout.strftime(DATETIME_FORMAT) if pd.notna(row.checkout) else None,
+                'partial': bool(row.partial),
+                'events': int(row.events),
+                'inside': int(row.inside),
+                'offsite': int(row.offsite),
+            }
+        
+        offsite_records = []
+        for row in offsite.itertuples(index=False):
+            if pd.isna(row.checkin):
+                entry = record(row, '未打卡时的网络活动', 'high')
+            elif row.partial:
+                entry = record(row, '签到前的网络活动（缺少签退）', 'medium')
+            else:
+                entry = record(row, '打卡区间外的网络活动', 'medium')
+            entry['activity'] = {source: int(getattr(row, f'offsite_{source}')) for source in self.timeline.sources}
+            offsite_records.append(entry)
+        if len(offsite_records):
+            print(f"\n区间外活动最多的员工日TOP10:")
+            for entry in offsite_records[:10]:
+                if entry['checkin'] is None:
+                    interval = '未打卡'
+                else:
+                    interval = f"打卡 {entry['checkin'][11:]} ~ {entry['checkout'][11:] if entry['checkout'] else '未签退'}"
+                print(f"  {entry['date']} 员工 {entry['employee']}: {entry['offsite']} 条（{interval}）")
+        
+        result = {
+            'margin_minutes': self.attendance_margin.total_seconds() / 60,
+            'offsite_threshold': OFFSITE_THRESHOLD,
+            'sources': self.timeline.sources,
+            'employees': len(employees),
+            'mapped_ips': len(owners),
+            'employee_events': len(index),
+            'employee_days': len(activity),
+            'checked_days': int(checked.sum()),
+            'partial_days': int(partial.sum()),
+            'offsite_days': len(offsite_records),
+            'idle_checkins': len(idle),
+            'offsite': offsite_records,
+            'idle': [record(row, '打卡期间无网络活动', 'medium') for row in idle.itertuples(index=False)],
+        }
+        with open(self.output_dir / 'attendance_consistency.json', 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+        # 全部员工日
+        activity.assign(
+            date=activity['date'].dt.strftime('%Y-%m-%d'),
+            checkin=activity['checkin'].dt.strftime(DATETIME_FORMAT),
+            checkout=activity['checkout'].dt.strftime(DATETIME_FORMAT),
+        ).to_csv(self.output_dir / 'attendance_consistency.csv', index=False)
+        
+        return result
+    
+    def correlate_threats(self, threat_result=None):
+        """
+        威胁关联：在实体时间线上查找每个威胁的源IP（没有IP时为用户）在威胁时段前后的全部活动
+        
+        Args:
+            threat_result: detect_security_threats的结果，None表示在此执行威胁检测
+        """
+        print("\n=== 威胁关联分析 ===")
+        
+        if threat_result is None:
+            threat_result = self.detect_security_threats()
+        if self.timeline is None:
+            self.timeline = EntityTimeline({})
+        threats = threat_result['threats']
+        
+        # 有时段的威胁（暴力破解、凌晨登录）前后各扩展context_window，其余威胁关联全部时间
+        anchors = {'sip': [], 'user': []}
+        for position, threat in enumerate(threats):
+            ip = threat.get('sip', threat.get('ip'))
+            if ip is not None:
+                anchors['sip'].append((position, ip, threat.get('window_start'), threat.get('window_end')))
+            elif 'user' in threat:
+                anchors['user'].append((position, threat['user'], None, None))
+        
+        contexts = []
+        for kind, items in anchors.items():
+            if not items:
+                continue
+            positions, keys, starts, ends = zip(*items)
+            index_keys = encode_ips(pd.Series(keys)) if kind == 'sip' else list(keys)
+            events = self.timeline.window_join(kind, index_keys, starts, ends,
+                                               before=self.context_window, after=self.context_window)
+            counts = (events.groupby(['anchor', 'source'], observed=False).size().unstack(fill_value=0)
+                      .reindex(range(len(keys)), fill_value=0))
+            samples = events.groupby('anchor', sort=False).head(CONTEXT_EVENTS)
+            described = pd.Series(self.timeline.describe_events(samples), dtype=object).groupby(
+                samples['anchor'].to_numpy(), sort=False).agg(list)
             
-            if spam_count > 100:
-                threats.append({
-                    'type': '垃圾邮件攻击',
-                    'severity': 'high',
-                    'description': f'检测到 {spam_count} 封垃圾邮件',
-                    'count': int(spam_count)
+            for anchor, (position, key, start, end) in enumerate(items):
+                searched = [pd.Timestamp(value) for value in (start, end)]
+                contexts.append({
+                    'threat_index': position,
+                    'type': threats[position]['type'],
+                    'entity': kind,
+                    'key': key,
+                    'window_start': (searched[0] - self.context_window).strftime(DATETIME_FORMAT)
+                                    if start is not None else None,
+                    'window_end': (searched[1] + self.context_window).strftime(DATETIME_FORMAT)
+                                  if end is not None else None,
+                    'total_events': int(counts.loc[anchor].sum()),
+                    'activity': {source: int(count) for source, count in counts.loc[anchor].items()},
+                    'events': described.get(anchor, []),
                 })
-            
-            print(f"检测到垃圾邮件: {spam_count} 封")
+        contexts.sort(key=lambda context: context['threat_index'])
+        
+        totals = {source: sum(context['activity'].get(source, 0) for context in contexts)
+                  for source in self.timeline.sources}
+        print(f"时间线日志: {'、'.join(self.timeline.sources) or '无'}，时段前后扩展 {window_label(self.context_window)}")
+        print(f"关联 {len(contexts)} 个威胁，相关记录: "
+              + ("、".join(f"{source} {count}" for source, count in totals.items()) or "0"))
+        
+        result = {
+            'window_minutes': self.context_window.total_seconds() / 60,
+            'sources': self.timeline.sources,
+            'threats': contexts,
+        }
+        with open(self.output_dir / 'threat_context.json', 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
         
-        print(f"\n总计检测到 {len(threats)} 个安全威胁")
+        return result
+    
+    def build_traffic_graph(self, **summaries):
+        """
+        由graph_sources中各日志的边表构建流量图
         
-        # 按严重程度分类
-        high_threats = [t for t in threats if t['severity'] == 'high']
-        medium_threats = [t for t in threats if t['severity'] == 'medium']
+        Args:
+            summaries: 日志类型 -> 聚合统计，未给出的在此生成
+        """
+        tables = []
+        for log_type in self.graph_sources:
+            summary = summaries.get(log_type)
+            if summary is None:
+                summary = self._summary(log_type)
+            tables.append(summary['edges'])
+        graph = TrafficGraph(merge_edges(tables), weight=self.graph_weight)
+        # 各节点度量在此一次算出，后续阶段直接复用
+        graph.node_metrics()
+        return graph
+    
+    def analyze_traffic_graph(self, graph=None):
+        """流量图分析：度、扇出、加权PageRank与连通分量"""
+        print("\n=== 流量图分析 ===")
         
-        print(f"  高危威胁: {len(high_threats)}")
-        print(f"  中危威胁: {len(medium_threats)}")
+        if graph is None:
+            graph = self.build_traffic_graph()
+        metrics = graph.node_metrics()
+        component_count, _, component_sizes = graph.components()
         
-        # 保存结果
+        print(f"节点: {graph.node_count}，边: {graph.edge_count}（{'、'.join(self.graph_sources)}）")
+        print(f"弱连通分量: {component_count} 个"
+              + (f"，最大分量 {component_sizes[0]} 个节点" if component_count else ""))
+        
+        top_nodes = metrics.nlargest(20, 'pagerank')
+        top_nodes = top_nodes.set_axis(decode_ips(top_nodes.index.to_numpy()))
+        print(f"\nPageRank TOP5:")
+        for ip, row in top_nodes.head(5).iterrows():
+            print(f"  {ip}: {row['pagerank']:.4f}（扇出 {int(row['fan_out'])}，扇入 {int(row['fan_in'])}）")
+        
+        top_fan_out = metrics['fan_out'].nlargest(10)
+        
+        kept, links = graph.subgraph()
         result = {
-            'total_threats': len(threats),
-            'high_severity': len(high_threats),
-            'medium_severity': len(medium_threats),
-            'threats': threats
+            'sources': self.graph_sources,
+            'weight': self.graph_weight,
+            'nodes': graph.node_count,
+            'edges': graph.edge_count,
+            'total_bytes': int(graph.edge_bytes.sum()),
+            'total_flows': int(graph.edge_flows.sum()),
+            'components': component_count,
+            'component_sizes': component_sizes[:20].tolist(),
+            'top_pagerank': top_nodes.to_dict('index'),
+            'top_fan_out': decode_index(top_fan_out).to_dict(),
+            'subgraph': {
+                'nodes': decode_ips(kept.index.to_numpy()).tolist(),
+                'links': links.assign(sip=decode_ips(links['sip']), dip=decode_ips(links['dip'])).to_dict('records'),
+            },
         }
         
-        with open(self.output_dir / 'security_threats.json', 'w', encoding='utf-8') as f:
+        with open(self.output_dir / 'traffic_graph.json', 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2, default=str)
         
         return result
     
-    def generate_visualization_data(self):
+    def generate_visualization_data(self, login=None, tcplog=None, weblog=None, email=None, checking=None,
+                                    graph=None):
         """生成可视化所需的数据"""
         print("\n=== 生成可视化数据 ===")
         
         viz_data = {}
         
         # 1. 登录时间分布
-        if 'hour' in self.login_df.columns:
-            hourly_logins = self.login_df.groupby(['hour', 'state']).size().unstack(fill_value=0)
+        if login is None:
+            login = self._summary('login')
+        if login['hourly_logins'] is not None:
+            hourly_logins = login['hourly_logins']
             viz_data['hourly_logins'] = hourly_logins.to_dict()
         
         # 2. 协议使用分布
-        if 'proto' in self.login_df.columns:
-            proto_dist = self.login_df['proto'].value_counts().to_dict()
+        if login['proto_counts'] is not None:
+            proto_dist = login['proto_counts'].to_dict()
             viz_data['protocol_distribution'] = proto_dist
         
         # 3. 每日流量趋势
-        if 'date' in self.tcplog_df.columns and 'total_traffic' in self.tcplog_df.columns:
-            daily_traffic = self.tcplog_df.groupby('date')['total_traffic'].sum()
-            viz_data['daily_traffic'] = {
-                str(k): float(v / (1024**2)) for k, v in daily_traffic.to_dict().items()
-            }
+        traffic = tcplog if tcplog is not None else self._summary('tcplog')
+        if traffic['daily_traffic'] is not None:
+            daily_traffic, width = downsample(traffic['daily_traffic'], '1D', CHART_BUDGETS['daily_traffic'])
+            viz_data['daily_traffic'] = dict(zip(
+                time_labels(daily_traffic.index, width), (daily_traffic / (1024**2)).astype(float)
+            ))
+            
+            # 按指定粒度的流量时间序列（MB），由流量立方体上卷得到
+            hourly = traffic['cube'].rollup('date', 'hour').frame()['traffic']
+            hourly.index = (hourly.index.get_level_values('date')
+                            + pd.to_timedelta(hourly.index.get_level_values('hour'), unit='h'))
+            timeline, width = downsample(hourly, self.viz_resolution, CHART_BUDGETS['traffic_timeline'])
+            viz_data['traffic_timeline'] = dict(zip(
+                time_labels(timeline.index, width), (timeline / (1024**2)).astype(float)
+            ))
         
         # 4. 网站访问分类
-        if 'host' in self.weblog_df.columns:
-            # 分类网站
-            def categorize_website(host):
-                host = str(host).lower()
-                if 'hightech.com' in host:
-                    return '内部系统'
-                elif any(x in host for x in ['baidu', 'so.com']):
-                    return '搜索引擎'
-                elif any(x in host for x in ['taobao', 'alibaba', 'amazon']):
-                    return '电商'
-                elif any(x in host for x in ['sina', 'ifeng', '6.cn']):
-                    return '新闻娱乐'
-                else:
-                    return '其他'
-            
-            self.weblog_df['category'] = self.weblog_df['host'].apply(categorize_website)
-            category_dist = self.weblog_df['category'].value_counts().to_dict()
+        web = weblog if weblog is not None else self._summary('weblog')
+        if web['has_host']:
+            category_dist = web['category_counts'].to_dict()
             viz_data['website_categories'] = category_dist
         
-        # 5. 员工工作时长分布
-        if 'work_hours' in self.checking_df.columns:
-            work_hours_dist = self.checking_df['work_hours'].dropna().tolist()
-            viz_data['work_hours_distribution'] = work_hours_dist
+        # 5. 员工工作时长分布（直方图）
+        if checking is None:
+            checking = self._summary('checking')
+        if checking['total_records'] > 0:
+            viz_data['work_hours_distribution'] = checking['work_hours_histogram']
         
         # 6. 邮件时间分布
-        if 'time' in self.email_df.columns:
-            self.email_df['datetime'] = pd.to_datetime(self.email_df['time'])
-            self.email_df['hour'] = self.email_df['datetime'].dt.hour
-            email_hourly = self.email_df['hour'].value_counts().sort_index().to_dict()
+        if email is None:
+            email = self._summary('email')
+        if email['hourly'] is not None:
+            email_hourly = email['hourly'].to_dict()
             viz_data['email_hourly'] = email_hourly
         
-        # 7. 网络拓扑数据（IP关系）
-        if 'sip' in self.tcplog_df.columns and 'dip' in self.tcplog_df.columns:
-            # 取前100个连接用于可视化
-            top_connections = self.tcplog_df.nlargest(100, 'total_traffic')[['sip', 'dip', 'total_traffic']]
-            
-            nodes = set()
-            links = []
-            
-            for _, row in top_connections.iterrows():
-                nodes.add(row['sip'])
-                nodes.add(row['dip'])
-                links.append({
-                    'source': row['sip'],
-                    'target': row['dip'],
-                    'value': float(row['total_traffic'] / 1024)  # KB
-                })
-            
-            viz_data['network_topology'] = {
-                'nodes': [{'id': node} for node in nodes],
-                'links': links
-            }
+        # 7. 网络拓扑数据：流量图中PageRank最高的节点及其之间汇总后的边
+        if graph is None:
+            graph = self.build_traffic_graph(tcplog=traffic, login=login, weblog=web)
+        if graph.edge_count:
+            nodes, links = graph.subgraph(top_links=CHART_BUDGETS['network_topology'])
+            viz_data['network_topology'] = topology(
+                nodes.set_axis(decode_ips(nodes.index.to_numpy())),
+                links.assign(sip=decode_ips(links['sip']), dip=decode_ips(links['dip'])),
+            )
         
         # 保存可视化数据
-        with open(self.output_dir / 'visualization_data.json', 'w', encoding='utf-8') as f:
-            json.dump(viz_data, f, ensure_ascii=False, indent=2, default=str)
+        paths = write_visualization(viz_data, self.output_dir, self.viz_formats)
         
         print(f"可视化数据已保存到 {self.output_dir / 'visualization_data.json'}")
+        for fmt in VIZ_FORMATS[1:]:
+            if fmt in paths:
+                print(f"  {fmt}: {paths[fmt]}")
         
         return viz_data
     
+    def save_cubes(self, login=None, tcplog=None):
+        """
+        保存登录与流量的OLAP立方体到output/cubes，供下钻查询（见olap_cube.Cube.load）
+        
+        Returns:
+            dict: 立方体名称 -> 保存路径
+        """
+        cube_dir = self.output_dir / 'cubes'
+        cube_dir.mkdir(exist_ok=True)
+        summaries = {
+            'login': login if login is not None else self._summary('login'),
+            'traffic': tcplog if tcplog is not None else self._summary('tcplog'),
+        }
+        paths = {}
+        for name, summary in summaries.items():
+            if summary['cube'] is None:
+                continue
+            paths[name] = cube_dir / f'{name}.npz'
+            summary['cube'].save(paths[name])
+        
+        print(f"\nOLAP立方体已保存到 {cube_dir}")
+        return paths
+    
+    def analysis_stages(self):
+        """
+        分析流程的各阶段：各类日志的聚合统计 -> 各项分析与各威胁检测器 -> 威胁汇总
+        
+        Returns:
+            list: Stage列表，声明顺序即日志输出顺序
+        """
+        stages = [
+            Stage(f'{log_type}_summary', partial(self._summary, log_type), outputs=[log_type])
+            for log_type in LOG_SOURCES
+        ]
+        stages += [
+            Stage('login_security', self.analyze_login_security,
+                  inputs=['login'], outputs=['login_result']),
+            Stage('employee_behavior', self.analyze_employee_behavior,
+                  inputs=['checking', 'weblog', 'email'], outputs=['behavior_result']),
+            Stage('network_traffic', self.analyze_network_traffic,
+                  inputs=['tcplog'], outputs=['traffic_result']),
+            Stage('traffic_graph', self.build_traffic_graph, inputs=self.graph_sources, outputs=['graph']),
+            Stage('graph_analysis', self.analyze_traffic_graph, inputs=['graph'], outputs=['graph_result']),
+            Stage('alert_incidents', self.analyze_alert_incidents, inputs=['email'], outputs=['alert_result']),
+            Stage('entity_behavior', self.score_entity_behavior,
+                  inputs=['login', 'weblog', 'email', 'tcplog', 'checking'], outputs=['entity_result']),
+            Stage('attendance', self.check_attendance, outputs=['attendance_result']),
+        ]
+        
+        # 每个检测器一个阶段，只依赖其所需的聚合统计
+        detection_names = {detector.name: f'detection_{detector.name}' for detector in THREAT_DETECTORS}
+        stages += [
+            Stage(f'detector_{detector.name}', partial(detector.detect, self),
+                  inputs=detector.inputs, outputs=[detection_names[detector.name]])
+            for detector in THREAT_DETECTORS
+        ]
+        
+        def security_threats(**detections):
+            return self.detect_security_threats(
+                {name: detections[value] for name, value in detection_names.items()}
+            )
+        
+        stages += [
+            Stage('security_threats', security_threats,
+                  inputs=list(detection_names.values()), outputs=['threat_result']),
+            Stage('threat_context', self.correlate_threats, inputs=['threat_result'], outputs=['context_result']),
+            Stage('visualization', self.generate_visualization_data,
+                  inputs=['login', 'tcplog', 'weblog', 'email', 'checking', 'graph'], outputs=['viz_data']),
+            Stage('olap_cubes', self.save_cubes, inputs=['login', 'tcplog'], outputs=['cube_files']),
+        ]
+        return stages
+    
     def run_full_analysis(self):
         """运行完整分析流程"""
         print("=" * 60)
         print("网络监测数据分析系统")
         print("=" * 60)
         
+        self.metrics = self._new_metrics()
+        
         # 加载数据
-        self.load_all_data()
+        with self.metrics.stage('load_all_data', process_cpu=True):
+            self.load_all_data()
+        self.metrics.set_rows('load_all_data', sum(entry['rows'] for entry in self.metrics.files))
+        
+        # 执行各项分析：互不依赖的阶段并发执行，输出按阶段顺序写出
+        stages = self.analysis_stages()
+        scheduler = StageScheduler(
+            stages, max_workers=1 if self.metrics.sequential else self.stage_workers, metrics=self.metrics
+        )
+        results = scheduler.run()
+        self.stage_timings = scheduler.timings
         
-        # 执行各项分析
-        login_result = self.analyze_login_security()
-        behavior_result = self.analyze_employee_behavior()
-        traffic_result = self.analyze_network_traffic()
-        threat_result = self.detect_security_threats()
-        viz_data = self.generate_visualization_data()
+        # 各阶段处理的行数为其所用各类日志的记录数
+        for stage in stages:
+            log_types = [name for name in stage.inputs + stage.outputs if name in self.aggregates]
+            if log_types:
+                self.metrics.set_rows(stage.name, sum(self.aggregates[name].rows for name in log_types))
+        self.metrics.reorder(['load_all_data'] + [stage.name for stage in stages])
+        login_result = results['login_result']
+        behavior_result = results['behavior_result']
+        traffic_result = results['traffic_result']
+        threat_result = results['threat_result']
         
-        # 生成综合报告
+        # 生成综合报告，数据时间范围为实际读取的首末日期分区
+        period = self.catalog.describe(self.partitions)
         summary = {
             'analysis_time': datetime.now().isoformat(),
-            'data_period': '2017-11-01 to 2017-11-30',
+            'data_period': f"{period['first']} to {period['last']}" if period['partitions'] else None,
             'summary': {
                 'total_login_records': login_result['total_logins'],
                 'login_error_rate': login_result['error_rate'],
@@ -567,8 +1121,19 @@ class LogDataProcessor:
         with open(self.output_dir / 'analysis_summary.json', 'w', encoding='utf-8') as f:
             json.dump(summary, f, ensure_ascii=False, indent=2)
         
+        # 运行指标
+        self.metrics.finish(
+            critical_path_seconds=scheduler.critical_path(),
+            stage_workers=scheduler.max_workers,
+            streaming=self.streaming, incremental=self.incremental, sketch_error=self.sketch_error
+        )
+        self.metrics.write_json(self.output_dir / 'run_metrics.json')
+        if self.prometheus_file is not None:
+            self.metrics.write_prometheus(self.prometheus_file)
+        print(f"\n运行指标已保存到 {self.output_dir / 'run_metrics.json'}")
+        
         print("\n" + "=" * 60)
-        print("分析完成！结果已保存到 output 目录")
+        print(f"分析完成！结果已保存到 {self.output_dir} 目录")
         print("=" * 60)
         
         return summary
@@ -578,8 +1143,84 @@ if __name__ == '__main__':
     # 数据目录路径 - 使用相对路径
     data_dir = Path(__file__).parent.parent / '选题二——企业日志数据'
     
+    parser = argparse.ArgumentParser(description='网络监测数据分析系统')
+    parser.add_argument('--output-dir', default='output',
+                        help='分析结果的输出目录（默认当前目录下的output），缓存保存在与其同级的cache目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用列式缓存，直接解析CSV')
+    parser.add_argument('--rebuild-cache', action='store_true', help='忽略已有缓存并重新生成')
+    parser.add_argument('--workers', type=int, default=None, help='并行加载文件的工作数，默认CPU核数')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='并行加载方式：线程池或进程池')
+    parser.add_argument('--streaming', action='store_true',
+                        help='流式模式：tcpLog与weblog按块读取，内存占用与天数无关')
+    parser.add_argument('--chunksize', type=int, default=100000, help='流式模式下每块读取的行数')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量模式：复用未变化日期的已存储聚合，只处理新增或变化的日期')
+    parser.add_argument('--sketch', action='store_true',
+                        help='近似模式：TOP N与流量分位数由可合并的草图估计，JSON中给出误差上界')
+    parser.add_argument('--brute-force-threshold', type=int, default=BRUTE_FORCE_THRESHOLD,
+                        help='暴力破解检测：同一(用户, 源IP, 目的IP)在窗口内登录失败超过该次数')
+    parser.add_argument('--brute-force-window', type=float,
+                        default=BRUTE_FORCE_WINDOW.total_seconds() / 60,
+                        help='暴力破解检测的时间窗口（分钟）')
+    parser.add_argument('--night-threshold', type=int, default=NIGHT_THRESHOLD,
+                        help='凌晨登录检测：同一(用户, 源IP, 目的IP)在窗口内凌晨(0-6点)登录超过该次数')
+    parser.add_argument('--night-window', type=float, default=NIGHT_WINDOW.total_seconds() / 60,
+                        help='凌晨登录检测的时间窗口（分钟）')
+    parser.add_argument('--sketch-error', type=float, default=DEFAULT_SKETCH_ERROR,
+                        help='近似模式的相对误差参数')
+    parser.add_argument('--stage-workers', type=int, default=None,
+                        help='并发执行分析阶段的线程数，默认CPU核数，1表示按顺序执行')
+    parser.add_argument('--metrics-prom', default=None,
+                        help='另外写出Prometheus文本格式的运行指标到该文件')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='用tracemalloc记录每个阶段的内存分配峰值（各阶段按顺序执行）')
+    parser.add_argument('--profile-stages', action='store_true',
+                        help='对每个阶段做cProfile分析，结果保存到output/profiles/<阶段>.prof（各阶段按顺序执行）')
+    parser.add_argument('--viz-format', nargs='+', choices=VIZ_FORMATS, default=['json'],
+                        help='可视化数据的导出格式：json（总是写出）、gzip、arrow（每个图表一个Arrow IPC文件）')
+    parser.add_argument('--viz-resolution', default=DEFAULT_RESOLUTION,
+                        help='可视化数据中流量时间序列的粒度，如1h、1D（点数超过上限时自动放宽）')
+    parser.add_argument('--graph-sources', nargs='+', choices=GRAPH_SOURCES, default=['tcplog'],
+                        help='构建流量图的日志，默认只用tcpLog')
+    parser.add_argument('--graph-weight', choices=['bytes', 'flows'], default='bytes',
+                        help='流量图PageRank的边权：流量字节数或连接数')
+    parser.add_argument('--start-date', default=None,
+                        help='只分析该日期（包含）及以后的日期分区，如2017-11-06')
+    parser.add_argument('--end-date', default=None, help='只分析该日期（包含）及以前的日期分区')
+    parser.add_argument('--log-types', nargs='+', choices=list(LOG_SOURCES), default=None,
+                        help='只加载这些日志，默认全部')
+    parser.add_argument('--context-window', type=float, default=CONTEXT_WINDOW.total_seconds() / 60,
+                        help='威胁关联时在威胁时段前后扩展的时间（分钟）')
+    parser.add_argument('--baseline-days', type=int, default=BASELINE_DAYS,
+                        help='实体行为基线的天数：每个实体日与之前该天数内的同类日期（工作日/周末）比较')
+    parser.add_argument('--baseline-method', choices=BASELINE_METHODS, default='mad',
+                        help='实体行为基线方法：mad（中位数与MAD）或zscore（均值与标准差）')
+    parser.add_argument('--attendance-margin', type=float, default=ATTENDANCE_MARGIN.total_seconds() / 60,
+                        help='考勤一致性检查时打卡区间前后仍视为在公司的时间（分钟）')
+    parser.add_argument('--host-rules', default=None,
+                        help='外部网站域名与网站分类规则表的JSON文件，默认使用内置规则表')
+    args = parser.parse_args()
+    
     # 创建处理器并运行分析
-    processor = LogDataProcessor(data_dir)
+    processor = LogDataProcessor(
+        data_dir, output_dir=args.output_dir, use_cache=not args.no_cache, rebuild_cache=args.rebuild_cache,
+        max_workers=args.workers, executor=args.executor,
+        streaming=args.streaming, chunksize=args.chunksize, incremental=args.incremental,
+        sketch_error=args.sketch_error if args.sketch else None,
+        brute_force_threshold=args.brute_force_threshold,
+        brute_force_window=pd.Timedelta(minutes=args.brute_force_window),
+        night_threshold=args.night_threshold, night_window=pd.Timedelta(minutes=args.night_window),
+        stage_workers=args.stage_workers, trace_memory=args.trace_memory,
+        profile_stages=args.profile_stages, prometheus_file=args.metrics_prom,
+        viz_formats=args.viz_format, viz_resolution=args.viz_resolution,
+        graph_sources=args.graph_sources, graph_weight=args.graph_weight,
+        start_date=args.start_date, end_date=args.end_date, log_types=args.log_types,
+        context_window=pd.Timedelta(minutes=args.context_window),
+        baseline_days=args.baseline_days, baseline_method=args.baseline_method,
+        attendance_margin=pd.Timedelta(minutes=args.attendance_margin),
+        host_rules=args.host_rules
+    )
     summary = processor.run_full_analysis()
     
     print("\n分析摘要:")
@@ -0,0 +1,249 @@
+"""
+网络监测数据分析与可视化 - 数据集目录模块
+发现数据目录下全部YYYY-MM-DD日期分区，记录各分区可用的日志类型以及各文件的行数与最早/最晚时间；
+分析与查询按日期范围和日志类型筛选分区，只读取选中的分区与文件
+"""
+
+import argparse
+import json
+import os
+import re
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from log_cache import file_fingerprint
+from log_loader import DATETIME_FORMAT, LOG_SOURCES
+
+
+# 日期分区目录名
+PARTITION_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# 目录格式版本，记录的统计项变化时递增以使旧目录整体失效
+CATALOG_VERSION = 1
+
+# 目录文件名（位于cache目录）
+CATALOG_NAME = 'catalog.json'
+
+
+def parse_date(value):
+    """'YYYY-MM-DD'字符串（或date）转换为date，None保持为None"""
+    if value is None:
+        return None
+    return date.fromisoformat(str(value))
+
+
+def discover_partitions(data_dir):
+    """
+    数据目录下的日期分区
+
+    Args:
+        data_dir: 数据目录，其下为YYYY-MM-DD日期文件夹
+
+    Returns:
+        按日期升序的[(日期字符串, 分区目录)]，名称不是有效日期的目录忽略
+    """
+    data_dir = Path(data_dir)
+    if not data_dir.is_dir():
+        return []
+    partitions = []
+    for path in data_dir.iterdir():
+        if not path.is_dir() or not PARTITION_PATTERN.match(path.name):
+            continue
+        try:
+            parse_date(path.name)
+        except ValueError:
+            continue
+        partitions.append((path.name, path))
+    return sorted(partitions)
+
+
+def file_stats(df, log_type):
+    """
+    一个日志文件（或其中一块）的统计
+
+    Returns:
+        dict: rows, start, end（主时间列的最早/最晚时间，没有有效时间时为None）
+    """
+    column = LOG_SOURCES[log_type]['datetimes'][0]
+    stats = {'rows': len(df), 'start': None, 'end': None}
+    if column in df.columns:
+        times = df[column].dropna()
+        if len(times):
+            stats['start'] = times.min().strftime(DATETIME_FORMAT)
+            stats['end'] = times.max().strftime(DATETIME_FORMAT)
+    return stats
+
+
+def merge_stats(left, right):
+    """合并两块数据的统计（行数相加，时间取范围并集）"""
+    if left is None:
+        return right
+    starts = [value for value in (left['start'], right['start']) if value is not None]
+    ends = [value for value in (left['end'], right['end']) if value is not None]
+    return {
+        'rows': left['rows'] + right['rows'],
+        'start': min(starts) if starts else None,
+        'end': max(ends) if ends else None,
+    }
+
+
+class DatasetCatalog:
+    """日期分区目录，各文件的统计以源文件大小和修改时间判断是否仍然有效"""
+
+    def __init__(self, data_dir, catalog_file=None):
+        """
+        初始化并扫描数据目录
+
+        Args:
+            data_dir: 数据目录路径
+            catalog_file: 保存各文件统计的JSON文件，None表示不保存
+        """
+        self.data_dir = Path(data_dir)
+        self.catalog_file = Path(catalog_file) if catalog_file is not None else None
+        # 日期字符串 -> {'path': 分区目录, 'files': 日志类型 -> 文件记录}
+        self.partitions = {}
+        self.scan()
+
+    def _read_stored(self):
+        """读取已保存的目录，版本或数据目录不一致时视为空"""
+        if self.catalog_file is None or not self.catalog_file.exists():
+            return {}
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if stored.get('version') != CATALOG_VERSION or stored.get('data_dir') != str(self.data_dir.resolve()):
+            return {}
+        return stored.get('partitions', {})
+
+    def scan(self):
+        """
+        重新发现日期分区与其中的日志文件；源文件未变化的沿用已保存的统计，
+        新增或变化的文件统计为空，加载后由record补充
+        """
+        stored = self._read_stored()
+        self.partitions = {}
+        for date_str, day_dir in discover_partitions(self.data_dir):
+            files = {}
+            for log_type, source in LOG_SOURCES.items():
+                path = day_dir / source['file']
+                if not path.exists():
+                    continue
+                fingerprint = file_fingerprint(path)
+                entry = stored.get(date_str, {}).get(log_type)
+                if entry is not None and entry['fingerprint'] == fingerprint:
+                    files[log_type] = entry
+                else:
+                    files[log_type] = {'fingerprint': fingerprint, 'rows': None, 'start': None, 'end': None}
+            self.partitions[date_str] = {'path': day_dir, 'files': files}
+        return self
+
+    def select(self, start=None, end=None, log_types=None):
+        """
+        按日期范围与日志类型筛选分区
+
+        Args:
+            start, end: 起止日期（均包含），None表示不限
+            log_types: 需要的日志类型，None表示全部；不含其中任何一类日志的分区不选
+
+        Returns:
+            按日期升序的[(日期字符串, 分区目录)]
+        """
+        start, end = parse_date(start), parse_date(end)
+        wanted = set(LOG_SOURCES) if log_types is None else set(log_types)
+        selected = []
+        for date_str, partition in self.partitions.items():
+            day = parse_date(date_str)
+            if (start is not None and day < start) or (end is not None and day > end):
+                continue
+            if not wanted & set(partition['files']):
+                continue
+            selected.append((date_str, partition['path']))
+        return selected
+
+    def record(self, date_str, log_type, stats):
+        """登记加载后得到的文件统计（见file_stats）"""
+        entry = self.partitions.get(date_str, {}).get('files', {}).get(log_type)
+        if entry is not None:
+            entry.update(stats)
+
+    def describe(self, partitions=None):
+        """
+        分区的汇总
+
+        Args:
+            partitions: select的结果，None表示全部分区
+
+        Returns:
+            dict: partitions（分区个数）, first/last（首末分区日期）,
+                  log_types（日志类型 -> 分区个数、已知行数与最早/最晚时间）
+        """
+        dates = [date_str for date_str, _ in partitions] if partitions is not None else list(self.partitions)
+        log_types = {}
+        for date_str in dates:
+            for log_type, entry in self.partitions[date_str]['files'].items():
+                summary = log_types.setdefault(log_type, {'partitions': 0, 'stats': None})
+                summary['partitions'] += 1
+                if entry['rows'] is not None:
+                    summary['stats'] = merge_stats(summary['stats'], entry)
+        return {
+            'partitions': len(dates),
+            'first': dates[0] if dates else None,
+            'last': dates[-1] if dates else None,
+            'log_types': {
+                log_type: {'partitions': summary['partitions'], **(summary['stats'] or
+                           {'rows': None, 'start': None, 'end': None})}
+                for log_type, summary in log_types.items()
+            },
+        }
+
+    def save(self):
+        """写回目录"""
+        if self.catalog_file is None:
+            return
+        self.catalog_file.parent.mkdir(parents=True, exist_ok=True)
+        partitions = {
+            date_str: {
+                log_type: {key: entry[key] for key in ('fingerprint', 'rows', 'start', 'end')}
+                for log_type, entry in partition['files'].items()
+            }
+            for date_str, partition in self.partitions.items()
+        }
+        tmp_path = self.catalog_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CATALOG_VERSION, 'data_dir': str(self.data_dir.resolve()),
+                       'partitions': partitions}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.catalog_file)
+
+    def frame(self):
+        """全部文件记录的DataFrame（每行一个分区中的一类日志）"""
+        rows = [
+            {'date': date_str, 'log_type': log_type,
+             **{key: entry[key] for key in ('rows', 'start', 'end')}}
+            for date_str, partition in self.partitions.items()
+            for log_type, entry in partition['files'].items()
+        ]
+        return pd.DataFrame(rows, columns=['date', 'log_type', 'rows', 'start', 'end'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='网络监测数据分析系统 - 数据集目录')
+    parser.add_argument('--data-dir', default=str(Path(__file__).parent.parent / '选题二——企业日志数据'),
+                        help='数据目录')
+    parser.add_argument('--output-dir', default='output',
+                        help='data_processor.py的输出目录，读取与其同级的cache目录中保存的统计')
+    parser.add_argument('--start-date', default=None, help='起始日期（包含），如2017-11-01')
+    parser.add_argument('--end-date', default=None, help='结束日期（包含）')
+    args = parser.parse_args()
+
+    catalog = DatasetCatalog(args.data_dir, Path(args.output_dir).parent / 'cache' / CATALOG_NAME)
+    selected = {date_str for date_str, _ in catalog.select(args.start_date, args.end_date)}
+    table = catalog.frame()
+    table = table[table['date'].isin(selected)]
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(table.to_string(index=False) if len(table) else "未找到日期分区")
+    print(json.dumps(catalog.describe(catalog.select(args.start_date, args.end_date)),
+                     ensure_ascii=False, indent=2))
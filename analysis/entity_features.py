@@ -0,0 +1,401 @@
+"""
+网络监测数据分析与可视化 - 实体行为特征模块
+各类日志按(实体, 日期)汇总为立方体（实体为源IP或用户：员工编号、登录用户与内部邮箱），随聚合状态跨块、跨天合并；
+分析时对齐为 实体×日期×特征 的稠密数组，每个实体日与该实体之前若干天的基线（中位数/MAD或均值/标准差）比较，
+全部实体日的偏离分数按日期分块向量化运算得到；某天的分数只依赖其之前的基线窗口，新增日期不改变已有日期的分数，
+增量模式下复用上次保存的分数，只计算新增或特征值变化的日期
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from ip_index import INVALID_IP
+from olap_cube import Cube, time_dims
+
+
+# 实体类型 -> 特征（按输出顺序），work_hours由打卡的工作秒数换算
+FEATURES = {
+    'user': ['logins', 'login_failures', 'night_logins', 'emails_sent', 'emails_received', 'work_hours'],
+    'sip': ['logins', 'login_failures', 'night_logins', 'web_hits', 'external_web_hits', 'emails_sent',
+            'flows', 'bytes_up', 'bytes_down'],
+}
+
+# 基线：之前的自然日天数、其中至少需要的同类有效天数（工作日只与工作日比较，周末只与周末比较）
+BASELINE_DAYS = 14
+MIN_BASELINE_DAYS = 3
+
+# 基线方法：'mad'（中位数与MAD，稳健z分数）或'zscore'（均值与标准差）
+BASELINE_METHODS = ('mad', 'zscore')
+
+# 连接数与字节数跨越多个数量级，取log1p后再与基线比较
+LOG_FEATURES = ('flows', 'bytes_up', 'bytes_down')
+
+# 偏离分数阈值，以及基线离散度的下限，避免基线恒定（如周末全为0）时分数无穷大：
+# 计数类特征不低于该实体基线值的MIN_RELATIVE_SCALE倍、全体实体在基线窗口内该特征典型值（非零值的中位数）的
+# MIN_POPULATION_SCALE倍与MIN_SCALE；取对数的特征不低于MIN_LOG_SCALE（约相差e倍）
+ANOMALY_THRESHOLD = 3.5
+MIN_RELATIVE_SCALE = 0.25
+MIN_POPULATION_SCALE = 0.5
+MIN_SCALE = 1.0
+MIN_LOG_SCALE = 1.0
+
+# MAD换算为正态分布标准差的系数
+MAD_SCALE = 1.4826
+
+# 输出的异常实体日条数
+TOP_ANOMALIES = 50
+
+# 分块计算基线时每块窗口数组的元素数上限（float64约32MB）
+CHUNK_ELEMENTS = 1 << 22
+
+
+def user_keys(values):
+    """用户实体取值转换为字符串（员工编号与登录用户同一取值空间），缺失值保持为None"""
+    values = pd.Series(np.asarray(values, dtype=object))
+    return values.where(values.isna(), values.astype(str)).to_numpy(dtype=object)
+
+
+def mailbox_users(addresses, domain):
+    """邮件地址中内部邮箱的用户名（@之前的部分），其他地址为None；每个不同的地址只处理一次"""
+    codes, uniques = pd.factorize(pd.Series(np.asarray(addresses, dtype=object)), use_na_sentinel=True)
+    uniques = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    users = uniques.str.extract(rf'^([^@]+)@{domain.replace(".", "[.]")}$')[0]
+    users = np.append(users.to_numpy(dtype=object), None)
+    return users[codes]
+
+
+def _build(keys, days, measures, valid):
+    """有效行按(实体, 日期)构建立方体，度量为各特征的求和"""
+    valid = valid & pd.notna(keys) & ~np.isnat(days)
+    return Cube.build(
+        {'entity': keys[valid], 'date': days[valid]},
+        {name: np.asarray(values, dtype=np.float64)[valid] for name, values in measures.items()},
+    )
+
+
+def login_entity_days(df):
+    """
+    一块login数据按源IP与用户汇总的登录次数、失败次数与凌晨（0-6点，与登录分析一致）登录次数
+
+    Returns:
+        dict: 实体类型 -> Cube(entity, date)
+    """
+    days, hours = time_dims(df['time'])
+    measures = {
+        'logins': np.ones(len(df)),
+        'login_failures': (df['state'] == 'error').to_numpy(dtype=bool),
+        'night_logins': hours < 6,
+    }
+    all_rows = np.ones(len(df), dtype=bool)
+    cubes = {}
+    if 'sip' in df.columns:
+        sips = df['sip'].to_numpy()
+        cubes['sip'] = _build(sips, days, measures, sips != INVALID_IP)
+    if 'user' in df.columns:
+        cubes['user'] = _build(user_keys(df['user']), days, measures, all_rows)
+    return cubes
+
+
+def weblog_entity_days(df, is_external):
+    """一块weblog数据按源IP汇总的访问次数与外部网站访问次数"""
+    days, _ = time_dims(df['time'])
+    sips = df['sip'].to_numpy()
+    return {'sip': _build(sips, days, {
+        'web_hits': np.ones(len(df)),
+        'external_web_hits': np.asarray(is_external, dtype=bool),
+    }, sips != INVALID_IP)}
+
+
+def email_entity_days(df, domain):
+    """
+    一块email数据的发信与收信次数：源IP按发信计，用户为发件人/收件人中的内部邮箱
+
+    Args:
+        domain: 内部邮件域名
+    """
+    days, _ = time_dims(df['time'])
+    ones = np.ones(len(df))
+    cubes = {}
+    if 'sip' in df.columns:
+        sips = df['sip'].to_numpy()
+        cubes['sip'] = _build(sips, days, {'emails_sent': ones}, sips != INVALID_IP)
+    parts = []
+    for column, feature in (('from', 'emails_sent'), ('to', 'emails_received')):
+        if column in df.columns:
+            parts.append((mailbox_users(df[column], domain), feature))
+    if parts:
+        # 发件人与收件人两组行拼接后一次构建，同一用户的发信与收信落在同一个单元格
+        keys = np.concatenate([users for users, _ in parts])
+        measures = {
+            feature: np.concatenate([np.full(len(df), float(name == feature)) for _, name in parts])
+            for _, feature in parts
+        }
+        cubes['user'] = _build(keys, np.tile(days, len(parts)), measures, np.ones(len(keys), dtype=bool))
+    return cubes
+
+
+def traffic_entity_days(df):
+    """一块tcpLog数据按源IP汇总的连接数与上下行字节数（日期取连接开始时间）"""
+    days, _ = time_dims(df['stime'])
+    sips = df['sip'].to_numpy()
+    return {'sip': _build(sips, days, {
+        'flows': np.ones(len(df)),
+        'bytes_up': df['uplink_length'].to_numpy(dtype=np.float64, na_value=0),
+        'bytes_down': df['downlink_length'].to_numpy(dtype=np.float64, na_value=0),
+    }, sips != INVALID_IP)}
+
+
+def checking_entity_days(df):
+    """一块checking数据按员工编号汇总的工作时长（秒），打卡时间缺失的记录计为0"""
+    days = pd.to_datetime(pd.Series(np.asarray(df['day'], dtype=object)), format='%Y-%m-%d',
+                          errors='coerce').to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    seconds = (df['checkout'] - df['checkin']).dt.total_seconds().fillna(0).to_numpy()
+    return {'user': _build(user_keys(df['id']), days, {'work_seconds': seconds},
+                           np.ones(len(df), dtype=bool))}
+
+
+def merge_entity_days(current, part):
+    """合并两组按实体类型的立方体"""
+    if current is None:
+        return dict(part)
+    for kind, cube in part.items():
+        current[kind] = current[kind].merge(cube) if kind in current else cube
+    return current
+
+
+class FeatureMatrix:
+    """一种实体的稠密特征数组：values[实体, 日期, 特征]，来源日志当天没有记录的特征为NaN"""
+
+    def __init__(self, kind, cubes):
+        """
+        Args:
+            kind: 实体类型（FEATURES）
+            cubes: 各来源日志该实体类型的立方体，度量名称为特征（work_seconds换算为work_hours）
+        """
+        self.kind = kind
+        self.features = list(FEATURES[kind])
+        entities, dates = None, None
+        for cube in cubes:
+            entities = cube.dims['entity'] if entities is None else entities.union(cube.dims['entity'])
+            dates = cube.dims['date'] if dates is None else dates.union(cube.dims['date'])
+        self.entities = entities if entities is not None else pd.Index([])
+        # 日期轴为连续的自然日，基线窗口按日历天数计
+        self.dates = (pd.date_range(dates.min(), dates.max(), freq='D') if dates is not None and len(dates)
+                      else pd.DatetimeIndex([]))
+        self.values = np.full((len(self.entities), len(self.dates), len(self.features)), np.nan)
+        # score复用已保存分数的天数
+        self.reused_days = 0
+
+        for cube in cubes:
+            rows = self.entities.get_indexer(cube.dims['entity'])
+            cols = self.dates.get_indexer(pd.DatetimeIndex(cube.dims['date']))
+            for name, measure in cube.measures.items():
+                feature = 'work_hours' if name == 'work_seconds' else name
+                if feature not in self.features:
+                    continue
+                position = self.features.index(feature)
+                # 来源日志当天有记录时，该特征当天对所有实体有定义（没有活动的实体为0）
+                block = self.values[:, cols, position]
+                block[np.isnan(block)] = 0
+                block[rows] += measure / 3600 if name == 'work_seconds' else measure
+                self.values[:, cols, position] = block
+
+    def __len__(self):
+        return len(self.entities)
+
+    def frame(self):
+        """有定义的(实体, 日期)转换为长表DataFrame"""
+        index = pd.MultiIndex.from_product([self.entities, self.dates], names=['entity', 'date'])
+        frame = pd.DataFrame(self.values.reshape(-1, len(self.features)), index=index, columns=self.features)
+        return frame.dropna(how='all')
+
+    def score(self, window=BASELINE_DAYS, min_periods=MIN_BASELINE_DAYS, method='mad', previous=None):
+        """
+        全部实体日的偏离分数（见baseline_scores），工作日与周末分别取基线，LOG_FEATURES取对数后比较
+
+        某天的分数只依赖当天与之前window天的特征，previous（load_scores的结果）中特征值未变化的前若干天
+        直接复用已保存的分数，只计算之后的日期与这些天中新出现的实体；复用的天数记录在reused_days
+
+        Args:
+            previous: 上次保存的特征数组与分数，None表示全部重新计算
+
+        Returns:
+            baseline_scores的结果，baseline为原始单位（取对数的特征换算回字节数）；
+            options记录基线参数，与特征数组一同保存后用于判断能否复用
+        """
+        logged = np.isin(self.features, LOG_FEATURES)
+        values = self.values.copy()
+        values[..., logged] = np.log1p(values[..., logged])
+        groups = day_groups(self.dates)
+        options = np.array([str(window), str(min_periods), method])
+        limits = {
+            'floor': np.where(logged, MIN_LOG_SCALE, MIN_SCALE),
+            'relative': np.where(logged, 0, MIN_RELATIVE_SCALE),
+            'population': np.where(logged, 0, MIN_POPULATION_SCALE),
+        }
+        reused, old_rows, new_rows = self._reusable(previous, options)
+        result = baseline_scores(values, groups, window, min_periods, method, start=reused, **limits)
+        if reused:
+            result['typical'][:reused] = previous['typical'][:reused]
+            if len(new_rows):
+                # 新出现的实体在复用的日期中只计算自身的基线，典型值取已保存的全体实体的值
+                part = baseline_scores(values[new_rows, :reused], groups[:reused], window, min_periods, method,
+                                       typical=previous['typical'][:reused], **limits)
+                for key in ('baseline', 'scale', 'scores'):
+                    result[key][new_rows, :reused] = part[key]
+        result['baseline'][..., logged] = np.expm1(result['baseline'][..., logged])
+        if reused:
+            for key in ('baseline', 'scale', 'scores'):
+                result[key][old_rows, :reused] = previous[key][:, :reused]
+        result['options'] = options
+        self.reused_days = reused
+        return result
+
+    def _reusable(self, previous, options):
+        """
+        previous中可复用的前若干天
+
+        Returns:
+            (天数, 已保存实体在当前数组中的位置, 新出现实体的位置)；已保存的日期不是当前日期的前缀、
+            特征或基线参数不同、已保存的实体不再出现时天数为0
+        """
+        nothing = (0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        if (previous is None or list(previous['features']) != self.features
+                or list(previous['options']) != list(options)):
+            return nothing
+        dates = self.dates.strftime('%Y-%m-%d').to_numpy(dtype=str)
+        stored = previous['dates']
+        if len(stored) == 0 or len(stored) > len(dates) or (dates[:len(stored)] != stored).any():
+            return nothing
+        old_rows = self.entities.get_indexer(pd.Index(previous['entities']))
+        if len(old_rows) and (old_rows < 0).any():
+            return nothing
+        new_rows = np.setdiff1d(np.arange(len(self.entities)), old_rows)
+
+        # 已保存的实体特征值完全相同、新实体没有正值（不改变全体典型值）的前若干天
+        same = np.all((self.values[old_rows, :len(stored)] == previous['values'])
+                      | (np.isnan(self.values[old_rows, :len(stored)]) & np.isnan(previous['values'])), axis=(0, 2))
+        same &= ~np.any(self.values[new_rows, :len(stored)] > 0, axis=(0, 2))
+        reused = len(stored) if same.all() else int(np.argmin(same))
+        return reused, old_rows, new_rows
+
+    def save(self, path, scores=None):
+        """保存为.npz文件（实体、日期、特征名、特征数组与偏离分数）"""
+        # 字符串保存为定长数组，读取时不需要pickle
+        entities = np.asarray(self.entities)
+        arrays = {'entities': entities.astype(str) if entities.dtype == object else entities,
+                  'dates': self.dates.strftime('%Y-%m-%d').to_numpy(dtype=str),
+                  'features': np.array(self.features), 'values': self.values}
+        if scores is not None:
+            arrays.update(scores)
+        np.savez_compressed(path, **arrays)
+
+
+def load_scores(path):
+    """读取FeatureMatrix.save保存的特征数组与分数，文件不存在、损坏或缺少分数时返回None"""
+    try:
+        with np.load(path) as stored:
+            arrays = {key: stored[key] for key in stored.files}
+    except (OSError, ValueError):
+        return None
+    required = ('entities', 'dates', 'features', 'values', 'baseline', 'scale', 'scores', 'typical', 'options')
+    return arrays if all(key in arrays for key in required) else None
+
+
+def day_groups(dates):
+    """日期的基线分组：0为工作日，1为周末"""
+    return (pd.DatetimeIndex(dates).dayofweek >= 5).astype(np.int8)
+
+
+def baseline_scores(values, groups=None, window=BASELINE_DAYS, min_periods=MIN_BASELINE_DAYS, method='mad',
+                    floor=MIN_SCALE, relative=MIN_RELATIVE_SCALE, population=MIN_POPULATION_SCALE,
+                    start=0, typical=None):
+    """
+    每个实体日相对该实体之前window天中同组日期基线的偏离分数
+
+    之前的天数组成形如(实体, 日期, 特征, window)的滑动窗口视图，按日期分块（每块不超过CHUNK_ELEMENTS个元素）
+    取出后将不同组的日期置为NaN，块内全部实体日的基线与离散度沿最后一维一次求出
+
+    Args:
+        values: 实体×日期×特征的数组，日期为连续的自然日，NaN表示当天没有数据
+        groups: 各日期的分组（如day_groups），None表示不分组
+        window: 基线天数
+        min_periods: 基线中至少需要的有效天数，不足时分数为NaN
+        method: 'mad'（中位数与MAD）或'zscore'（均值与标准差）
+        floor: 离散度的下限（可按特征给出）
+        relative: 离散度不低于基线值的该倍数（可按特征给出）
+        population: 离散度不低于全体实体在同一基线窗口内典型值（非零值的中位数）的该倍数（可按特征给出）
+        start: 只计算该位置及以后的日期，之前的日期结果为NaN
+        typical: 已知的各日期×特征典型值（如只对部分实体计算时取全体实体的值），None表示由values求出
+
+    Returns:
+        dict: baseline（基线值）、scale（离散度）、scores（偏离分数），均与values同形；
+              typical（日期×特征的典型值）
+    """
+    if method not in BASELINE_METHODS:
+        raise ValueError(f"未知的基线方法: {method}")
+    n_entities, n_dates, n_features = values.shape
+    baseline = np.full(values.shape, np.nan)
+    scale = np.full(values.shape, np.nan)
+    known = typical is not None
+    typical = np.array(typical, dtype=np.float64) if known else np.full((n_dates, n_features), np.nan)
+    if n_entities == 0 or n_dates <= start:
+        return {'baseline': baseline, 'scale': scale, 'scores': np.full(values.shape, np.nan), 'typical': typical}
+
+    groups = np.zeros(n_dates, dtype=np.int8) if groups is None else np.asarray(groups)
+    padded = np.concatenate([np.full((n_entities, window, n_features), np.nan), values], axis=1)
+    # windows[e, d, f, :]为第d天之前的window天
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)
+    group_windows = np.lib.stride_tricks.sliding_window_view(np.concatenate([np.full(window, -1), groups]), window)
+    step = max(1, CHUNK_ELEMENTS // (n_entities * n_features * window))
+
+    with warnings.catch_warnings():
+        # 全部为NaN的窗口结果为NaN，随后按min_periods置为NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for lower in range(start, n_dates, step):
+            upper = min(lower + step, n_dates)
+            same = group_windows[lower:upper] == groups[lower:upper, None]
+            history = np.where(same[None, :, None, :], windows[:, lower:upper], np.nan)
+            if method == 'mad':
+                center = np.nanmedian(history, axis=-1)
+                spread = MAD_SCALE * np.nanmedian(np.abs(history - center[..., None]), axis=-1)
+            else:
+                center = np.nanmean(history, axis=-1)
+                spread = np.nanstd(history, axis=-1)
+            if not known:
+                # 典型值同样只取基线窗口内的日期，形如(日期, 特征)
+                positive = np.where(history > 0, history, np.nan)
+                typical[lower:upper] = np.nanmedian(
+                    np.moveaxis(positive, 0, 2).reshape(upper - lower, n_features, -1), axis=-1)
+            lowest = np.maximum(floor, np.nan_to_num(typical[lower:upper]) * population)
+            enough = (~np.isnan(history)).sum(axis=-1) >= min_periods
+            baseline[:, lower:upper] = np.where(enough, center, np.nan)
+            scale[:, lower:upper] = np.where(enough, np.maximum(spread, np.maximum(np.abs(center) * relative, lowest)),
+                                             np.nan)
+    return {'baseline': baseline, 'scale': scale, 'scores': (values - baseline) / scale, 'typical': typical}
+
+
+def entity_day_anomalies(matrix, scores, threshold=ANOMALY_THRESHOLD):
+    """
+    偏离分数最高的特征超过阈值的实体日（只计高于基线的偏离）
+
+    Returns:
+        DataFrame：entity、date、score（最高分数）、feature（对应特征），按分数降序
+    """
+    if matrix.values.size == 0:
+        return pd.DataFrame({'entity': [], 'date': pd.DatetimeIndex([]), 'score': [], 'feature': []})
+    filled = np.where(np.isnan(scores), -np.inf, scores)
+    top = filled.argmax(axis=-1)
+    best = np.take_along_axis(filled, top[..., None], axis=-1)[..., 0]
+    entity_pos, date_pos = np.nonzero(best >= threshold)
+    result = pd.DataFrame({
+        'entity': matrix.entities[entity_pos],
+        'date': matrix.dates[date_pos],
+        'score': best[entity_pos, date_pos],
+        'feature': np.asarray(matrix.features, dtype=object)[top[entity_pos, date_pos]],
+        'entity_pos': entity_pos,
+        'date_pos': date_pos,
+    })
+    return result.sort_values(['score', 'date'], ascending=[False, True], kind='stable').reset_index(drop=True)
@@ -0,0 +1,212 @@
+"""
+网络监测数据分析与可视化 - 实体时间线模块
+加载后把login、weblog、email、tcpLog的记录按实体（源IP或用户）与时间排成一个索引，每个事件只保存来源日志与原表行号；
+同一实体的事件在索引中连续且按时间升序，实体与时间组合为一个整数键，
+整批锚点（如登录失败时段）的时间窗口关联用两次searchsorted定位区间，不逐条循环
+"""
+
+import numpy as np
+import pandas as pd
+
+from ip_index import INVALID_IP, decode_ips
+from log_loader import DATETIME_FORMAT, LOG_SOURCES
+
+
+# 参与时间线的日志
+TIMELINE_SOURCES = ['login', 'weblog', 'email', 'tcplog']
+
+# 实体类型 -> 各日志中对应的列：sip为源IP，user为登录用户与邮件发件人
+ENTITY_COLUMNS = {
+    'sip': {'login': 'sip', 'weblog': 'sip', 'email': 'sip', 'tcplog': 'sip'},
+    'user': {'login': 'user', 'email': 'from'},
+}
+
+# 输出事件时各日志附带的字段
+DETAIL_COLUMNS = {
+    'login': ['user', 'state', 'dip', 'dport'],
+    'weblog': ['dip', 'host'],
+    'email': ['from', 'to', 'subject'],
+    'tcplog': ['proto', 'dip', 'dport', 'uplink_length', 'downlink_length'],
+}
+
+# 威胁关联：时段前后扩展的时间窗口，每个威胁输出的事件条数
+CONTEXT_WINDOW = pd.Timedelta(minutes=10)
+CONTEXT_EVENTS = 20
+
+
+def _seconds(times):
+    """时间数组转换为秒（int64），NaT需由调用方事先去掉"""
+    return np.asarray(times, dtype='datetime64[ns]').astype('datetime64[s]').astype(np.int64)
+
+
+class EntityIndex:
+    """一种实体的时间线：按(实体, 时间)排序的事件，以及各实体在其中的起止位置"""
+
+    def __init__(self, keys, codes, seconds, sources, rows):
+        """
+        Args:
+            keys: 实体取值（升序的pd.Index）
+            codes: 各事件的实体编号（keys中的位置）
+            seconds: 各事件的时间（秒）
+            sources: 各事件的来源日志编号（TIMELINE_SOURCES中的位置）
+            rows: 各事件在来源日志DataFrame中的行号
+        """
+        order = np.lexsort((seconds, codes))
+        self.keys = keys
+        self.codes = codes[order]
+        self.seconds = seconds[order]
+        self.sources = sources[order]
+        self.rows = rows[order]
+        self.indptr = np.searchsorted(self.codes, np.arange(len(keys) + 1))
+
+        # 实体编号与相对时间组合为一个升序整数键：每个实体占stride个连续取值，相邻实体之间留一个空位
+        self.origin = int(self.seconds.min()) if len(self.seconds) else 0
+        self.span = int(self.seconds.max()) - self.origin if len(self.seconds) else 0
+        self.stride = self.span + 2
+        self.composite = self.codes * self.stride + (self.seconds - self.origin)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def locate(self, codes, lower, upper):
+        """
+        各锚点在索引中的事件区间
+
+        Args:
+            codes: 锚点的实体编号（-1表示实体不存在）
+            lower, upper: 时间范围（秒，均包含），None表示不限
+
+        Returns:
+            (起始位置数组, 结束位置数组)，区间左闭右开
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        n = len(codes)
+        lower = np.full(n, self.origin, dtype=np.int64) if lower is None else np.asarray(lower, dtype=np.int64)
+        upper = np.full(n, self.origin + self.span, dtype=np.int64) if upper is None else np.asarray(upper, dtype=np.int64)
+        # 超出全部事件时间范围的端点截断到该实体所占取值之外的空位，查找结果仍落在该实体的区间边界上
+        low = codes * self.stride + np.clip(lower - self.origin, 0, self.span + 1)
+        high = codes * self.stride + np.clip(upper - self.origin, -1, self.span)
+        start = np.searchsorted(self.composite, low, side='left')
+        end = np.searchsorted(self.composite, high, side='right')
+        missing = codes < 0
+        end[missing] = start[missing]
+        return start, np.maximum(start, end)
+
+
+class EntityTimeline:
+    """跨日志的实体时间线，从整表加载的各类日志建立，只在加载后建立一次"""
+
+    def __init__(self, frames):
+        """
+        Args:
+            frames: 日志类型 -> 整表加载的DataFrame，缺少的日志不进入时间线
+        """
+        self.frames = {
+            log_type: frames[log_type] for log_type in TIMELINE_SOURCES
+            if log_type in frames and LOG_SOURCES[log_type]['datetimes'][0] in frames[log_type].columns
+        }
+        self.index = {kind: self._build(kind) for kind in ENTITY_COLUMNS}
+
+    @property
+    def sources(self):
+        return list(self.frames)
+
+    def _build(self, kind):
+        keys, seconds, sources, rows = [], [], [], []
+        for log_type, column in ENTITY_COLUMNS[kind].items():
+            df = self.frames.get(log_type)
+            if df is None or column not in df.columns:
+                continue
+            times = df[LOG_SOURCES[log_type]['datetimes'][0]].to_numpy(dtype='datetime64[ns]')
+            values = df[column]
+            valid = ~np.isnat(times) & values.notna().to_numpy()
+            if kind == 'sip':
+                valid &= values.to_numpy() != INVALID_IP
+            positions = np.flatnonzero(valid)
+            keys.append(np.asarray(values.to_numpy()[positions], dtype=object if kind == 'user' else np.uint32))
+            seconds.append(_seconds(times[positions]))
+            sources.append(np.full(len(positions), TIMELINE_SOURCES.index(log_type), dtype=np.int8))
+            rows.append(positions)
+
+        if not keys:
+            return EntityIndex(pd.Index([]), *(np.zeros(0, dtype=np.int64) for _ in range(4)))
+        codes, uniques = pd.factorize(np.concatenate(keys), sort=True)
+        return EntityIndex(pd.Index(uniques), codes.astype(np.int64), np.concatenate(seconds),
+                           np.concatenate(sources), np.concatenate(rows).astype(np.int64))
+
+    def window_join(self, kind, keys, starts=None, ends=None, before=CONTEXT_WINDOW, after=CONTEXT_WINDOW,
+                    sources=None):
+        """
+        区间关联：每个锚点关联同一实体在[start - before, end + after]内的全部事件
+
+        Args:
+            kind: 实体类型（ENTITY_COLUMNS）
+            keys: 各锚点的实体（sip为uint32编码的IP）
+            starts, ends: 各锚点时段的起止时间，None或NaT表示不限
+            before, after: 时段前后扩展的时间
+            sources: 只关联这些日志的事件，None表示全部
+
+        Returns:
+            DataFrame，每行一个(锚点, 事件)：anchor（锚点序号）、source、time、row（来源日志中的行号），
+            同一锚点的事件按时间升序
+        """
+        index = self.index[kind]
+        codes = index.keys.get_indexer(pd.Index(keys))
+        start, end = index.locate(
+            codes,
+            self._bound(starts, len(codes), -pd.Timedelta(before), index.origin),
+            self._bound(ends, len(codes), pd.Timedelta(after), index.origin + index.span),
+        )
+
+        counts = end - start
+        anchors = np.repeat(np.arange(len(codes)), counts)
+        # 各区间内的位置：区间起点加上区间内的偏移
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(start, counts) + offsets
+
+        events = pd.DataFrame({
+            'anchor': anchors,
+            'source': pd.Categorical.from_codes(index.sources[positions], TIMELINE_SOURCES),
+            'time': index.seconds[positions].astype('datetime64[s]').astype('datetime64[ns]'),
+            'row': index.rows[positions],
+        })
+        if sources is not None:
+            events = events[events['source'].isin(sources)].reset_index(drop=True)
+        return events
+
+    @staticmethod
+    def _bound(times, n, shift, default):
+        """锚点时段的一端转换为秒，缺失时取default"""
+        if times is None:
+            return None
+        times = pd.DatetimeIndex(pd.to_datetime(times)) + shift
+        seconds = np.full(n, default, dtype=np.int64)
+        valid = ~times.isna()
+        seconds[valid] = _seconds(times[valid].to_numpy())
+        return seconds
+
+    def describe_events(self, events):
+        """
+        事件转换为JSON记录：来源、时间、源IP与DETAIL_COLUMNS中的字段
+
+        Args:
+            events: window_join的结果（的一部分）
+        """
+        records = [None] * len(events)
+        for log_type, group in events.groupby('source', observed=True, sort=False):
+            df = self.frames[log_type]
+            rows = df.iloc[group['row'].to_numpy()]
+            detail = pd.DataFrame({'source': log_type, 'time': group['time'].dt.strftime(DATETIME_FORMAT).to_numpy()})
+            if 'sip' in rows.columns:
+                detail['sip'] = decode_ips(rows['sip'])
+            for column in DETAIL_COLUMNS[log_type]:
+                if column not in rows.columns:
+                    continue
+                values = rows[column].to_numpy()
+                detail[column] = decode_ips(values) if column in LOG_SOURCES[log_type]['ips'] else values
+            # 缺失值（如weblog中没有host的记录）输出为null
+            detail = detail.astype(object).where(detail.notna(), None)
+            for position, record in zip(np.flatnonzero(events['source'].to_numpy() == log_type),
+                                        detail.to_dict('records')):
+                records[position] = record
+        return records
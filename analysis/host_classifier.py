@@ -0,0 +1,198 @@
+"""
+网络监测数据分析与可视化 - 网站分类模块
+根据访问的host判断是否外部网站及所属类别
+
+分类按规则表进行：先将host列因子化为唯一值，用Aho-Corasick自动机对每个唯一值只扫描一次，
+再通过整数编码把分类结果广播回所有行，避免逐行的Python字符串匹配；规则表默认为本模块的常量，
+也可由JSON文件给出（HostClassifier.from_json）
+"""
+
+import json
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# 外部网站域名
+EXTERNAL_DOMAINS = [
+    'baidu.com', 'taobao.com', 'sina.com', 'qq.com',
+    'ifeng.com', 'so.com', 'acfun.tv', '6.cn', 'amazon.cn', 'alibaba.com'
+]
+
+# 网站分类规则表：按顺序匹配，host包含任一关键词即归入该类别
+WEBSITE_CATEGORY_RULES = [
+    ('内部系统', ['hightech.com']),
+    ('搜索引擎', ['baidu', 'so.com']),
+    ('电商', ['taobao', 'alibaba', 'amazon']),
+    ('新闻娱乐', ['sina', 'ifeng', '6.cn']),
+]
+WEBSITE_DEFAULT_CATEGORY = '其他'
+
+
+class MultiPatternMatcher:
+    """Aho-Corasick多模式匹配自动机，一次扫描找出文本中出现的所有模式"""
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: 模式字符串列表，匹配结果为模式在列表中的下标
+        """
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].add(index)
+
+        # 按层次遍历构建失败指针
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find_all(self, text):
+        """返回text中出现的全部模式下标"""
+        matches = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                matches |= self._output[state]
+        return matches
+
+
+class RuleClassifier:
+    """基于规则表的字符串分类器，对列中的唯一值分类后按编码广播"""
+
+    def __init__(self, rules, default, lowercase=True):
+        """
+        Args:
+            rules: [(标签, [关键词, ...]), ...]，按顺序优先匹配
+            default: 未匹配任何规则时的标签
+            lowercase: 匹配前是否转为小写
+        """
+        self.rules = [(label, list(keywords)) for label, keywords in rules]
+        self.default = default
+        self.lowercase = lowercase
+
+        patterns = []
+        self._pattern_rule = []
+        for rule_index, (_, keywords) in enumerate(self.rules):
+            for keyword in keywords:
+                patterns.append(keyword.lower() if lowercase else keyword)
+                self._pattern_rule.append(rule_index)
+        self.matcher = MultiPatternMatcher(patterns)
+
+    def classify_value(self, value):
+        """对单个值分类，缺失值按字符串'nan'处理"""
+        text = str(value)
+        if self.lowercase:
+            text = text.lower()
+        matches = self.matcher.find_all(text)
+        if not matches:
+            return self.default
+        return self.rules[min(self._pattern_rule[m] for m in matches)][0]
+
+    def classify(self, values):
+        """
+        对一列值分类
+
+        Args:
+            values: pandas Series（普通字符串或分类类型）
+
+        Returns:
+            与values等长、索引相同的标签Series
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+
+        # 末尾追加缺失值的分类结果，编码-1正好取到该位置
+        unique_labels = [self.classify_value(u) for u in uniques]
+        unique_labels.append(self.classify_value(np.nan))
+        labels = np.asarray(unique_labels, dtype=object)[codes]
+        return pd.Series(labels, index=values.index)
+
+
+class HostClassifier:
+    """外部网站域名与网站分类两张规则表"""
+
+    def __init__(self, external_domains=EXTERNAL_DOMAINS, category_rules=WEBSITE_CATEGORY_RULES,
+                 default_category=WEBSITE_DEFAULT_CATEGORY):
+        """
+        Args:
+            external_domains: 外部网站域名（host包含任一域名即为外部网站）
+            category_rules: [(类别, [关键词, ...]), ...]，按顺序优先匹配
+            default_category: 未匹配任何规则时的类别
+        """
+        self.external_domains = list(external_domains)
+        self.category_rules = [(label, list(keywords)) for label, keywords in category_rules]
+        self.default_category = default_category
+        self.external = RuleClassifier([(True, self.external_domains)], default=False)
+        self.categories = RuleClassifier(self.category_rules, default=default_category)
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        从JSON文件读取规则表，格式为
+        {"external_domains": [域名, ...], "category_rules": [[类别, [关键词, ...]], ...], "default_category": 类别}，
+        省略的项使用默认规则
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        unknown = set(rules) - {'external_domains', 'category_rules', 'default_category'}
+        if unknown:
+            raise ValueError(f"网站规则表中有未知的项: {', '.join(sorted(unknown))}")
+        return cls(rules.get('external_domains', EXTERNAL_DOMAINS),
+                   rules.get('category_rules', WEBSITE_CATEGORY_RULES),
+                   rules.get('default_category', WEBSITE_DEFAULT_CATEGORY))
+
+    def to_dict(self):
+        """规则表内容（与from_json的格式相同），用于判断已存储的聚合状态是否使用同一规则表"""
+        return {
+            'external_domains': self.external_domains,
+            'category_rules': [[label, keywords] for label, keywords in self.category_rules],
+            'default_category': self.default_category,
+        }
+
+    def external_mask(self, hosts):
+        """对host列批量判断是否外部网站，返回布尔Series"""
+        return self.external.classify(hosts).astype(bool)
+
+    def website_categories(self, hosts):
+        """对host列批量分类"""
+        return self.categories.classify(hosts)
+
+
+# 默认规则表
+DEFAULT_HOST_CLASSIFIER = HostClassifier()
+
+
+def external_mask(hosts):
+    """按默认规则表对host列批量判断是否外部网站，返回布尔Series"""
+    return DEFAULT_HOST_CLASSIFIER.external_mask(hosts)
+
+
+def website_categories(hosts):
+    """按默认规则表对host列批量分类"""
+    return DEFAULT_HOST_CLASSIFIER.website_categories(hosts)
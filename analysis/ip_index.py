@@ -0,0 +1,78 @@
+"""
+网络监测数据分析与可视化 - IP编码模块
+加载时将点分十进制IP转换为uint32，仅在输出JSON时解码；并提供按/16、/24等前缀的子网汇总
+"""
+
+import ipaddress
+
+import numpy as np
+import pandas as pd
+
+
+# 缺失或无法解析的IP编码为0（0.0.0.0）
+INVALID_IP = 0
+
+
+def _parse_ip(text):
+    try:
+        return int(ipaddress.IPv4Address(str(text)))
+    except ValueError:
+        return INVALID_IP
+
+
+def encode_ips(values):
+    """
+    将IP字符串列编码为uint32数组，每个唯一值只解析一次
+
+    Args:
+        values: IP字符串Series
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    encoded = np.fromiter((_parse_ip(u) for u in uniques), dtype=np.uint32, count=len(uniques))
+    # 末尾追加缺失值的编码，编码-1正好取到该位置
+    encoded = np.append(encoded, np.uint32(INVALID_IP))
+    return encoded[codes]
+
+
+def decode_ips(values):
+    """将uint32数组解码为点分十进制字符串数组"""
+    values = np.asarray(values, dtype=np.uint32)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    labels = np.array([str(ipaddress.IPv4Address(int(v))) for v in uniques], dtype=object)
+    return labels[inverse.reshape(-1)]
+
+
+def decode_index(series):
+    """将以uint32 IP为索引的统计结果转换为以IP字符串为索引"""
+    result = series.copy()
+    result.index = pd.Index(decode_ips(series.index.to_numpy()), name=series.index.name)
+    return result
+
+
+def subnet_mask(prefix):
+    """前缀长度对应的子网掩码"""
+    return np.uint32((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF)
+
+
+def subnet_of(values, prefix):
+    """IP所在子网的网络地址（uint32）"""
+    return np.asarray(values, dtype=np.uint32) & subnet_mask(prefix)
+
+
+def subnet_rollup(series, prefix):
+    """
+    将以uint32 IP为索引的统计结果按子网汇总
+
+    Args:
+        series: 索引为uint32 IP的计数或求和结果
+        prefix: 子网前缀长度，如16、24
+
+    Returns:
+        以'10.50.50.0/24'形式的子网为索引、按网络地址排序的汇总结果
+    """
+    networks = subnet_of(series.index.to_numpy(), prefix)
+    rolled = series.groupby(networks).sum()
+    rolled.index = pd.Index(
+        [f'{label}/{prefix}' for label in decode_ips(rolled.index.to_numpy())], name='subnet'
+    )
+    return rolled
@@ -0,0 +1,606 @@
+"""
+网络监测数据分析与可视化 - 实时监测模块
+持续跟踪当天目录下login/email/tcpLog/weblog文件新追加的行，在滑动时间窗口内增量维护各检测器的状态，
+新发现的威胁以JSON行的形式立即输出；可将已有日期的CSV按加速倍率回放到临时目录，用于本地测试
+"""
+
+import argparse
+import asyncio
+import csv
+import heapq
+import json
+import math
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from host_classifier import DEFAULT_HOST_CLASSIFIER, HostClassifier
+from ip_index import decode_ips
+from log_loader import DATETIME_FORMAT, LOG_SOURCES, parse_log_lines
+from streaming import INTERNAL_EMAIL_DOMAIN, SPAM_CLASSIFIER
+from window_detection import (BRUTE_FORCE_HIGH_THRESHOLD, BRUTE_FORCE_THRESHOLD, BRUTE_FORCE_WINDOW, BURST_KEYS,
+                              NIGHT_THRESHOLD, NIGHT_WINDOW)
+
+
+# 实时跟踪的日志类型（checking为每日汇总记录，不做实时跟踪）
+LIVE_LOG_TYPES = ('login', 'email', 'tcplog', 'weblog')
+
+# 默认滑动窗口长度与时间桶大小（秒）
+DEFAULT_WINDOW = 3600
+DEFAULT_BUCKET = 60
+
+# 轮询文件变化的间隔（秒）
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+def event_time_column(log_type):
+    """日志的事件时间列（login/email/weblog为time，tcpLog为stime）"""
+    return LOG_SOURCES[log_type]['datetimes'][0]
+
+
+class SlidingWindowCounter:
+    """按时间桶累计的滑动窗口计数器，窗口随已见到的最新事件时间前移，过期的桶整体淘汰"""
+
+    def __init__(self, window=DEFAULT_WINDOW, bucket=DEFAULT_BUCKET):
+        """
+        Args:
+            window: 窗口长度（秒）
+            bucket: 时间桶大小（秒）
+        """
+        self.bucket_ns = int(bucket * 1e9)
+        self.n_buckets = max(1, math.ceil(window / bucket))
+        self.latest = None
+        self.buckets = {}
+        self.totals = {}
+        self.sum = 0
+
+    def add(self, times, keys, values):
+        """
+        累计一批事件
+
+        Args:
+            times: 事件时间数组（datetime64）
+            keys: 计数键数组
+            values: 计数增量数组
+
+        Returns:
+            本批涉及且仍在窗口内的键
+        """
+        times = np.asarray(times, dtype='datetime64[ns]')
+        valid = ~np.isnat(times)
+        if not valid.any():
+            return set()
+        buckets = times[valid].astype(np.int64) // self.bucket_ns
+        latest = int(buckets.max())
+        self.latest = latest if self.latest is None else max(self.latest, latest)
+
+        # 早于窗口的迟到事件直接丢弃
+        keep = buckets > self.latest - self.n_buckets
+        grouped = pd.Series(np.asarray(values)[valid][keep]).groupby(
+            [buckets[keep], np.asarray(keys)[valid][keep]]
+        ).sum()
+
+        touched = set()
+        for (bucket, key), value in grouped.items():
+            counts = self.buckets.setdefault(bucket, {})
+            counts[key] = counts.get(key, 0) + value
+            self.totals[key] = self.totals.get(key, 0) + value
+            self.sum += value
+            touched.add(key)
+
+        self._evict()
+        return {key for key in touched if key in self.totals}
+
+    def _evict(self):
+        for bucket in [b for b in self.buckets if b <= self.latest - self.n_buckets]:
+            for key, value in self.buckets.pop(bucket).items():
+                self.totals[key] -= value
+                self.sum -= value
+                if self.totals[key] <= 0:
+                    del self.totals[key]
+
+    def total(self, key):
+        """键在当前窗口内的累计值"""
+        return self.totals.get(key, 0)
+
+    def mean(self):
+        """当前窗口内各键累计值的平均"""
+        return self.sum / len(self.totals) if self.totals else 0
+
+
+class WindowDetector(ABC):
+    """
+    滑动窗口检测器基类
+
+    子类实现select()从一批日志中取出(事件时间, 键, 增量)，thresholds()给出按严重程度升序的阈值；
+    键的窗口累计值超过更高一级阈值时输出一次威胁，回落到最低阈值以下后可再次输出
+    """
+
+    log_type = None
+    threat_type = None
+
+    def __init__(self, window=DEFAULT_WINDOW, bucket=DEFAULT_BUCKET):
+        self.window = window
+        self.counter = SlidingWindowCounter(window, bucket)
+        self.levels = {}
+
+    @abstractmethod
+    def select(self, df):
+        """从一批日志中取出(事件时间, 键, 增量)，缺少所需列时返回None"""
+
+    @staticmethod
+    def _count_rows(times, keys, mask):
+        """取mask选中的行，每行计数1"""
+        mask = np.asarray(mask, dtype=bool)
+        return times.to_numpy()[mask], np.asarray(keys)[mask], np.ones(int(mask.sum()), dtype=np.int64)
+
+    @abstractmethod
+    def thresholds(self):
+        """按严重程度升序的[(阈值, 严重程度)]"""
+
+    @abstractmethod
+    def describe(self, key, total):
+        """威胁记录中描述键的字段"""
+
+    def process(self, df):
+        """处理一批新追加的日志行，返回新发现的威胁列表"""
+        selected = self.select(df)
+        if selected is None:
+            return []
+        times, keys, values = selected
+        if len(keys) == 0:
+            return []
+        touched = self.counter.add(times, keys, values)
+
+        thresholds = self.thresholds()
+        lowest = thresholds[0][0]
+        for key in [k for k in self.levels if self.counter.total(k) <= lowest]:
+            del self.levels[key]
+
+        threats = []
+        event_time = pd.Timestamp(np.asarray(times, dtype='datetime64[ns]').max())
+        for key in touched:
+            total = self.counter.total(key)
+            level = sum(total > threshold for threshold, _ in thresholds)
+            if level > self.levels.get(key, 0):
+                self.levels[key] = level
+                threat = {
+                    'type': self.threat_type,
+                    'severity': thresholds[level - 1][1],
+                    'event_time': event_time.strftime(DATETIME_FORMAT),
+                    'window_seconds': self.window,
+                }
+                threat.update(self.describe(key, total))
+                threats.append(threat)
+        return threats
+
+
+class BurstDetector(WindowDetector):
+    """
+    与批量分析的时间窗口检测（window_detection.detect_bursts）使用相同键、窗口与阈值的登录检测器：
+    按(用户, 源IP, 目的IP)计数，窗口长度与阈值由构造参数给出，不使用监测的公共窗口
+    """
+
+    log_type = 'login'
+    default_threshold = None
+    default_window = None
+
+    def __init__(self, window=DEFAULT_WINDOW, bucket=DEFAULT_BUCKET, threshold=None, burst_window=None):
+        """
+        Args:
+            window: 监测的公共窗口长度（秒），本检测器不使用
+            threshold: 窗口内事件数阈值，None表示与批量分析的默认值相同
+            burst_window: 检测窗口（pd.Timedelta），None表示与批量分析的默认值相同
+        """
+        burst_window = self.default_window if burst_window is None else burst_window
+        super().__init__(int(burst_window.total_seconds()), bucket)
+        self.threshold = self.default_threshold if threshold is None else threshold
+
+    @abstractmethod
+    def mask(self, df):
+        """参与计数的行"""
+
+    def select(self, df):
+        if not set(BURST_KEYS) <= set(df.columns):
+            return None
+        mask = np.asarray(self.mask(df), dtype=bool)
+        keys = np.empty(int(mask.sum()), dtype=object)
+        keys[:] = list(zip(df['user'].astype(str)[mask], df['sip'].to_numpy()[mask], df['dip'].to_numpy()[mask]))
+        return df['time'].to_numpy()[mask], keys, np.ones(len(keys), dtype=np.int64)
+
+    def _fields(self, key, total):
+        user, sip, dip = key
+        return {'user': user, 'sip': decode_ips([sip])[0], 'dip': decode_ips([dip])[0], 'count': int(total)}
+
+
+class BruteForceDetector(BurstDetector):
+    """窗口内登录失败次数过多的(用户, 源IP, 目的IP)"""
+
+    threat_type = '暴力破解'
+    default_threshold = BRUTE_FORCE_THRESHOLD
+    default_window = BRUTE_FORCE_WINDOW
+
+    def mask(self, df):
+        return df['state'] == 'error'
+
+    def thresholds(self):
+        return [(self.threshold, 'medium'), (max(self.threshold, BRUTE_FORCE_HIGH_THRESHOLD), 'high')]
+
+    def describe(self, key, total):
+        fields = self._fields(key, total)
+        fields['description'] = f"用户 {fields['user']} 从 {fields['sip']} 登录 {fields['dip']} 失败 {total} 次"
+        return fields
+
+
+class NightLoginDetector(BurstDetector):
+    """窗口内凌晨(0-6点)登录次数过多的(用户, 源IP, 目的IP)"""
+
+    threat_type = '非工作时间活动'
+    default_threshold = NIGHT_THRESHOLD
+    default_window = NIGHT_WINDOW
+
+    def mask(self, df):
+        hours = df['time'].dt.hour
+        return (hours >= 0) & (hours < 6)
+
+    def thresholds(self):
+        return [(self.threshold, 'medium')]
+
+    def describe(self, key, total):
+        fields = self._fields(key, total)
+        fields['description'] = f"用户 {fields['user']} 从 {fields['sip']} 登录 {fields['dip']} 在凌晨(0-6点)登录 {total} 次"
+        return fields
+
+
+class HeavySenderDetector(WindowDetector):
+    """窗口内发送邮件过多的内部账户"""
+
+    log_type = 'email'
+    threat_type = '异常邮件发送'
+
+    def select(self, df):
+        if 'from' not in df.columns:
+            return None
+        is_internal = df['from'].str.contains(INTERNAL_EMAIL_DOMAIN, na=False).astype(bool)
+        return self._count_rows(df['time'], df['from'], is_internal)
+
+    def thresholds(self):
+        return [(50, 'medium')]
+
+    def describe(self, key, total):
+        return {'description': f'{key} 发送了 {total} 封邮件', 'user': str(key), 'count': int(total)}
+
+
+class SpamDetector(WindowDetector):
+    """窗口内垃圾邮件总数过多"""
+
+    log_type = 'email'
+    threat_type = '垃圾邮件攻击'
+
+    def select(self, df):
+        if 'subject' not in df.columns:
+            return None
+        # 垃圾邮件只统计总数，所有行使用同一个键
+        is_spam = SPAM_CLASSIFIER.classify(df['subject']).astype(bool)
+        return self._count_rows(df['time'], np.zeros(len(df), dtype=np.int64), is_spam)
+
+    def thresholds(self):
+        return [(100, 'high')]
+
+    def describe(self, key, total):
+        return {'description': f'检测到 {total} 封垃圾邮件', 'count': int(total)}
+
+
+class TrafficDetector(WindowDetector):
+    """窗口内流量超过各源IP平均流量3倍的IP"""
+
+    log_type = 'tcplog'
+    threat_type = '异常流量'
+
+    def select(self, df):
+        if 'uplink_length' not in df.columns:
+            return None
+        traffic = (df['uplink_length'].to_numpy(dtype=np.int64, na_value=0)
+                   + df['downlink_length'].to_numpy(dtype=np.int64, na_value=0))
+        return df['stime'].to_numpy(), df['sip'].to_numpy(), traffic
+
+    def thresholds(self):
+        avg_traffic = self.counter.mean()
+        return [(avg_traffic * 3, 'medium'), (avg_traffic * 5, 'high')]
+
+    def describe(self, key, total):
+        ip = decode_ips([key])[0]
+        return {
+            'description': f'IP {ip} 产生异常流量 {total/(1024**2):.2f} MB',
+            'ip': ip,
+            'traffic_mb': float(total / (1024**2)),
+        }
+
+
+class ExternalAccessDetector(WindowDetector):
+    """窗口内访问外部网站过于频繁的IP"""
+
+    log_type = 'weblog'
+    threat_type = '频繁访问外部网站'
+
+    def __init__(self, window=DEFAULT_WINDOW, bucket=DEFAULT_BUCKET, threshold=200, host_classifier=None):
+        """
+        Args:
+            threshold: 窗口内外部网站访问次数阈值
+            host_classifier: 外部网站规则表（HostClassifier），None表示默认规则表
+        """
+        super().__init__(window, bucket)
+        self.threshold = threshold
+        self.host_classifier = host_classifier or DEFAULT_HOST_CLASSIFIER
+
+    def select(self, df):
+        if 'host' not in df.columns or 'sip' not in df.columns:
+            return None
+        return self._count_rows(df['time'], df['sip'], self.host_classifier.external_mask(df['host']))
+
+    def thresholds(self):
+        return [(self.threshold, 'medium')]
+
+    def describe(self, key, total):
+        ip = decode_ips([key])[0]
+        return {'description': f'IP {ip} 访问外部网站 {total} 次', 'ip': ip, 'count': int(total)}
+
+
+# 实时检测器
+LIVE_DETECTORS = [
+    BruteForceDetector,
+    NightLoginDetector,
+    HeavySenderDetector,
+    SpamDetector,
+    TrafficDetector,
+    ExternalAccessDetector,
+]
+
+
+def complete_lines_end(data):
+    """
+    返回data中最后一个不在引号内的换行符之后的位置，没有完整的行时返回0
+
+    data须从一行的开头开始；引号内的换行属于字段内容，不作为行的边界（GBK与UTF-8的多字节字符中不含引号与换行的字节）
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    outside = np.cumsum(buf == ord('"')) % 2 == 0
+    ends = np.flatnonzero((buf == ord('\n')) & outside)
+    return int(ends[-1]) + 1 if len(ends) else 0
+
+
+def _read_from(path, position):
+    """读取文件从position开始新追加的内容，文件变短（被重建）时返回None"""
+    if path.stat().st_size < position:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(position)
+        return f.read()
+
+
+async def tail_log(path, log_type, stop, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    跟踪日志文件新追加的完整行，逐批产出解析后的DataFrame
+
+    文件不存在时等待其出现；文件变短（被重建）时从头重新读取；stop被设置后读完剩余内容即退出。
+    读文件与解析在线程中执行，不阻塞事件循环中的其他日志；无法解析的一批行报告到stderr后跳过，继续跟踪
+
+    Args:
+        path: CSV文件路径
+        log_type: LOG_SOURCES中的日志类型
+        stop: asyncio.Event，设置后停止跟踪
+        poll_interval: 轮询间隔（秒）
+    """
+    path = Path(path)
+    encoding = LOG_SOURCES[log_type]['encoding']
+    columns = None
+    position = 0
+    pending = b''
+
+    while True:
+        stopping = stop.is_set()
+        if path.exists():
+            data = await asyncio.to_thread(_read_from, path, position)
+            if data is None:
+                columns, position, pending = None, 0, b''
+                data = await asyncio.to_thread(_read_from, path, position)
+            position += len(data)
+            pending += data
+
+            # 只处理以引号外的换行结束的完整行，未写完的行留到下次
+            end = complete_lines_end(pending)
+            if end:
+                lines, pending = pending[:end], pending[end:]
+                text = lines.decode(encoding, errors='replace')
+                if columns is None:
+                    header, _, text = text.partition('\n')
+                    columns = header.strip().split(',')
+                if text.strip():
+                    try:
+                        df = await asyncio.to_thread(parse_log_lines, text, columns, log_type)
+                    except (pd.errors.ParserError, ValueError) as e:
+                        print(f"{path}: 跳过无法解析的 {len(lines)} 字节: {e}", file=sys.stderr)
+                    else:
+                        yield df
+        if stopping:
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def emit_threat(threat, output):
+    """以JSON行的形式输出一条威胁"""
+    record = {'detected_at': datetime.now().strftime(DATETIME_FORMAT)}
+    record.update(threat)
+    output.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    output.flush()
+
+
+async def monitor_day(day_dir, stop, output=sys.stdout, window=DEFAULT_WINDOW, bucket=DEFAULT_BUCKET,
+                      poll_interval=DEFAULT_POLL_INTERVAL, options=None):
+    """
+    实时监测某天目录下的日志文件，直到stop被设置
+
+    Args:
+        day_dir: 当天日志目录
+        stop: asyncio.Event，设置后读完剩余内容即结束
+        output: 威胁JSON行的输出流
+        window: 滑动窗口长度（秒）
+        bucket: 时间桶大小（秒）
+        poll_interval: 轮询间隔（秒）
+        options: 检测器类 -> 额外的构造参数，如BruteForceDetector的threshold与burst_window
+
+    Returns:
+        各类日志处理的行数
+    """
+    options = options or {}
+    detectors = {log_type: [] for log_type in LIVE_LOG_TYPES}
+    for detector_class in LIVE_DETECTORS:
+        detectors[detector_class.log_type].append(detector_class(window, bucket, **options.get(detector_class, {})))
+    rows = {log_type: 0 for log_type in LIVE_LOG_TYPES}
+
+    async def follow(log_type):
+        path = Path(day_dir) / LOG_SOURCES[log_type]['file']
+        async for df in tail_log(path, log_type, stop, poll_interval):
+            rows[log_type] += len(df)
+            for detector in detectors[log_type]:
+                for threat in detector.process(df):
+                    emit_threat(threat, output)
+
+    await asyncio.gather(*(follow(log_type) for log_type in LIVE_LOG_TYPES))
+    return rows
+
+
+async def replay_day(source_dir, target_dir, speed):
+    """
+    将某天的CSV按事件时间顺序、以speed倍速追加写入target_dir，模拟日志实时产生
+
+    Args:
+        source_dir: 已有的日期目录
+        target_dir: 回放写入的目录
+        speed: 加速倍率，如3600表示一小时的日志在一秒内写完
+    """
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    outputs = {}
+    writers = {}
+    for log_type in LIVE_LOG_TYPES:
+        source_file = Path(source_dir) / LOG_SOURCES[log_type]['file']
+        if not source_file.exists():
+            continue
+        # 按CSV记录读取，引号内的逗号与换行不会拆分字段
+        encoding = LOG_SOURCES[log_type]['encoding']
+        with open(source_file, encoding=encoding, errors='replace', newline='') as f:
+            header, *records = [record for record in csv.reader(f) if record]
+        time_index = header.index(event_time_column(log_type))
+        times = pd.to_datetime(
+            [record[time_index] if len(record) > time_index else None for record in records],
+            format=DATETIME_FORMAT, errors='coerce'
+        )
+        seconds = times.to_numpy(dtype='datetime64[s]').astype(np.int64).astype(np.float64)
+        seconds[times.isna()] = np.nan
+        rows.append([(t, log_type, record) for t, record in zip(seconds, records)])
+        outputs[log_type] = open(target_dir / source_file.name, 'w', encoding=encoding, errors='replace', newline='')
+        writers[log_type] = csv.writer(outputs[log_type], lineterminator='\n')
+        writers[log_type].writerow(header)
+        outputs[log_type].flush()
+
+    # 多个文件按事件时间归并，无法解析时间的行跟随前一行写出
+    merged = heapq.merge(*(
+        [(-np.inf if np.isnan(t) else t, i, log_type, record)
+         for i, (t, log_type, record) in enumerate(day_rows)]
+        for day_rows in rows
+    ), key=lambda row: row[0])
+
+    start_wall = time.monotonic()
+    start_event = None
+    try:
+        for event_time, _, log_type, record in merged:
+            if np.isfinite(event_time):
+                if start_event is None:
+                    start_event = event_time
+                delay = (event_time - start_event) / speed - (time.monotonic() - start_wall)
+                if delay > 0:
+                    for f in outputs.values():
+                        f.flush()
+                    await asyncio.sleep(delay)
+            writers[log_type].writerow(record)
+    finally:
+        for f in outputs.values():
+            f.close()
+
+
+async def run_replay(source_dir, speed, output, window, bucket, poll_interval, replay_dir=None, options=None):
+    """回放已有日期的日志并同时实时监测，回放结束且全部行处理完后返回"""
+    with tempfile.TemporaryDirectory(dir=replay_dir) as target_dir:
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(
+            monitor_day(target_dir, stop, output, window, bucket, poll_interval, options)
+        )
+        await replay_day(source_dir, target_dir, speed)
+        stop.set()
+        return await monitor
+
+
+if __name__ == '__main__':
+    data_dir = Path(__file__).parent.parent / '选题二——企业日志数据'
+
+    parser = argparse.ArgumentParser(description='网络监测数据实时监测')
+    parser.add_argument('--date', default=date.today().isoformat(),
+                        help='监测的日期目录（YYYY-MM-DD），默认当天')
+    parser.add_argument('--replay', action='store_true',
+                        help='将--date对应的已有日志按加速倍率回放到临时目录并监测，用于本地测试')
+    parser.add_argument('--speed', type=float, default=3600, help='回放加速倍率')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help='滑动窗口长度（秒）')
+    parser.add_argument('--bucket', type=int, default=DEFAULT_BUCKET, help='时间桶大小（秒）')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help='文件轮询间隔（秒）')
+    parser.add_argument('--output', default=None, help='威胁JSON行的输出文件，默认标准输出')
+    parser.add_argument('--brute-force-threshold', type=int, default=BRUTE_FORCE_THRESHOLD,
+                        help='暴力破解检测：同一(用户, 源IP, 目的IP)在窗口内登录失败超过该次数（与批量分析相同）')
+    parser.add_argument('--brute-force-window', type=float, default=BRUTE_FORCE_WINDOW.total_seconds() / 60,
+                        help='暴力破解检测的时间窗口（分钟）')
+    parser.add_argument('--night-threshold', type=int, default=NIGHT_THRESHOLD,
+                        help='凌晨登录检测：同一(用户, 源IP, 目的IP)在窗口内凌晨(0-6点)登录超过该次数')
+    parser.add_argument('--night-window', type=float, default=NIGHT_WINDOW.total_seconds() / 60,
+                        help='凌晨登录检测的时间窗口（分钟）')
+    parser.add_argument('--host-rules', default=None,
+                        help='外部网站域名与网站分类规则表的JSON文件（与批量分析相同），默认使用内置规则表')
+    args = parser.parse_args()
+    options = {
+        BruteForceDetector: {'threshold': args.brute_force_threshold,
+                             'burst_window': pd.Timedelta(minutes=args.brute_force_window)},
+        NightLoginDetector: {'threshold': args.night_threshold,
+                             'burst_window': pd.Timedelta(minutes=args.night_window)},
+    }
+    if args.host_rules:
+        options[ExternalAccessDetector] = {'host_classifier': HostClassifier.from_json(args.host_rules)}
+
+    day_dir = data_dir / args.date
+    output = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.replay:
+            rows = asyncio.run(run_replay(
+                day_dir, args.speed, output, args.window, args.bucket, args.poll_interval, options=options
+            ))
+            print(f"回放完成: {rows}", file=sys.stderr)
+        else:
+            print(f"开始监测 {day_dir}，按Ctrl+C结束", file=sys.stderr)
+            try:
+                asyncio.run(monitor_day(
+                    day_dir, asyncio.Event(), output, args.window, args.bucket, args.poll_interval, options
+                ))
+            except KeyboardInterrupt:
+                pass
+    finally:
+        if args.output:
+            output.close()
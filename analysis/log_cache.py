@@ -0,0 +1,134 @@
+"""
+网络监测数据分析与可视化 - 列式缓存模块
+将逐日CSV的解析结果缓存为Parquet文件，避免每次运行重复解析原始日志
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+
+# 缓存格式版本，解析逻辑变化时递增以使旧缓存整体失效
+CACHE_VERSION = 5
+
+
+def file_fingerprint(source_path):
+    """源文件指纹：大小与修改时间"""
+    stat = Path(source_path).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_cached(source_path, reader, cache_file=None, cache_entry=None):
+    """
+    读取源文件，指纹与缓存记录一致时直接加载Parquet，否则调用reader解析并写入缓存
+
+    Args:
+        source_path: 原始CSV路径
+        reader: 无参函数，返回解析后的DataFrame
+        cache_file: 缓存文件路径，None表示不使用缓存
+        cache_entry: 缓存清单中该文件的记录
+
+    Returns:
+        (DataFrame, 源文件指纹, 是否命中缓存)
+    """
+    fingerprint = file_fingerprint(source_path)
+    if cache_file is None:
+        return reader(), fingerprint, False
+
+    cache_file = Path(cache_file)
+    if cache_entry is not None and cache_entry['fingerprint'] == fingerprint and cache_file.exists():
+        try:
+            return pd.read_parquet(cache_file), fingerprint, True
+        except Exception:
+            # 缓存文件损坏时退回到解析CSV
+            pass
+
+    df = reader()
+    tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+    df.to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, cache_file)
+
+    return df, fingerprint, False
+
+
+class ColumnarCache:
+    """按源文件路径、大小和修改时间索引的Parquet缓存"""
+
+    MANIFEST_NAME = 'manifest.json'
+
+    def __init__(self, cache_dir, enabled=True, rebuild=False):
+        """
+        初始化列式缓存
+
+        Args:
+            cache_dir: 缓存目录路径
+            enabled: 是否启用缓存，False时直接解析CSV且不读写缓存
+            rebuild: 是否忽略已有缓存并全部重新生成
+        """
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+        self.rebuild = rebuild
+        self.hits = 0
+        self.misses = 0
+
+        if self.enabled and importlib.util.find_spec('pyarrow') is None:
+            print("未安装pyarrow，列式缓存已禁用")
+            self.enabled = False
+
+        self.manifest = {}
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if not self.rebuild:
+                self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        """读取缓存清单，版本不一致时视为空"""
+        manifest_path = self.cache_dir / self.MANIFEST_NAME
+        if not manifest_path.exists():
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != CACHE_VERSION:
+            return {}
+        return manifest.get('entries', {})
+
+    def save_manifest(self):
+        """写回缓存清单"""
+        if not self.enabled:
+            return
+        manifest_path = self.cache_dir / self.MANIFEST_NAME
+        tmp_path = manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.manifest},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def plan(self, source_path):
+        """
+        查询源文件对应的缓存位置与清单记录，供load_cached使用
+
+        Returns:
+            (缓存键, 缓存文件路径或None, 清单记录或None)
+        """
+        key = str(Path(source_path).resolve())
+        if not self.enabled:
+            return key, None, None
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return key, self.cache_dir / f'{digest}.parquet', self.manifest.get(key)
+
+    def record(self, key, cache_file, fingerprint, hit):
+        """登记一次读取结果并更新命中统计"""
+        if not self.enabled:
+            return
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.manifest[key] = {'fingerprint': fingerprint, 'file': Path(cache_file).name}
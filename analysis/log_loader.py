@@ -0,0 +1,174 @@
+"""
+网络监测数据分析与可视化 - 日志加载模块
+定义各类日志的字段类型，并在读取时一次性完成类型转换与时间解析
+"""
+
+import io
+
+import pandas as pd
+
+from ip_index import encode_ips
+from log_cache import load_cached
+
+
+# 日志时间字段的固定格式
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 各类日志的文件名、编码与字段类型
+# dtypes: 读取CSV时指定的列类型（端口为UInt16）；整数列为可空类型，空单元格读取为缺失值而不会使整个文件加载失败，
+#         缺失的流量长度在统计时计为0
+# datetimes: 读取后按固定格式解析的时间列（无法解析的值置为NaT）
+# categories: 合并所有日期后转换为分类类型的列（重复取值多的字符串列，如协议、用户、邮箱、日期）
+# ips: 读取后编码为uint32的IP列
+LOG_SOURCES = {
+    'login': {
+        'file': 'login.csv',
+        'encoding': 'utf-8',
+        'label': 'Login',
+        'attr': 'login_df',
+        'dtypes': {
+            'proto': 'str', 'dip': 'str', 'dport': 'UInt16', 'sip': 'str',
+            'sport': 'UInt16', 'state': 'str', 'user': 'str',
+        },
+        'datetimes': ['time'],
+        'categories': ['proto', 'state', 'user'],
+        'ips': ['sip', 'dip'],
+    },
+    'weblog': {
+        'file': 'weblog.csv',
+        'encoding': 'utf-8',
+        'label': 'Weblog',
+        'attr': 'weblog_df',
+        'dtypes': {
+            'sip': 'str', 'sport': 'UInt16', 'dip': 'str', 'dport': 'UInt16', 'host': 'str',
+        },
+        'datetimes': ['time'],
+        'categories': ['host'],
+        'ips': ['sip', 'dip'],
+    },
+    'tcplog': {
+        'file': 'tcpLog.csv',
+        'encoding': 'utf-8',
+        'label': 'Tcplog',
+        'attr': 'tcplog_df',
+        'dtypes': {
+            'proto': 'str', 'dip': 'str', 'dport': 'UInt16', 'sip': 'str', 'sport': 'UInt16',
+            'uplink_length': 'Int64', 'downlink_length': 'Int64',
+        },
+        'datetimes': ['stime', 'dtime'],
+        'categories': ['proto'],
+        'ips': ['sip', 'dip'],
+    },
+    'email': {
+        'file': 'email.csv',
+        'encoding': 'gbk',
+        'label': 'Email',
+        'attr': 'email_df',
+        'dtypes': {
+            'proto': 'str', 'sip': 'str', 'sport': 'UInt16', 'dip': 'str', 'dport': 'UInt16',
+            'from': 'str', 'to': 'str', 'subject': 'str',
+        },
+        'datetimes': ['time'],
+        'categories': ['proto', 'from', 'to'],
+        'ips': ['sip', 'dip'],
+    },
+    'checking': {
+        'file': 'checking.csv',
+        'encoding': 'utf-8',
+        'label': 'Checking',
+        'attr': 'checking_df',
+        'dtypes': {'id': 'Int32', 'day': 'str'},
+        'datetimes': ['checkin', 'checkout'],
+        'categories': ['day'],
+        'ips': [],
+    },
+}
+
+
+def read_log_csv(path, log_type):
+    """
+    按日志类型的字段定义读取单个CSV
+
+    Args:
+        path: CSV文件路径
+        log_type: LOG_SOURCES中的日志类型
+    """
+    source = LOG_SOURCES[log_type]
+    df = pd.read_csv(path, encoding=source['encoding'], dtype=source['dtypes'])
+    return _convert_columns(df, source)
+
+
+def iter_log_csv(path, log_type, chunksize):
+    """
+    按块读取单个CSV，每块的字段类型与read_log_csv一致
+
+    Args:
+        path: CSV文件路径
+        log_type: LOG_SOURCES中的日志类型
+        chunksize: 每块的行数
+    """
+    source = LOG_SOURCES[log_type]
+    reader = pd.read_csv(path, encoding=source['encoding'], dtype=source['dtypes'],
+                         chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield _convert_columns(chunk, source)
+
+
+def parse_log_lines(text, columns, log_type):
+    """
+    解析追加到日志文件末尾的若干完整行（不含表头），字段类型与read_log_csv一致
+
+    Args:
+        text: 已解码的若干完整CSV行
+        columns: 文件表头中的列名
+        log_type: LOG_SOURCES中的日志类型
+    """
+    source = LOG_SOURCES[log_type]
+    dtypes = {col: dtype for col, dtype in source['dtypes'].items() if col in columns}
+    df = pd.read_csv(io.StringIO(text), names=columns, header=None, dtype=dtypes)
+    return _convert_columns(df, source)
+
+
+def _convert_columns(df, source):
+    """按固定格式解析时间列，并将IP列编码为uint32"""
+    for col in source['datetimes']:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=DATETIME_FORMAT, errors='coerce')
+    for col in source['ips']:
+        if col in df.columns:
+            df[col] = encode_ips(df[col])
+    return df
+
+
+def load_log_file(path, log_type, cache_file=None, cache_entry=None):
+    """
+    加载单个日志文件，可在线程池或进程池中执行
+
+    Args:
+        path: CSV文件路径
+        log_type: LOG_SOURCES中的日志类型
+        cache_file: 对应的缓存文件路径，None表示不使用缓存
+        cache_entry: 缓存清单中该文件的记录
+
+    Returns:
+        (DataFrame, 源文件指纹, 是否命中缓存)
+    """
+    return load_cached(path, lambda: read_log_csv(path, log_type), cache_file, cache_entry)
+
+
+def empty_log_frame(log_type):
+    """没有记录的日志DataFrame，列与字段类型与read_log_csv一致（用于未加载的日志）"""
+    source = LOG_SOURCES[log_type]
+    columns = {col: pd.Series(dtype=dtype) for col, dtype in source['dtypes'].items()}
+    columns.update({col: pd.Series(dtype='datetime64[ns]') for col in source['datetimes']})
+    columns.update({col: pd.Series(dtype='uint32') for col in source['ips']})
+    return pd.DataFrame(columns)
+
+
+def apply_categories(df, log_type):
+    """合并后将低基数字符串列转换为分类类型"""
+    for col in LOG_SOURCES[log_type]['categories']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
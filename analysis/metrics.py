@@ -0,0 +1,267 @@
+"""
+网络监测数据分析与可视化 - 运行指标模块
+记录各分析阶段与每个文件读取的墙钟时间、CPU时间、处理行数、每秒行数与内存，以及加载后各DataFrame按列的内存占用，
+写入output/run_metrics.json，可另外写出Prometheus文本格式文件；可选对每个阶段做cProfile分析
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Windows下没有resource模块，不记录进程内存峰值
+    resource = None
+
+
+# Prometheus指标名前缀
+METRIC_PREFIX = 'log_analysis'
+
+
+def max_rss_mb():
+    """进程内存占用峰值（MB），不支持时为None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return rss / 1024**2 if sys.platform == 'darwin' else rss / 1024
+
+
+def current_rss_mb():
+    """进程当前内存占用（MB），只在Linux下可用，否则为None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024**2
+
+
+def measure_call(func, *args):
+    """
+    调用func并记录墙钟时间与本线程CPU时间，可在线程池或进程池中执行
+
+    Returns:
+        (func的返回值, {'wall_seconds', 'cpu_seconds'})
+    """
+    wall, cpu = time.perf_counter(), time.thread_time()
+    result = func(*args)
+    return result, {'wall_seconds': time.perf_counter() - wall, 'cpu_seconds': time.thread_time() - cpu}
+
+
+def frame_memory(df):
+    """
+    DataFrame各列的内存占用（字符串等按实际大小计算）
+
+    Returns:
+        dict: rows, total_mb, bytes_per_row（行数为0时为None）,
+              columns（列名 -> {'dtype', 'mb'}）
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    total = int(usage.sum())
+    return {
+        'rows': len(df),
+        'total_mb': total / 1024**2,
+        'bytes_per_row': total / len(df) if len(df) else None,
+        'columns': {col: {'dtype': str(df[col].dtype), 'mb': int(usage[col]) / 1024**2} for col in df.columns},
+    }
+
+
+def _rate(rows, seconds):
+    if rows is None or seconds <= 0:
+        return None
+    return rows / seconds
+
+
+class RunMetrics:
+    """一次分析运行的指标"""
+
+    def __init__(self, trace_memory=False, profile_dir=None):
+        """
+        Args:
+            trace_memory: 是否用tracemalloc记录每个阶段的内存分配峰值（会增加耗时）
+            profile_dir: 每个阶段的cProfile结果（.prof）保存目录，None表示不做分析
+        """
+        self.trace_memory = trace_memory
+        self.profile_dir = Path(profile_dir) if profile_dir is not None else None
+        self.started = datetime.now()
+        self.stages = {}
+        self.files = []
+        self.frames = {}
+        self.run = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @property
+    def sequential(self):
+        """tracemalloc与cProfile按进程/线程统计，开启时各阶段需按顺序执行才能区分"""
+        return self.trace_memory or self.profile_dir is not None
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None, process_cpu=False):
+        """
+        记录一个阶段，可在多个线程中同时使用
+
+        Args:
+            name: 阶段名称
+            rows: 处理的行数，也可在阶段结束后用set_rows补充
+            process_cpu: CPU时间按整个进程统计（阶段内部使用线程池时），默认只统计本线程
+        """
+        cpu_time = time.process_time if process_cpu else time.thread_time
+        profiler = None
+        if self.profile_dir is not None:
+            profiler = cProfile.Profile()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced_before, _ = tracemalloc.get_traced_memory()
+        rss_before = current_rss_mb()
+        wall, cpu = time.perf_counter(), cpu_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record = {
+                'wall_seconds': time.perf_counter() - wall,
+                'cpu_seconds': cpu_time() - cpu,
+                'rows': rows,
+                'max_rss_mb': max_rss_mb(),
+            }
+            rss_after = current_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                record['rss_delta_mb'] = rss_after - rss_before
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['tracemalloc_peak_mb'] = (peak - traced_before) / 1024**2
+                record['tracemalloc_delta_mb'] = (current - traced_before) / 1024**2
+            if profiler is not None:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                profile_file = self.profile_dir / f'{name}.prof'
+                profiler.dump_stats(profile_file)
+                record['profile'] = str(profile_file)
+            with self._lock:
+                self.stages[name] = record
+
+    def reorder(self, names):
+        """按names的顺序排列已记录的阶段"""
+        self.stages = {name: self.stages[name] for name in names if name in self.stages}
+
+    def set_rows(self, name, rows):
+        """补充某个阶段处理的行数"""
+        if name in self.stages:
+            self.stages[name]['rows'] = rows
+
+    def record_file(self, date_str, log_type, file, timing, rows, cache_hit=None):
+        """
+        记录一次文件读取
+
+        Args:
+            timing: measure_call返回的计时
+            rows: 读取的行数
+            cache_hit: 是否命中列式缓存，流式读取时为None
+        """
+        with self._lock:
+            self.files.append({
+                'date': date_str,
+                'log_type': log_type,
+                'file': file,
+                **timing,
+                'rows': rows,
+                'rows_per_sec': _rate(rows, timing['wall_seconds']),
+                'cache_hit': cache_hit,
+            })
+
+    def record_frames(self, frames):
+        """
+        记录加载后各DataFrame的内存占用
+
+        Args:
+            frames: 名称（日志类型）-> DataFrame
+        """
+        self.frames = {name: frame_memory(df) for name, df in frames.items()}
+
+    def finish(self, **info):
+        """结束本次运行，info为附加的运行信息（如关键路径耗时、运行模式）"""
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.run = {
+            'started': self.started.isoformat(),
+            'wall_seconds': time.perf_counter() - self._start,
+            'cpu_seconds': time.process_time() - self._cpu_start,
+            'max_rss_mb': max_rss_mb(),
+            **info,
+        }
+
+    def to_dict(self):
+        stages = []
+        for name, record in self.stages.items():
+            stages.append({
+                'name': name,
+                **record,
+                'rows_per_sec': _rate(record['rows'], record['wall_seconds']),
+            })
+        return {'run': self.run, 'stages': stages, 'files': self.files, 'frames': self.frames}
+
+    def write_json(self, path):
+        """写出JSON格式的指标"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+
+    def write_prometheus(self, path):
+        """写出Prometheus文本格式的指标（先写临时文件再替换，供node_exporter的textfile收集器读取）"""
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f'# HELP {METRIC_PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} gauge')
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f'{METRIC_PREFIX}_{name}{{{label_text}}} {value}' if label_text
+                             else f'{METRIC_PREFIX}_{name} {value}')
+
+        metric('run_wall_seconds', '完整分析的墙钟时间', [({}, self.run.get('wall_seconds'))])
+        metric('run_cpu_seconds', '完整分析的进程CPU时间', [({}, self.run.get('cpu_seconds'))])
+        metric('run_max_rss_bytes', '进程内存占用峰值',
+               [({}, self.run['max_rss_mb'] * 1024**2 if self.run.get('max_rss_mb') is not None else None)])
+
+        stages = self.to_dict()['stages']
+        for key, name, help_text in [
+            ('wall_seconds', 'stage_wall_seconds', '分析阶段的墙钟时间'),
+            ('cpu_seconds', 'stage_cpu_seconds', '分析阶段的CPU时间'),
+            ('rows', 'stage_rows', '分析阶段处理的行数'),
+            ('rows_per_sec', 'stage_rows_per_second', '分析阶段每秒处理的行数'),
+        ]:
+            metric(name, help_text, [({'stage': stage['name']}, stage[key]) for stage in stages])
+
+        for key, name, help_text in [
+            ('wall_seconds', 'file_read_seconds', '单个日志文件的读取时间'),
+            ('rows', 'file_rows', '单个日志文件的行数'),
+        ]:
+            metric(name, help_text, [
+                ({'date': entry['date'], 'log_type': entry['log_type']}, entry[key]) for entry in self.files
+            ])
+
+        metric('frame_bytes', '加载后各类日志DataFrame的内存占用', [
+            ({'log_type': name}, round(frame['total_mb'] * 1024**2)) for name, frame in self.frames.items()
+        ])
+
+        path = Path(path)
+        tmp_file = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_file, path)
@@ -0,0 +1,198 @@
+"""
+网络监测数据分析与可视化 - OLAP立方体模块
+将各维度取值编码为整数后组合成一个键，用np.bincount一次得到稠密的多维计数/求和数组；
+立方体可跨块、跨天合并，支持上卷（rollup）、切片（slice）、切块（dice），并可保存为.npz文件，
+各类按小时、协议、日期、子网的汇总与下钻查询都从立方体得到，无需再访问逐行数据
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# 每个立方体都有的计数度量，用于判断单元格是否有记录
+COUNT = 'count'
+
+
+def _labels(uniques):
+    """维度取值的索引，分类类型转为普通索引以便合并"""
+    if isinstance(uniques.dtype, pd.CategoricalDtype):
+        return pd.Index(np.asarray(uniques, dtype=object))
+    return pd.Index(uniques)
+
+
+def time_dims(times):
+    """
+    时间列拆分为日期与小时两个维度
+
+    Returns:
+        (datetime64[D]数组, 小时的float数组)，时间缺失时分别为NaT与NaN
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    days = times.astype('datetime64[D]')
+    return days, np.floor((times - days) / np.timedelta64(1, 'h'))
+
+
+class Cube:
+    """稠密多维立方体：每个维度一个取值索引，每个度量一个与各维长度同形的int64数组"""
+
+    def __init__(self, dims, measures):
+        """
+        Args:
+            dims: 维度名称 -> 取值索引（pd.Index，缺失值为NaN/NaT），按数组轴的顺序
+            measures: 度量名称 -> int64数组，必须包含count
+        """
+        self.dims = dict(dims)
+        self.measures = dict(measures)
+
+    @classmethod
+    def build(cls, dims, measures=None):
+        """
+        从逐行数据构建立方体
+
+        Args:
+            dims: 维度名称 -> 每行的取值（Series或数组，缺失值单独作为一个取值）
+            measures: 度量名称 -> 每行的数值（按维度求和），count总是自动计算
+
+        Returns:
+            Cube
+        """
+        codes = []
+        labels = {}
+        for name, values in dims.items():
+            dim_codes, uniques = pd.factorize(values, sort=True, use_na_sentinel=False)
+            codes.append(dim_codes)
+            labels[name] = _labels(uniques)
+
+        shape = tuple(len(index) for index in labels.values())
+        size = int(np.prod(shape))
+        keys = np.ravel_multi_index(codes, shape) if codes else np.zeros(0, dtype=np.int64)
+
+        result = {COUNT: np.bincount(keys, minlength=size).reshape(shape).astype(np.int64)}
+        for name, values in (measures or {}).items():
+            weights = np.asarray(values, dtype=np.float64)
+            result[name] = np.bincount(keys, weights=weights, minlength=size).reshape(shape).astype(np.int64)
+        return cls(labels, result)
+
+    @property
+    def shape(self):
+        return tuple(len(index) for index in self.dims.values())
+
+    def _axis(self, name):
+        return list(self.dims).index(name)
+
+    def merge(self, other):
+        """
+        合并另一个相同维度与度量的立方体，各维取值取并集
+
+        Returns:
+            新的Cube
+        """
+        dims = {name: index.union(other.dims[name]) for name, index in self.dims.items()}
+        shape = tuple(len(index) for index in dims.values())
+        positions = [
+            [dims[name].get_indexer(cube.dims[name]) for name in dims] for cube in (self, other)
+        ]
+        measures = {}
+        for name in self.measures:
+            merged = np.zeros(shape, dtype=np.int64)
+            for cube, pos in zip((self, other), positions):
+                merged[np.ix_(*pos)] += cube.measures[name]
+            measures[name] = merged
+        return Cube(dims, measures)
+
+    def rollup(self, *keep):
+        """
+        上卷：对keep以外的维度求和
+
+        Args:
+            keep: 保留的维度，结果按此顺序排列
+
+        Returns:
+            新的Cube
+        """
+        axes = tuple(i for i, name in enumerate(self.dims) if name not in keep)
+        remaining = [name for name in self.dims if name in keep]
+        order = [remaining.index(name) for name in keep]
+        measures = {
+            name: np.transpose(values.sum(axis=axes), order) for name, values in self.measures.items()
+        }
+        return Cube({name: self.dims[name] for name in keep}, measures)
+
+    def dice(self, **selections):
+        """
+        切块：各维只保留指定取值（不存在的取值忽略）
+
+        Args:
+            selections: 维度名称 -> 取值列表
+
+        Returns:
+            新的Cube，维度不变
+        """
+        dims = dict(self.dims)
+        take = [np.arange(n) for n in self.shape]
+        for name, values in selections.items():
+            positions = self.dims[name].get_indexer(pd.Index(list(values)))
+            positions = positions[positions >= 0]
+            dims[name] = self.dims[name][positions]
+            take[self._axis(name)] = positions
+        measures = {name: values[np.ix_(*take)] for name, values in self.measures.items()}
+        return Cube(dims, measures)
+
+    def slice(self, **selections):
+        """
+        切片：固定各维的一个取值，并去掉这些维度
+
+        Args:
+            selections: 维度名称 -> 取值
+
+        Returns:
+            新的Cube；取值不存在时对应度量为0
+        """
+        diced = self.dice(**{name: [value] for name, value in selections.items()})
+        axes = tuple(diced._axis(name) for name in selections)
+        dims = {name: index for name, index in diced.dims.items() if name not in selections}
+        measures = {name: values.sum(axis=axes) for name, values in diced.measures.items()}
+        return Cube(dims, measures)
+
+    def frame(self, dropna=True):
+        """
+        有记录的单元格转换为DataFrame
+
+        Args:
+            dropna: 是否去掉任一维度取值缺失的单元格（与groupby默认行为一致）
+
+        Returns:
+            DataFrame，以各维度为（多级）索引，各度量为列，按各维取值排序
+        """
+        mask = self.measures[COUNT] > 0
+        if dropna:
+            for axis, index in enumerate(self.dims.values()):
+                valid = ~np.asarray(index.isna())
+                mask &= valid.reshape([-1 if i == axis else 1 for i in range(len(self.dims))])
+        cells = np.nonzero(mask)
+        if len(self.dims) == 1:
+            index = self.dims[next(iter(self.dims))][cells[0]]
+            index.name = next(iter(self.dims))
+        else:
+            index = pd.MultiIndex.from_arrays(
+                [labels[pos] for labels, pos in zip(self.dims.values(), cells)], names=list(self.dims)
+            )
+        return pd.DataFrame({name: values[cells] for name, values in self.measures.items()}, index=index)
+
+    def save(self, path):
+        """保存为.npz文件（各维取值与度量数组）"""
+        arrays = {f'dim_{i}': np.asarray(index) for i, index in enumerate(self.dims.values())}
+        arrays.update({f'measure_{name}': values for name, values in self.measures.items()})
+        np.savez_compressed(path, dim_names=np.array(list(self.dims)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        读取save保存的立方体
+
+        字符串维度以对象数组保存，读取时需要allow_pickle，只应读取本程序生成的文件
+        """
+        with np.load(path, allow_pickle=True) as data:
+            dims = {str(name): pd.Index(data[f'dim_{i}']) for i, name in enumerate(data['dim_names'])}
+            measures = {key[len('measure_'):]: data[key] for key in data.files if key.startswith('measure_')}
+        return cls(dims, measures)
@@ -0,0 +1,97 @@
+"""
+网络监测数据分析与可视化 - 增量聚合存储模块
+按天持久化各类日志的可合并聚合状态，源文件未变化的日期无需重新加载
+"""
+
+import os
+import pickle
+from pathlib import Path
+
+from log_cache import file_fingerprint
+from log_loader import LOG_SOURCES
+
+
+# 聚合状态格式版本，聚合逻辑变化时递增以使已存储的状态整体失效
+PARTIAL_VERSION = 11
+
+
+class PartialStore:
+    """按日期存储的聚合状态，以当天各源文件的大小和修改时间判断是否失效"""
+
+    def __init__(self, store_dir, enabled=True, rebuild=False, options=None):
+        """
+        初始化聚合存储
+
+        Args:
+            store_dir: 存储目录路径
+            enabled: 是否启用
+            rebuild: 是否忽略已存储的状态并全部重新计算
+            options: 影响聚合状态内容的选项（如近似模式的误差参数），与存储时不同则状态失效
+        """
+        self.store_dir = Path(store_dir)
+        self.enabled = enabled
+        self.rebuild = rebuild
+        self.options = options or {}
+        self._fingerprints = {}
+
+        if self.enabled:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def day_fingerprints(day_dir):
+        """当天各类日志源文件的指纹，文件不存在时为None"""
+        fingerprints = {}
+        for source in LOG_SOURCES.values():
+            path = Path(day_dir) / source['file']
+            fingerprints[source['file']] = file_fingerprint(path) if path.exists() else None
+        return fingerprints
+
+    def _store_file(self, date_str):
+        return self.store_dir / f'{date_str}.pkl'
+
+    def load(self, date_str, day_dir):
+        """
+        读取某天的聚合状态
+
+        Returns:
+            {'aggregates': 各类日志的聚合状态, 'errors': 当天的加载失败信息}，
+            源文件有变化或不存在已存储状态时返回None
+        """
+        if not self.enabled:
+            return None
+
+        fingerprints = self.day_fingerprints(day_dir)
+        self._fingerprints[date_str] = fingerprints
+        store_file = self._store_file(date_str)
+        if self.rebuild or not store_file.exists():
+            return None
+
+        try:
+            with open(store_file, 'rb') as f:
+                partial = pickle.load(f)
+        except Exception:
+            return None
+
+        if (partial.get('version') != PARTIAL_VERSION or partial.get('options') != self.options
+                or partial.get('fingerprints') != fingerprints):
+            return None
+        return partial
+
+    def save(self, date_str, day_dir, aggregates, errors):
+        """存储某天的聚合状态"""
+        if not self.enabled:
+            return
+
+        fingerprints = self._fingerprints.get(date_str) or self.day_fingerprints(day_dir)
+        partial = {
+            'version': PARTIAL_VERSION,
+            'options': self.options,
+            'fingerprints': fingerprints,
+            'aggregates': aggregates,
+            'errors': errors,
+        }
+        store_file = self._store_file(date_str)
+        tmp_file = store_file.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, store_file)
@@ -0,0 +1,195 @@
+"""
+网络监测数据分析与可视化 - 分析流程调度模块
+各分析阶段显式声明输入与输出，调度器按依赖关系构成的有向无环图在线程池上并发执行互不依赖的阶段；
+各阶段的打印输出先各自缓存，再按阶段声明顺序写出，日志与顺序执行时一致
+"""
+
+import contextlib
+import io
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Stage:
+    """分析阶段：以inputs中各值为关键字参数调用func，返回值依次对应outputs"""
+
+    def __init__(self, name, func, inputs=(), outputs=()):
+        """
+        Args:
+            name: 阶段名称
+            func: 阶段函数，参数名与inputs一致
+            inputs: 依赖的值名称
+            outputs: 产生的值名称；只有一个输出时func直接返回该值，多个时返回元组
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def __repr__(self):
+        return f'Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})'
+
+
+class _StageOutput(io.TextIOBase):
+    """按线程区分的标准输出：正在执行阶段的线程写入该阶段的缓存，其他线程照常输出"""
+
+    def __init__(self, target):
+        self.target = target
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer if buffer is not None else self.target).write(text)
+
+    def flush(self):
+        self.target.flush()
+
+
+class StageScheduler:
+    """按输入输出依赖并发执行分析阶段，总耗时取决于关键路径而非各阶段之和"""
+
+    def __init__(self, stages, max_workers=None, metrics=None):
+        """
+        Args:
+            stages: Stage列表，声明顺序即日志输出顺序
+            max_workers: 并发执行阶段的线程数，None表示CPU核数，1表示顺序执行
+            metrics: 记录各阶段指标的RunMetrics，None表示只记录耗时
+        """
+        self.stages = list(stages)
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self.timings = {}
+        self._initial = {}
+
+        self.producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"值 {output} 同时由 {self.producers[output].name} 与 {stage.name} 产生")
+                self.producers[output] = stage
+        self._check_acyclic()
+
+    def dependencies(self, stage, available=()):
+        """stage依赖的其他阶段名称（available中已提供的值不构成依赖）"""
+        deps = []
+        for name in stage.inputs:
+            if name in available:
+                continue
+            if name not in self.producers:
+                raise ValueError(f"阶段 {stage.name} 的输入 {name} 没有对应的产生阶段")
+            producer = self.producers[name].name
+            if producer not in deps:
+                deps.append(producer)
+        return deps
+
+    def _check_acyclic(self):
+        by_name = {stage.name: stage for stage in self.stages}
+        state = {}
+
+        def visit(stage, path):
+            if state.get(stage.name) == 'done':
+                return
+            if state.get(stage.name) == 'visiting':
+                raise ValueError(f"分析阶段存在循环依赖: {' -> '.join(path + [stage.name])}")
+            state[stage.name] = 'visiting'
+            for name in stage.inputs:
+                if name in self.producers:
+                    visit(by_name[self.producers[name].name], path + [stage.name])
+            state[stage.name] = 'done'
+
+        for stage in self.stages:
+            visit(stage, [])
+
+    def critical_path(self):
+        """按上次运行的各阶段耗时计算的关键路径耗时（秒）"""
+        finish = {}
+        for stage in self._topological_order():
+            start = max((finish[dep] for dep in self.dependencies(stage, self._initial)), default=0)
+            finish[stage.name] = start + self.timings.get(stage.name, 0)
+        return max(finish.values(), default=0)
+
+    def _topological_order(self):
+        ordered, seen = [], set()
+        by_name = {stage.name: stage for stage in self.stages}
+
+        def visit(stage):
+            if stage.name in seen:
+                return
+            seen.add(stage.name)
+            for dep in self.dependencies(stage, self._initial):
+                visit(by_name[dep])
+            ordered.append(stage)
+
+        for stage in self.stages:
+            visit(stage)
+        return ordered
+
+    def run(self, initial=None):
+        """
+        执行全部阶段
+
+        Args:
+            initial: 预先提供的值（名称 -> 值）
+
+        Returns:
+            dict: 所有值（含initial）
+        """
+        self._initial = dict(initial or {})
+        values = dict(self._initial)
+        deps = {stage.name: set(self.dependencies(stage, values)) for stage in self.stages}
+        done = set()
+        logs = {}
+        self.timings = {}
+
+        original = sys.stdout
+        proxy = _StageOutput(original)
+        flushed = 0
+
+        def execute(stage):
+            proxy.local.buffer = io.StringIO()
+            start = time.perf_counter()
+            measure = self.metrics.stage(stage.name) if self.metrics is not None else contextlib.nullcontext()
+            try:
+                with measure:
+                    result = stage.func(**{name: values[name] for name in stage.inputs})
+            finally:
+                elapsed = time.perf_counter() - start
+                log = proxy.local.buffer.getvalue()
+                proxy.local.buffer = None
+            return result, log, elapsed
+
+        sys.stdout = proxy
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                running = {}
+                while len(done) < len(self.stages):
+                    for stage in self.stages:
+                        if stage.name in done or stage.name in running.values():
+                            continue
+                        if deps[stage.name] <= done:
+                            running[pool.submit(execute, stage)] = stage.name
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        stage = next(s for s in self.stages if s.name == name)
+                        result, logs[name], self.timings[name] = future.result()
+                        if len(stage.outputs) == 1:
+                            values[stage.outputs[0]] = result
+                        elif stage.outputs:
+                            values.update(zip(stage.outputs, result))
+                        done.add(name)
+
+                    # 按声明顺序写出已完成阶段的输出
+                    while flushed < len(self.stages) and self.stages[flushed].name in done:
+                        original.write(logs.pop(self.stages[flushed].name))
+                        flushed += 1
+        finally:
+            sys.stdout = original
+            for stage in self.stages[flushed:]:
+                if stage.name in logs:
+                    original.write(logs.pop(stage.name))
+
+        return values
@@ -0,0 +1,401 @@
+"""
+网络监测数据分析与可视化 - 查询服务模块
+加载一次日志后按小时建立预聚合索引，通过本地HTTP/JSON接口回答任意日期/小时范围的查询：
+每小时登录、各协议流量、流量TOP源IP与安全威胁；结果经LRU缓存并带ETag，客户端缓存未变化时返回304
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from data_processor import LogDataProcessor
+from ip_index import decode_index, encode_ips
+from log_loader import LOG_SOURCES, empty_log_frame
+from streaming import make_accumulator
+from threat_detectors import combine_detections, run_detectors
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# LRU缓存保存的查询结果个数
+DEFAULT_CACHE_SIZE = 256
+
+# 各类日志用于按时间范围筛选的列
+TIME_COLUMNS = {
+    'login': 'time',
+    'weblog': 'time',
+    'tcplog': 'stime',
+    'email': 'time',
+    'checking': 'checkin',
+}
+
+HOUR_FORMAT = '%Y-%m-%d %H:00'
+
+
+def parse_hour(value, end=False):
+    """
+    解析查询参数中的时间并取整到小时
+
+    Args:
+        value: 'YYYY-MM-DD' 或 'YYYY-MM-DD HH[:MM[:SS]]'
+        end: 作为范围终点（不含）解析，只给日期时取次日0点，即包含当天；不在整点时向上取整，包含终点所在的小时
+    """
+    timestamp = pd.Timestamp(value)
+    if end and len(value.strip()) == 10:
+        timestamp += pd.Timedelta(days=1)
+    return np.datetime64(timestamp.ceil('h') if end else timestamp.floor('h'), 'h')
+
+
+def _hours(times):
+    """时间列转为小时精度的numpy数组"""
+    return times.to_numpy(dtype='datetime64[ns]').astype('datetime64[h]')
+
+
+class HourlyTable:
+    """按小时排序的预聚合表，按时间范围取连续切片"""
+
+    def __init__(self, df):
+        """
+        Args:
+            df: 含hour列（datetime64[h]）的分组结果
+        """
+        self.df = df.sort_values('hour', kind='stable').reset_index(drop=True)
+        self.hours = self.df['hour'].to_numpy(dtype='datetime64[h]')
+
+    def slice(self, start, end):
+        """hour在[start, end)内的行"""
+        lo, hi = np.searchsorted(self.hours, [start, end], side='left')
+        return self.df.iloc[lo:hi]
+
+
+class QueryIndex:
+    """从已加载的日志建立的按小时预聚合索引"""
+
+    def __init__(self, processor):
+        """
+        Args:
+            processor: 已调用load_all_data的LogDataProcessor（整表模式）
+        """
+        self.processor = processor
+
+        # 各类日志按时间排序，时间范围查询用searchsorted取连续切片
+        self.frames = {}
+        for log_type, source in LOG_SOURCES.items():
+            df = getattr(processor, source['attr'])
+            if df.empty and len(df.columns) == 0:
+                # 未选择或所选日期内没有文件的日志
+                df = empty_log_frame(log_type)
+            col = TIME_COLUMNS[log_type]
+            if col not in df.columns:
+                self.frames[log_type] = (df.iloc[:0], np.empty(0, dtype='datetime64[ns]'))
+                continue
+            df = df.sort_values(col, kind='stable', na_position='last').reset_index(drop=True)
+            self.frames[log_type] = (df, df[col].to_numpy(dtype='datetime64[ns]'))
+
+        login = self.frames['login'][0]
+        self.login_hourly = HourlyTable(
+            pd.DataFrame({'hour': _hours(login['time']), 'state': login['state'].astype(str)})
+            .dropna(subset=['hour']).groupby(['hour', 'state'], sort=False).size()
+            .rename('count').reset_index()
+        )
+
+        tcplog = self.frames['tcplog'][0]
+        traffic = pd.DataFrame({
+            'hour': _hours(tcplog['stime']),
+            'proto': tcplog['proto'].astype(str),
+            'sip': tcplog['sip'],
+            'traffic': (tcplog['uplink_length'].to_numpy(dtype=np.int64, na_value=0)
+                        + tcplog['downlink_length'].to_numpy(dtype=np.int64, na_value=0)),
+        }).dropna(subset=['hour'])
+        self.traffic_proto = HourlyTable(
+            traffic.groupby(['hour', 'proto'], sort=False)['traffic'].agg(['sum', 'count']).reset_index()
+        )
+        self.traffic_ip = HourlyTable(
+            traffic.groupby(['hour', 'sip'], sort=False)['traffic'].sum().reset_index()
+        )
+
+        hours = np.concatenate([
+            times[~np.isnat(times)].astype('datetime64[h]') for _, times in self.frames.values()
+        ])
+        self.start = hours.min() if len(hours) else None
+        self.end = hours.max() + np.timedelta64(1, 'h') if len(hours) else None
+
+    def rows(self, log_type, start, end):
+        """某类日志在[start, end)内的记录"""
+        df, times = self.frames[log_type]
+        lo, hi = np.searchsorted(times, [start, end], side='left')
+        return df.iloc[lo:hi]
+
+    def summary(self, log_type, start, end):
+        """某类日志在[start, end)内的聚合统计"""
+        accumulator = make_accumulator(log_type, self.processor.sketch_error, self.processor.host_classifier,
+                                       self.processor.burst_limits)
+        return accumulator.update(self.rows(log_type, start, end)).summary()
+
+
+def query_hourly_logins(index, start, end, params):
+    """每小时登录次数（按登录状态），以及按一天中小时汇总的登录次数"""
+    table = index.login_hourly.slice(start, end)
+    series = table.pivot_table(index='hour', columns='state', values='count', aggfunc='sum', fill_value=0)
+    series['total'] = series.sum(axis=1)
+    by_hour = table.groupby(table['hour'].dt.hour)['count'].sum()
+    return {
+        'series': [
+            {'hour': hour.strftime(HOUR_FORMAT), **{state: int(v) for state, v in row.items()}}
+            for hour, row in series.iterrows()
+        ],
+        'by_hour_of_day': {int(hour): int(count) for hour, count in by_hour.items()},
+    }
+
+
+def query_traffic_by_proto(index, start, end, params):
+    """各协议流量（与network_traffic_analysis.json的protocol_stats字段一致）"""
+    table = index.traffic_proto.slice(start, end)
+    stats = table.groupby('proto')[['sum', 'count']].sum()
+    stats['mean'] = stats['sum'] / stats['count']
+    stats['sum_gb'] = stats['sum'] / (1024**3)
+    stats = stats[['sum', 'mean', 'count', 'sum_gb']].sort_values('sum', ascending=False)
+    return stats.to_dict('index')
+
+
+def query_top_ips(index, start, end, params):
+    """流量最大的源IP（字节数），limit参数指定个数，默认20"""
+    limit = int(params.get('limit', 20))
+    table = index.traffic_ip.slice(start, end)
+    top = table.groupby('sip')['traffic'].sum().sort_values(ascending=False, kind='stable').head(limit)
+    return {ip: int(traffic) for ip, traffic in decode_index(top).items()}
+
+
+def query_threats(index, start, end, params):
+    """时间范围内的安全威胁（与security_threats.json格式一致），各检测器在该范围的数据上重新执行"""
+    detections = run_detectors(index.processor, lambda log_type: index.summary(log_type, start, end))
+    result, _ = combine_detections(detections)
+    return result
+
+
+def query_entity_events(index, start, end, params):
+    """某个源IP（ip参数）或用户（user参数）在时间范围内的login/weblog/email/tcpLog活动，limit参数指定事件条数，默认100"""
+    limit = int(params.get('limit', 100))
+    if 'ip' in params:
+        kind, key = 'sip', encode_ips(pd.Series([params['ip']]))
+    elif 'user' in params:
+        kind, key = 'user', [params['user']]
+    else:
+        raise ValueError('需要ip或user参数')
+    timeline = index.processor.timeline
+    last = pd.Timestamp(end) - pd.Timedelta(seconds=1)
+    events = timeline.window_join(kind, key, [pd.Timestamp(start)], [last],
+                                  before=pd.Timedelta(0), after=pd.Timedelta(0))
+    return {
+        'activity': events['source'].value_counts(sort=False).astype(int).to_dict(),
+        'events': timeline.describe_events(events.head(limit)),
+    }
+
+
+# 查询名称 -> 查询函数(index, start, end, params)
+QUERIES = {
+    'hourly_logins': query_hourly_logins,
+    'traffic_by_proto': query_traffic_by_proto,
+    'top_ips': query_top_ips,
+    'threats': query_threats,
+    'entity_events': query_entity_events,
+}
+
+
+class QueryService:
+    """解析查询参数、执行查询并缓存序列化后的结果"""
+
+    def __init__(self, index, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            index: QueryIndex
+            cache_size: LRU缓存保存的查询结果个数
+        """
+        self.index = index
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def describe(self):
+        """可用的查询与数据时间范围"""
+        return {
+            'queries': {name: func.__doc__ for name, func in QUERIES.items()},
+            'start': str(self.index.start) if self.index.start is not None else None,
+            'end': str(self.index.end) if self.index.end is not None else None,
+            'cache': {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses},
+        }
+
+    def query(self, name, params):
+        """
+        执行查询
+
+        Args:
+            name: QUERIES中的查询名称
+            params: 查询参数，start/end为时间范围（省略时为全部数据），其余参数传给查询函数
+
+        Returns:
+            (JSON字节串, ETag)
+
+        Raises:
+            KeyError: 查询不存在
+            ValueError: 参数无法解析
+        """
+        func = QUERIES[name]
+        params = dict(params)
+        start_text = params.pop('start', None)
+        end_text = params.pop('end', None)
+        start = parse_hour(start_text) if start_text else self.index.start
+        end = parse_hour(end_text, end=True) if end_text else self.index.end
+        key = (name, str(start), str(end), tuple(sorted(params.items())))
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        if start is None:
+            result = {}
+        else:
+            result = func(self.index, start, end, params)
+        body = json.dumps({
+            'query': name,
+            'start': str(start),
+            'end': str(end),
+            'params': params,
+            'result': result,
+        }, ensure_ascii=False, default=str).encode('utf-8')
+        entry = (body, f'"{hashlib.md5(body).hexdigest()}"')
+
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET /api 列出可用查询，GET /api/<查询名称>?start=...&end=... 执行查询"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        service = self.server.service
+
+        if parts == ['api']:
+            body = json.dumps(service.describe(), ensure_ascii=False).encode('utf-8')
+            self._send(200, body)
+            return
+        if len(parts) != 2 or parts[0] != 'api':
+            self._send_error(404, f'未知路径 {url.path}')
+            return
+
+        if parts[1] not in QUERIES:
+            self._send_error(404, f'未知查询 {parts[1]}')
+            return
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            body, etag = service.query(parts[1], params)
+        except ValueError as e:
+            self._send_error(400, f'参数错误: {e}')
+            return
+        except Exception as e:
+            print(f"查询 {self.path} 失败:", file=sys.stderr)
+            traceback.print_exc()
+            self._send_error(500, f'查询失败: {e}')
+            return
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self._send_common_headers()
+            self.end_headers()
+            return
+        self._send(200, body, etag)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._send_common_headers()
+        self.send_header('Access-Control-Allow-Headers', 'If-None-Match')
+        self.end_headers()
+
+    def _send_common_headers(self):
+        # 允许可视化开发服务器跨域访问，客户端每次用ETag重新验证
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.send_header('Cache-Control', 'no-cache')
+
+    def _send(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self._send_common_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, json.dumps({'error': message}, ensure_ascii=False).encode('utf-8'))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """创建查询服务的HTTP服务器（每个请求一个线程）"""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+if __name__ == '__main__':
+    data_dir = Path(__file__).parent.parent / '选题二——企业日志数据'
+
+    parser = argparse.ArgumentParser(description='网络监测数据分析系统 - 本地查询服务')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='LRU缓存的查询结果个数')
+    parser.add_argument('--no-cache', action='store_true', help='不使用列式缓存，直接解析CSV')
+    parser.add_argument('--output-dir', default='output',
+                        help='与data_processor.py相同的输出目录，列式缓存使用与其同级的cache目录')
+    parser.add_argument('--workers', type=int, default=None, help='并行加载文件的工作数，默认CPU核数')
+    parser.add_argument('--verbose', action='store_true', help='输出每个请求的访问日志')
+    parser.add_argument('--start-date', default=None, help='只加载该日期（包含）及以后的日期分区')
+    parser.add_argument('--end-date', default=None, help='只加载该日期（包含）及以前的日期分区')
+    parser.add_argument('--log-types', nargs='+', choices=list(LOG_SOURCES), default=None,
+                        help='只加载这些日志，默认全部')
+    args = parser.parse_args()
+
+    processor = LogDataProcessor(data_dir, output_dir=args.output_dir, use_cache=not args.no_cache,
+                                 max_workers=args.workers, start_date=args.start_date, end_date=args.end_date,
+                                 log_types=args.log_types)
+    processor.load_all_data()
+    service = QueryService(QueryIndex(processor), cache_size=args.cache_size)
+
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"\n查询服务已启动: http://{args.host}:{args.port}/api")
+    print(f"数据时间范围: {service.index.start} ~ {service.index.end}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,215 @@
+"""
+网络监测数据分析与可视化 - 近似统计模块
+近似模式下用固定大小、可跨块/跨天合并的草图代替整表排序与分组：
+KLL分位数草图、Space-Saving高频项草图、HyperLogLog基数估计
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# 近似模式的默认误差参数
+DEFAULT_SKETCH_ERROR = 0.001
+
+# KLL草图容量k与归一化秩误差的关系（约99%置信度下误差≈1.65/k）
+KLL_ERROR_CONSTANT = 1.65
+
+# HyperLogLog寄存器个数为2**precision，相对标准误差≈1.04/sqrt(2**precision)
+HLL_PRECISION = 14
+
+
+class QuantileSketch:
+    """KLL分位数草图：各层保存已排序压缩的样本，第h层每个样本代表2**h个原始值"""
+
+    def __init__(self, error=DEFAULT_SKETCH_ERROR, seed=0):
+        """
+        Args:
+            error: 目标归一化秩误差，决定草图容量k
+            seed: 压缩时随机选取奇偶位置的种子，保证结果可复现
+        """
+        self.error = error
+        self.k = max(8, math.ceil(KLL_ERROR_CONSTANT / error))
+        self.count = 0
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(self.levels[level])
+                # 奇数个时保留最小的一个，其余两两取一并升到上一层，总权重不变
+                keep = len(items) % 2
+                promoted = items[keep + self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = items[:keep]
+            level += 1
+
+    def update(self, values):
+        """累积一批数值"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """合并另一个草图"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(items), 2 ** level, dtype=np.int64) for level, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """q分位数的估计值，秩误差不超过 error * count"""
+        if self.count == 0:
+            return float('nan')
+        values, cumulative = self._weighted()
+        index = np.searchsorted(cumulative, q * self.count, side='left')
+        return float(values[min(index, len(values) - 1)])
+
+    def count_above(self, threshold):
+        """大于threshold的原始值个数的估计"""
+        if self.count == 0:
+            return 0
+        values, cumulative = self._weighted()
+        index = np.searchsorted(values, threshold, side='right')
+        return int(self.count - (cumulative[index - 1] if index > 0 else 0))
+
+
+class HeavyHitters:
+    """
+    Space-Saving高频项草图（可合并形式）
+
+    保存至多capacity个键的计数上界counts及其误差errors，真实值位于[counts-errors, counts]；
+    未保存的键真实值不超过floor，因此真实值大于floor的键一定在草图中
+    """
+
+    def __init__(self, error=DEFAULT_SKETCH_ERROR):
+        """
+        Args:
+            error: 相对误差，保存 ceil(1/error) 个键，每个键的误差不超过总量的error倍
+        """
+        self.error = error
+        self.capacity = math.ceil(1 / error)
+        self.total = 0
+        self.floor = 0
+        self.counts = pd.Series(dtype='int64')
+        self.errors = pd.Series(dtype='int64')
+
+    def _combine(self, counts, errors, floor):
+        if len(self.counts) == 0:
+            # 首次累积时沿用counts的索引类型（如uint32编码的IP）
+            index = counts.index
+        else:
+            index = self.counts.index.append(counts.index.difference(self.counts.index, sort=False))
+        self.counts = (self.counts.reindex(index, fill_value=self.floor)
+                       + counts.reindex(index, fill_value=floor))
+        self.errors = (self.errors.reindex(index, fill_value=self.floor)
+                       + errors.reindex(index, fill_value=floor))
+        self.floor += floor
+
+        if len(self.counts) > self.capacity:
+            order = np.argsort(-self.counts.to_numpy(), kind='stable')
+            dropped = self.counts.iloc[order[self.capacity:]]
+            self.floor = max(self.floor, int(dropped.max()))
+            self.counts = self.counts.iloc[order[:self.capacity]]
+            self.errors = self.errors.loc[self.counts.index]
+        return self
+
+    def update(self, counts):
+        """
+        累积一块数据的精确分组计数
+
+        Args:
+            counts: 以键为索引的计数或求和Series
+        """
+        if len(counts) == 0:
+            return self
+        counts = counts.astype('int64')
+        self.total += int(counts.sum())
+        return self._combine(counts, pd.Series(0, index=counts.index, dtype='int64'), 0)
+
+    def merge(self, other):
+        """合并另一个草图"""
+        self.total += other.total
+        return self._combine(other.counts, other.errors, other.floor)
+
+    def estimates(self):
+        """各键计数上界，按降序排列"""
+        return self.counts.sort_values(ascending=False, kind='stable')
+
+    def bound(self):
+        """任一键计数的误差上界"""
+        return self.floor
+
+
+def _mix64(values):
+    """splitmix64混合函数，将整数映射为均匀分布的64位哈希"""
+    x = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class DistinctCounter:
+    """HyperLogLog基数估计，寄存器逐个取最大值即可合并"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    @property
+    def error(self):
+        """相对标准误差"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update(self, values):
+        """累积一批整数值（如uint32编码的IP）"""
+        if len(values) == 0:
+            return self
+        hashed = _mix64(values)
+        rest_bits = 64 - self.precision
+        buckets = (hashed >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashed & np.uint64((1 << rest_bits) - 1)
+        # rest不超过2**50，转为浮点数是精确的，frexp给出最高位位置
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest > 0, rest_bits - exponent + 1, rest_bits + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, rank)
+        return self
+
+    def merge(self, other):
+        """合并另一个计数器"""
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """不同值个数的估计"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return float(raw)
@@ -0,0 +1,701 @@
+"""
+网络监测数据分析与可视化 - 流式聚合模块
+按块或按天累积各类日志的统计量，聚合状态可合并，内存占用主要与IP/用户/协议等维度的基数有关：
+TOP N在近似模式下为固定大小的草图，工作时长为固定分箱的直方图，登录失败与凌晨登录的明细只保留
+时间窗口检测仍可能用到的事件（命中窗口内的事件与时间范围两端一个窗口内的事件）。
+随天数增长的状态：各日志的立方体含日期维度（每天一层）、实体特征entity_days按(实体, 日期)汇总、
+流量图的边表与告警邮件事件分别随不同的(源IP, 目的IP)与告警数增长
+"""
+
+import numpy as np
+import pandas as pd
+
+from alert_incidents import alert_events, merge_alert_events
+from entity_features import (checking_entity_days, email_entity_days, login_entity_days, merge_entity_days,
+                             traffic_entity_days, weblog_entity_days)
+from host_classifier import DEFAULT_HOST_CLASSIFIER, RuleClassifier
+from sketches import DistinctCounter, HeavyHitters, QuantileSketch
+from olap_cube import COUNT, Cube, time_dims
+from traffic_graph import edge_counts, merge_edges
+from traffic_kernel import aggregate_traffic, cube_marginals
+from viz_export import WORK_HOURS_BINS, histogram
+from window_detection import BURST_KEYS, compact_events
+
+
+# 内部邮件域名
+INTERNAL_EMAIL_DOMAIN = 'hightech.com'
+
+# 垃圾邮件关键词
+SPAM_KEYWORDS = ['新葡京', '赌博', '彩票', 'qq.com', '红包', '中奖']
+SPAM_CLASSIFIER = RuleClassifier([(True, SPAM_KEYWORDS)], default=False, lowercase=False)
+
+
+def _merge_counts(current, part, sort=True):
+    """
+    合并两个按索引分组的计数/求和结果
+
+    Args:
+        sort: True时结果按索引排序（对应groupby），False时按首次出现顺序（对应value_counts）
+    """
+    if current is None:
+        return part
+    levels = list(range(part.index.nlevels))
+    return pd.concat([current, part]).groupby(level=levels, sort=sort).sum()
+
+
+def _first_seen_counts(values):
+    """按首次出现顺序计数，合并后再排序可得到与整表value_counts相同的结果"""
+    return _plain_index(values.value_counts(sort=False))
+
+
+def _sorted_counts(counts, default=None):
+    """按计数降序排列，并列时保持首次出现顺序（与value_counts一致）"""
+    if counts is None:
+        return default
+    return counts.sort_values(ascending=False, kind='stable')
+
+
+def _merge_top(current, part, sketch_error, sort=True):
+    """
+    合并只用于取TOP N与阈值筛选的分组计数
+
+    精确模式下与_merge_counts相同；近似模式（sketch_error不为None）下累积到HeavyHitters草图，
+    part可以是一块数据的分组计数，也可以是另一个草图
+    """
+    if sketch_error is None:
+        return _merge_counts(current, part, sort=sort)
+    if current is None:
+        current = HeavyHitters(sketch_error)
+    if isinstance(part, HeavyHitters):
+        return current.merge(part)
+    return current.update(part)
+
+
+def _top_counts(counts, default=None):
+    """分组计数或草图的计数结果，草图给出按降序排列的计数上界"""
+    if counts is None:
+        return default
+    if isinstance(counts, HeavyHitters):
+        return counts.estimates()
+    return counts
+
+
+def _merge_cubes(current, part):
+    """合并两个OLAP立方体"""
+    if current is None:
+        return part
+    return current.merge(part)
+
+
+def _sketches(**counts):
+    """近似模式下各统计量对应的草图（用于查询误差上界），精确模式下为空"""
+    return {name: sketch for name, sketch in counts.items() if isinstance(sketch, HeavyHitters)}
+
+
+def error_bounds(summary, name, top):
+    """近似模式下top中各项计数的误差上界，精确模式下为None"""
+    sketch = summary['sketches'].get(name)
+    if sketch is None:
+        return None
+    return sketch.errors.reindex(top.index)
+
+
+def _burst_events(df, mask):
+    """取出用于时间窗口检测的事件明细"""
+    events = df.loc[mask, ['time'] + BURST_KEYS].reset_index(drop=True)
+    events['user'] = events['user'].astype(str)
+    return events
+
+
+def _concat_events(current, part, limits):
+    """
+    合并两批事件明细，part排在current之后
+
+    Args:
+        limits: (阈值, 时间窗口)，合并后只保留时间窗口检测仍可能用到的事件（见compact_events）；None表示全部保留
+    """
+    if part is None:
+        return current
+    if current is None or len(current) == 0:
+        events = part
+    elif len(part) == 0:
+        events = current
+    else:
+        events = pd.concat([current, part], ignore_index=True)
+    if limits is not None:
+        events = compact_events(events, *limits)
+    return events
+
+
+def _events_or_empty(events):
+    """没有事件明细时返回空表"""
+    return events if events is not None else pd.DataFrame(columns=['time'] + BURST_KEYS)
+
+
+def _plain_index(result):
+    """将分类类型的分组索引转为普通字符串索引，便于跨块合并"""
+    if isinstance(result.index.dtype, pd.CategoricalDtype):
+        result.index = result.index.astype(str)
+    return result
+
+
+class TrafficAccumulator:
+    """tcpLog流量的可合并聚合状态"""
+
+    def __init__(self, top_flows=100, quantile=0.99, sketch_error=None):
+        """
+        Args:
+            top_flows: 保留的最大流量连接条数（用于网络拓扑）
+            quantile: 异常大流量连接的流量分位数阈值
+            sketch_error: 近似模式的误差参数，None表示精确统计；近似模式下源IP流量只保留高频项，
+                /24子网流量由流量立方体精确汇总，流量分位数由QuantileSketch估计
+        """
+        self.top_flows = top_flows
+        self.quantile = quantile
+        self.sketch_error = sketch_error
+        self.has_traffic = False
+        self.has_time = False
+        self.total_connections = 0
+        self.total_traffic = 0
+        # 日期×小时×协议×源IP/24子网 的流量立方体（见traffic_kernel.traffic_cube）
+        self.cube = None
+        # 按(源IP, 目的IP)汇总的边表（见traffic_graph.edge_counts）
+        self.edges = None
+        self.ip_traffic = None
+        self.largest_flows = None
+        # 按(源IP, 日期)的连接数与上下行字节数（见entity_features）
+        self.entity_days = None
+        # 精确分位数无法跨块合并，只在整表一次累积时保留
+        self.blocks = 0
+        self.large_traffic_count = None
+        self.traffic_quantiles = None
+        self.ip_counter = None
+        if sketch_error is not None:
+            self.traffic_quantiles = QuantileSketch(sketch_error)
+            self.ip_counter = DistinctCounter()
+
+    @property
+    def rows(self):
+        return self.total_connections
+
+    def update(self, df):
+        """累积一块tcpLog数据，每块只经过一次聚合内核"""
+        self.total_connections += len(df)
+        if 'uplink_length' not in df.columns or len(df) == 0:
+            return self
+
+        self.has_traffic = True
+        self.has_time = self.has_time or 'stime' in df.columns
+        self.blocks += 1
+        exact_quantile = self.blocks == 1 and self.sketch_error is None
+        part = aggregate_traffic(
+            df, self.top_flows, quantile=self.quantile if exact_quantile else None,
+            quantile_sketch=self.traffic_quantiles,
+        )
+        self.large_traffic_count = part.get('above_quantile')
+        self.total_traffic += part['total_traffic']
+
+        self.cube = _merge_cubes(self.cube, part['cube'])
+        self.edges = merge_edges([self.edges, part['edges']])
+        ip_traffic = part['ip_traffic']
+        self.ip_traffic = _merge_top(self.ip_traffic, ip_traffic, self.sketch_error)
+        if self.sketch_error is not None:
+            self.ip_counter.update(ip_traffic.index.to_numpy())
+        if 'stime' in df.columns and 'sip' in df.columns:
+            self.entity_days = merge_entity_days(self.entity_days, traffic_entity_days(df))
+
+        # 已保留的连接排在新块之前，nlargest按出现顺序取并列值，与整体计算结果一致
+        self._merge_flows(part['largest_flows'])
+        return self
+
+    def _merge_flows(self, flows):
+        if self.largest_flows is not None:
+            flows = pd.concat([self.largest_flows, flows], ignore_index=True)
+            flows = flows.nlargest(self.top_flows, 'total_traffic')
+        self.largest_flows = flows.reset_index(drop=True)
+
+    def merge(self, other):
+        """合并另一个聚合状态，other中的数据视为排在本状态之后"""
+        self.has_traffic = self.has_traffic or other.has_traffic
+        self.has_time = self.has_time or other.has_time
+        self.total_connections += other.total_connections
+        self.total_traffic += other.total_traffic
+        self.blocks += other.blocks
+        self.large_traffic_count = None
+        if other.cube is not None:
+            self.cube = _merge_cubes(self.cube, other.cube)
+        if other.edges is not None:
+            self.edges = merge_edges([self.edges, other.edges])
+        if other.ip_traffic is not None:
+            self.ip_traffic = _merge_top(self.ip_traffic, other.ip_traffic, self.sketch_error)
+        if self.sketch_error is not None:
+            self.traffic_quantiles.merge(other.traffic_quantiles)
+            self.ip_counter.merge(other.ip_counter)
+        if other.largest_flows is not None:
+            self._merge_flows(other.largest_flows)
+        if other.entity_days is not None:
+            self.entity_days = merge_entity_days(self.entity_days, other.entity_days)
+        return self
+
+    def summary(self):
+        """生成与整表计算一致的统计结果"""
+        proto_traffic = None
+        marginals = {'hourly_traffic': None, 'daily_traffic': None}
+        subnet_traffic = None
+        if self.cube is not None:
+            marginals = cube_marginals(self.cube, self.has_time)
+            proto_traffic = pd.DataFrame({
+                'sum': marginals['proto_traffic']['sum'],
+                'mean': marginals['proto_traffic']['sum'] / marginals['proto_traffic']['count'],
+                'count': marginals['proto_traffic']['count'],
+            })
+            proto_traffic['sum_gb'] = proto_traffic['sum'] / (1024**3)
+            subnet_traffic = self.cube.rollup('subnet').frame()['traffic']
+
+        ip_traffic = _top_counts(self.ip_traffic)
+        network_traffic = subnet_traffic if self.sketch_error is not None else ip_traffic
+        avg_ip_traffic = None
+        large_traffic_estimate = None
+        if self.sketch_error is not None and self.has_traffic:
+            avg_ip_traffic = self.total_traffic / self.ip_counter.estimate()
+            threshold = self.traffic_quantiles.quantile(self.quantile)
+            large_traffic_estimate = {
+                'quantile': self.quantile,
+                'threshold': threshold,
+                'count': self.traffic_quantiles.count_above(threshold),
+                'count_error': int(np.ceil(self.sketch_error * self.traffic_quantiles.count)),
+                'rank_error': self.sketch_error,
+            }
+        elif ip_traffic is not None:
+            avg_ip_traffic = ip_traffic.mean()
+
+        return {
+            'has_traffic': self.has_traffic,
+            'total_connections': self.total_connections,
+            'total_traffic': self.total_traffic,
+            'avg_traffic': self.total_traffic / self.total_connections if self.has_traffic else 0,
+            'proto_traffic': proto_traffic,
+            'hourly_traffic': marginals['hourly_traffic'],
+            'daily_traffic': marginals['daily_traffic'],
+            'cube': self.cube,
+            'ip_traffic': ip_traffic,
+            'edges': self.edges,
+            'avg_ip_traffic': avg_ip_traffic,
+            'network_traffic': network_traffic,
+            'largest_flows': self.largest_flows,
+            'large_traffic_count': self.large_traffic_count,
+            'large_traffic_estimate': large_traffic_estimate,
+            'entity_days': self.entity_days or {},
+            'sketches': _sketches(ip_traffic=self.ip_traffic),
+        }
+
+
+class WebAccessAccumulator:
+    """weblog网页访问的可合并聚合状态"""
+
+    def __init__(self, sketch_error=None, host_classifier=None):
+        """
+        Args:
+            sketch_error: 近似模式的误差参数，None表示精确统计；近似模式下各IP的外部访问次数只保留高频项
+            host_classifier: 外部网站与网站分类的规则表（HostClassifier），None表示默认规则表
+        """
+        self.sketch_error = sketch_error
+        self.host_classifier = host_classifier or DEFAULT_HOST_CLASSIFIER
+        self.has_sip = False
+        self.has_host = False
+        self.total_access = 0
+        self.external_access = 0
+        self.external_by_sip = None
+        self.category_counts = None
+        self.edges = None
+        self.entity_days = None
+
+    @property
+    def rows(self):
+        return self.total_access
+
+    def update(self, df):
+        """累积一块weblog数据"""
+        self.total_access += len(df)
+        if 'sip' in df.columns and 'dip' in df.columns:
+            self.edges = merge_edges([self.edges, edge_counts(df['sip'].to_numpy(), df['dip'].to_numpy())])
+        if 'host' not in df.columns:
+            return self
+
+        self.has_host = True
+        categories = self.host_classifier.website_categories(df['host'])
+        self.category_counts = _merge_counts(
+            self.category_counts, _first_seen_counts(categories), sort=False
+        )
+
+        if 'sip' in df.columns:
+            self.has_sip = True
+            is_external = self.host_classifier.external_mask(df['host'])
+            self.external_access += int(is_external.sum())
+            external_sips = df.loc[is_external, 'sip']
+            self.external_by_sip = _merge_top(
+                self.external_by_sip, external_sips.groupby(external_sips).size(), self.sketch_error
+            )
+            if 'time' in df.columns:
+                self.entity_days = merge_entity_days(self.entity_days, weblog_entity_days(df, is_external))
+
+        return self
+
+    def merge(self, other):
+        """合并另一个聚合状态"""
+        self.has_sip = self.has_sip or other.has_sip
+        self.has_host = self.has_host or other.has_host
+        self.total_access += other.total_access
+        self.external_access += other.external_access
+        if other.external_by_sip is not None:
+            self.external_by_sip = _merge_top(self.external_by_sip, other.external_by_sip, self.sketch_error)
+        if other.category_counts is not None:
+            self.category_counts = _merge_counts(self.category_counts, other.category_counts, sort=False)
+        if other.edges is not None:
+            self.edges = merge_edges([self.edges, other.edges])
+        if other.entity_days is not None:
+            self.entity_days = merge_entity_days(self.entity_days, other.entity_days)
+        return self
+
+    def summary(self):
+        """生成与整表计算一致的统计结果"""
+        external_by_sip = _top_counts(self.external_by_sip, pd.Series(dtype='int64'))
+
+        return {
+            'has_sip': self.has_sip,
+            'has_host': self.has_host,
+            'total_access': self.total_access,
+            'external_access': self.external_access,
+            'external_by_sip': external_by_sip,
+            'category_counts': _sorted_counts(self.category_counts),
+            'edges': self.edges,
+            'entity_days': self.entity_days or {},
+            'sketches': _sketches(external_by_sip=self.external_by_sip),
+        }
+
+
+class LoginAccumulator:
+    """login登录日志的可合并聚合状态"""
+
+    def __init__(self, sketch_error=None, burst_limits=None):
+        """
+        Args:
+            sketch_error: 近似模式的误差参数，None表示精确统计；近似模式下各用户的失败次数只保留高频项
+            burst_limits: {'failure_events'|'night_events': (阈值, 时间窗口)}，给出时明细事件只保留
+                该检测仍可能用到的部分；None表示保留全部事件
+        """
+        self.sketch_error = sketch_error
+        self.burst_limits = burst_limits or {}
+        self.rows = 0
+        self.has_user = False
+        self.has_time = False
+        self.state_counts = None
+        self.user_errors = None
+        self.proto_stats = None
+        self.proto_counts = None
+        self.edges = None
+        self.non_work_hours = 0
+        self.night_logins = 0
+        # 日期×小时×状态×协议 的登录次数立方体
+        self.cube = None
+        # 登录失败与凌晨登录的明细事件，用于时间窗口检测
+        self.failure_events = None
+        self.night_events = None
+        self.entity_days = None
+
+    def update(self, df):
+        """累积一块login数据"""
+        self.rows += len(df)
+        if 'state' not in df.columns or len(df) == 0:
+            return self
+
+        is_error = df['state'] == 'error'
+        self.state_counts = _merge_counts(
+            self.state_counts, _plain_index(df.groupby('state', observed=True).size())
+        )
+
+        if 'user' in df.columns:
+            self.has_user = True
+            error_users = df.loc[is_error, 'user']
+            self.user_errors = _merge_top(
+                self.user_errors, error_users.groupby(error_users).size(), self.sketch_error
+            )
+
+            proto_stats = pd.DataFrame({
+                'errors': is_error.groupby(df['proto'], observed=True).sum(),
+                'total': df['user'].groupby(df['proto'], observed=True).count(),
+            })
+            self.proto_stats = _merge_counts(self.proto_stats, _plain_index(proto_stats))
+
+        if 'sip' in df.columns and 'dip' in df.columns:
+            self.edges = merge_edges([self.edges, edge_counts(df['sip'].to_numpy(), df['dip'].to_numpy())])
+
+        if 'proto' in df.columns:
+            self.proto_counts = _merge_counts(
+                self.proto_counts, _first_seen_counts(df['proto']), sort=False
+            )
+
+        if 'time' in df.columns:
+            self.has_time = True
+            hours = df['time'].dt.hour
+            self.non_work_hours += int(((hours < 7) | (hours > 22)).sum())
+
+            is_night = (hours >= 0) & (hours < 6)
+            self.night_logins += int(is_night.sum())
+            if 'user' in df.columns:
+                self._add_events('failure_events', _burst_events(df, is_error))
+                self._add_events('night_events', _burst_events(df, is_night))
+
+            days, cube_hours = time_dims(df['time'])
+            protos = df['proto'] if 'proto' in df.columns else np.full(len(df), None, dtype=object)
+            self.cube = _merge_cubes(self.cube, Cube.build({
+                'date': days, 'hour': cube_hours, 'state': df['state'], 'proto': protos,
+            }))
+            self.entity_days = merge_entity_days(self.entity_days, login_entity_days(df))
+
+        return self
+
+    def merge(self, other):
+        """合并另一个聚合状态，other中的数据视为排在本状态之后"""
+        self.rows += other.rows
+        self.has_user = self.has_user or other.has_user
+        self.has_time = self.has_time or other.has_time
+        self.non_work_hours += other.non_work_hours
+        self.night_logins += other.night_logins
+        if other.user_errors is not None:
+            self.user_errors = _merge_top(self.user_errors, other.user_errors, self.sketch_error)
+        for attr in ['state_counts', 'proto_stats']:
+            if getattr(other, attr) is not None:
+                setattr(self, attr, _merge_counts(getattr(self, attr), getattr(other, attr)))
+        if other.cube is not None:
+            self.cube = _merge_cubes(self.cube, other.cube)
+        if other.proto_counts is not None:
+            self.proto_counts = _merge_counts(self.proto_counts, other.proto_counts, sort=False)
+        if other.edges is not None:
+            self.edges = merge_edges([self.edges, other.edges])
+        self._add_events('failure_events', other.failure_events)
+        self._add_events('night_events', other.night_events)
+        if other.entity_days is not None:
+            self.entity_days = merge_entity_days(self.entity_days, other.entity_days)
+        return self
+
+    def _add_events(self, attr, events):
+        """追加一批排在已有事件之后的明细事件"""
+        setattr(self, attr, _concat_events(getattr(self, attr), events, self.burst_limits.get(attr)))
+
+    def summary(self):
+        """生成与整表计算一致的统计结果"""
+        state_counts = self.state_counts if self.state_counts is not None else pd.Series(dtype='int64')
+
+        proto_stats = None
+        if self.proto_stats is not None:
+            proto_stats = self.proto_stats.copy()
+            proto_stats.index.name = 'proto'
+            proto_stats['error_rate'] = proto_stats['errors'] / proto_stats['total']
+
+        hourly_logins = None
+        if self.cube is not None:
+            hourly_logins = self.cube.rollup('hour', 'state').frame()[COUNT].unstack(fill_value=0)
+            hourly_logins.index = hourly_logins.index.astype(np.int64)
+            hourly_logins.columns.name = 'state'
+
+        return {
+            'has_user': self.has_user,
+            'has_time': self.has_time,
+            'total_logins': self.rows,
+            'success_logins': int(state_counts.get('success', 0)),
+            'error_logins': int(state_counts.get('error', 0)),
+            'user_errors': _top_counts(self.user_errors, pd.Series(dtype='int64')),
+            'proto_stats': proto_stats,
+            'proto_counts': _sorted_counts(self.proto_counts),
+            'edges': self.edges,
+            'non_work_hours': self.non_work_hours,
+            'night_logins': self.night_logins,
+            'failure_events': _events_or_empty(self.failure_events),
+            'night_events': _events_or_empty(self.night_events),
+            'hourly_logins': hourly_logins,
+            'cube': self.cube,
+            'entity_days': self.entity_days or {},
+            'sketches': _sketches(user_errors=self.user_errors),
+        }
+
+
+class EmailAccumulator:
+    """email邮件日志的可合并聚合状态"""
+
+    def __init__(self, sketch_error=None):
+        """
+        Args:
+            sketch_error: 近似模式的误差参数，None表示精确统计；近似模式下垃圾邮件接收者只保留高频项
+        """
+        self.sketch_error = sketch_error
+        self.rows = 0
+        self.has_from = False
+        self.external_emails = 0
+        self.spam_emails = 0
+        self.spam_receivers = None
+        self.sender_counts = None
+        self.hourly = None
+        # 告警邮件（见alert_incidents），跨块、跨天合并后再配对为事件
+        self.alerts = None
+        self.entity_days = None
+
+    def update(self, df):
+        """累积一块email数据"""
+        self.rows += len(df)
+
+        if 'from' in df.columns:
+            self.has_from = True
+            is_internal = df['from'].str.contains(INTERNAL_EMAIL_DOMAIN, na=False).astype(bool)
+            self.external_emails += int((~is_internal).sum())
+            self.sender_counts = _merge_counts(
+                self.sender_counts, _first_seen_counts(df.loc[is_internal, 'from']), sort=False
+            )
+
+            is_spam = SPAM_CLASSIFIER.classify(df['subject']).astype(bool)
+            self.spam_emails += int(is_spam.sum())
+            if 'to' in df.columns:
+                self.spam_receivers = _merge_top(
+                    self.spam_receivers, _first_seen_counts(df.loc[is_spam, 'to']),
+                    self.sketch_error, sort=False
+                )
+
+        if 'time' in df.columns:
+            hours = df['time'].dt.hour
+            self.hourly = _merge_counts(self.hourly, hours.groupby(hours).size())
+            if 'subject' in df.columns:
+                self.alerts = merge_alert_events(self.alerts, alert_events(df['time'], df['subject']))
+            self.entity_days = merge_entity_days(self.entity_days, email_entity_days(df, INTERNAL_EMAIL_DOMAIN))
+
+        return self
+
+    def merge(self, other):
+        """合并另一个聚合状态，other中的数据视为排在本状态之后"""
+        self.rows += other.rows
+        self.has_from = self.has_from or other.has_from
+        self.external_emails += other.external_emails
+        self.spam_emails += other.spam_emails
+        if other.spam_receivers is not None:
+            self.spam_receivers = _merge_top(
+                self.spam_receivers, other.spam_receivers, self.sketch_error, sort=False
+            )
+        if other.sender_counts is not None:
+            self.sender_counts = _merge_counts(self.sender_counts, other.sender_counts, sort=False)
+        if other.hourly is not None:
+            self.hourly = _merge_counts(self.hourly, other.hourly)
+        self.alerts = merge_alert_events(self.alerts, other.alerts)
+        if other.entity_days is not None:
+            self.entity_days = merge_entity_days(self.entity_days, other.entity_days)
+        return self
+
+    def summary(self):
+        """生成与整表计算一致的统计结果"""
+        empty = pd.Series(dtype='int64')
+        return {
+            'has_from': self.has_from,
+            'total_emails': self.rows,
+            'external_emails': self.external_emails,
+            'spam_emails': self.spam_emails,
+            'spam_receivers': _sorted_counts(_top_counts(self.spam_receivers), empty),
+            'sender_counts': _sorted_counts(self.sender_counts, empty),
+            'hourly': self.hourly,
+            'alerts': self.alerts,
+            'entity_days': self.entity_days or {},
+            'sketches': _sketches(spam_receivers=self.spam_receivers),
+        }
+
+
+class CheckingAccumulator:
+    """checking打卡记录的可合并聚合状态，有效记录的工作时长按WORK_HOURS_BINS分箱计数"""
+
+    def __init__(self):
+        self.rows = 0
+        self.records = 0
+        self.total_hours = 0.0
+        self.overtime = 0
+        self.undertime = 0
+        self.hours_histogram = np.zeros(len(WORK_HOURS_BINS) - 1, dtype=np.int64)
+        self.hours_outside = 0
+        self.entity_days = None
+
+    def update(self, df):
+        """累积一块checking数据"""
+        self.rows += len(df)
+        if 'checkin' not in df.columns or len(df) == 0:
+            return self
+
+        valid = df['checkin'].notna() & df['checkout'].notna()
+        work_hours = ((
+            df.loc[valid, 'checkout'] - df.loc[valid, 'checkin']
+        ).dt.total_seconds() / 3600).to_numpy(dtype='float64')
+        self.records += len(work_hours)
+        self.total_hours += float(work_hours.sum())
+        self.overtime += int((work_hours > 12).sum())
+        self.undertime += int((work_hours < 4).sum())
+        binned = histogram(work_hours)
+        self.hours_histogram += np.asarray(binned['counts'], dtype=np.int64)
+        self.hours_outside += binned['outside']
+        if 'id' in df.columns and 'day' in df.columns:
+            self.entity_days = merge_entity_days(self.entity_days, checking_entity_days(df))
+        return self
+
+    def merge(self, other):
+        """合并另一个聚合状态，other中的数据视为排在本状态之后"""
+        self.rows += other.rows
+        self.records += other.records
+        self.total_hours += other.total_hours
+        self.overtime += other.overtime
+        self.undertime += other.undertime
+        self.hours_histogram += other.hours_histogram
+        self.hours_outside += other.hours_outside
+        if other.entity_days is not None:
+            self.entity_days = merge_entity_days(self.entity_days, other.entity_days)
+        return self
+
+    def summary(self):
+        """生成与整表计算一致的统计结果"""
+        return {
+            'total_records': self.records,
+            'work_hours_histogram': {
+                'edges': [float(edge) for edge in WORK_HOURS_BINS],
+                'counts': self.hours_histogram.tolist(),
+                'outside': self.hours_outside,
+            },
+            'avg_work_hours': self.total_hours / self.records if self.records else np.nan,
+            'overtime_count': self.overtime,
+            'undertime_count': self.undertime,
+            'entity_days': self.entity_days or {},
+        }
+
+
+# 各类日志对应的聚合状态
+AGGREGATORS = {
+    'login': LoginAccumulator,
+    'weblog': WebAccessAccumulator,
+    'tcplog': TrafficAccumulator,
+    'email': EmailAccumulator,
+    'checking': CheckingAccumulator,
+}
+
+# 支持近似模式的日志类型
+SKETCHED_TYPES = ('login', 'weblog', 'tcplog', 'email')
+
+
+def make_accumulator(log_type, sketch_error=None, host_classifier=None, burst_limits=None):
+    """
+    创建某类日志的聚合状态
+
+    Args:
+        log_type: 日志类型
+        sketch_error: 近似模式的误差参数，None表示精确统计
+        host_classifier: weblog使用的网站规则表（HostClassifier），None表示默认规则表
+        burst_limits: login明细事件的时间窗口检测参数（见LoginAccumulator），None表示保留全部事件
+    """
+    options = {}
+    if log_type == 'weblog':
+        options['host_classifier'] = host_classifier
+    if log_type == 'login':
+        options['burst_limits'] = burst_limits
+    if sketch_error is not None and log_type in SKETCHED_TYPES:
+        options['sketch_error'] = sketch_error
+    return AGGREGATORS[log_type](**options)
@@ -0,0 +1,235 @@
+"""
+网络监测数据分析与可视化 - 合成日志生成模块
+以样例数据为分布来源，按指定倍数生成同样目录结构与字段格式的逐日日志，用于规模测试：
+各类日志按工作日/周末分别有放回抽样，保留字段间的联合分布（协议与端口、内外部网站比例等），
+时间在原时刻上加随机偏移；告警邮件的[ALARM:n]/[RECOVER:n]主题按原格式重新生成监控项，
+打卡记录按倍数复制员工；相同的样例、倍数与种子总是生成相同的文件
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from alert_incidents import ALARM_SUBJECT
+from dataset_catalog import discover_partitions
+from log_loader import DATETIME_FORMAT, LOG_SOURCES
+
+
+# 默认随机种子
+SYNTHETIC_SEED = 2017
+
+# 生成时间在样例时刻上的随机偏移范围（秒）
+TIME_JITTER = 60
+
+# 复制员工时工号的间隔，倍数不超过100时工号仍在int32范围内
+EMPLOYEE_ID_STRIDE = 10000
+
+# 生成目录中记录生成参数的文件
+MANIFEST_FILE = 'synthetic.json'
+
+
+def is_weekend(date_str):
+    """日期是否为周六或周日"""
+    return date.fromisoformat(date_str).weekday() >= 5
+
+
+class LogProfile:
+    """从样例数据提取的各类日志行样本，按工作日/周末分开保存"""
+
+    def __init__(self, data_dir):
+        """
+        Args:
+            data_dir: 样例数据目录（其下为YYYY-MM-DD日期文件夹）
+        """
+        self.data_dir = Path(data_dir)
+        self.dates = [date_str for date_str, _ in discover_partitions(self.data_dir)]
+        # (日期, 日志类型) -> 当天行数，缺失的文件不记录
+        self.day_rows = {}
+        # (日志类型, 是否周末) -> (字符串DataFrame, 各时间列相对当天零点的秒数)
+        self.pools = {}
+
+        for log_type, source in LOG_SOURCES.items():
+            frames = {False: [], True: []}
+            for date_str in self.dates:
+                path = self.data_dir / date_str / source['file']
+                if not path.exists():
+                    continue
+                df = pd.read_csv(path, encoding=source['encoding'], dtype=str,
+                                 keep_default_na=False, encoding_errors='replace')
+                self.day_rows[(date_str, log_type)] = len(df)
+                frames[is_weekend(date_str)].append(self._with_offsets(df, source, date_str))
+
+            for weekend, parts in frames.items():
+                if not parts:
+                    continue
+                df = pd.concat(parts, ignore_index=True)
+                offset_cols = [f'_{col}' for col in source['datetimes']]
+                if log_type != 'checking':
+                    # 主时间列无法解析的行不进入样本（打卡记录的缺卡保留）
+                    df = df[df[offset_cols[0]].notna()].reset_index(drop=True)
+                offsets = df[offset_cols].to_numpy(dtype='float64')
+                self.pools[(log_type, weekend)] = (df.drop(columns=offset_cols), offsets)
+
+    @staticmethod
+    def _with_offsets(df, source, date_str):
+        """附加各时间列相对当天零点的秒数（无法解析为NaN）"""
+        midnight = pd.Timestamp(date_str)
+        for col in source['datetimes']:
+            times = pd.to_datetime(df[col], format=DATETIME_FORMAT, errors='coerce')
+            df[f'_{col}'] = (times - midnight).dt.total_seconds()
+        return df
+
+    def rows_for(self, date_str, log_type):
+        """样例中某天某类日志的行数，None表示当天没有该文件"""
+        return self.day_rows.get((date_str, log_type))
+
+
+def _format_times(midnight, seconds):
+    """当天零点加秒数，格式化为日志时间字符串，NaN为空字符串"""
+    valid = ~np.isnan(seconds)
+    result = np.full(len(seconds), '', dtype=object)
+    times = np.datetime64(midnight, 's') + seconds[valid].astype('int64').astype('timedelta64[s]')
+    result[valid] = np.char.replace(np.datetime_as_string(times, unit='s'), 'T', ' ')
+    return result
+
+
+def _alarm_item(item, replica):
+    """倍数大于1时将监控项按副本拆分为不同的32位十六进制编号"""
+    if replica == 0:
+        return item
+    return hashlib.md5(f'{item}:{replica}'.encode()).hexdigest()
+
+
+def _rewrite_alarm_subjects(df, rng, scale):
+    """告警邮件主题保持[ALARM:n]/[RECOVER:n]格式，监控项数随倍数增加"""
+    parts = df['subject'].str.extract(ALARM_SUBJECT.pattern)
+    alarms = parts[0].notna().to_numpy()
+    if not alarms.any() or scale == 1:
+        return df
+    replicas = rng.integers(scale, size=int(alarms.sum()))
+    items = [_alarm_item(item, int(r)) for item, r in zip(parts.loc[alarms, 3], replicas)]
+    df.loc[alarms, 'subject'] = ('[' + parts.loc[alarms, 0] + ':' + parts.loc[alarms, 1] + ']'
+                                 + parts.loc[alarms, 2] + pd.Series(items, index=parts.index[alarms]))
+    return df
+
+
+def generate_day(profile, date_str, log_type, scale, seed):
+    """
+    生成某天某类日志
+
+    Args:
+        profile: LogProfile
+        date_str: 日期
+        log_type: LOG_SOURCES中的日志类型
+        scale: 相对样例的行数倍数
+        seed: 随机种子
+
+    Returns:
+        DataFrame，字段均为字符串；当天样例没有该文件或没有同类日期的样本时为None
+    """
+    source = LOG_SOURCES[log_type]
+    weekend = is_weekend(date_str)
+    rows = profile.rows_for(date_str, log_type)
+    if rows is None or (log_type, weekend) not in profile.pools:
+        return None
+
+    pool, offsets = profile.pools[(log_type, weekend)]
+    # 每个(日期, 日志类型)使用独立的随机序列，生成结果与生成顺序无关
+    rng = np.random.default_rng([seed, scale, profile.dates.index(date_str),
+                                 list(LOG_SOURCES).index(log_type)])
+
+    if log_type == 'checking':
+        # 打卡记录每人每天一条：复制当天样例的员工，工号按副本错开
+        day_rows = np.flatnonzero(pool['day'].to_numpy() == date_str)
+        picks = np.tile(day_rows, scale)
+        replicas = np.repeat(np.arange(scale), len(day_rows))
+        df = pool.iloc[picks].reset_index(drop=True)
+        df['id'] = (df['id'].astype('int64') + replicas * EMPLOYEE_ID_STRIDE).astype(str)
+        df['day'] = date_str
+    else:
+        picks = rng.integers(len(pool), size=rows * scale)
+        df = pool.iloc[picks].reset_index(drop=True)
+
+    # 同一行的各时间列使用相同偏移，保持连接时长等间隔不变
+    jitter = rng.integers(TIME_JITTER, size=len(df)).astype('float64')
+    shifted = offsets[picks] + jitter[:, None]
+    for i, col in enumerate(source['datetimes']):
+        df[col] = _format_times(date_str, shifted[:, i])
+
+    if log_type == 'email':
+        df = _rewrite_alarm_subjects(df, rng, scale)
+
+    # 按主时间列排序，与原始日志的记录顺序一致
+    order = np.argsort(shifted[:, 0], kind='stable')
+    return df.iloc[order].reset_index(drop=True)
+
+
+def generate_logs(profile, out_dir, scale=1, seed=SYNTHETIC_SEED):
+    """
+    按样例的日期与文件结构生成全部合成日志
+
+    Args:
+        profile: LogProfile
+        out_dir: 输出目录，其下生成YYYY-MM-DD日期文件夹
+        scale: 相对样例的行数倍数
+        seed: 随机种子
+
+    Returns:
+        dict: 生成参数与各类日志的行数，同时写入out_dir下的synthetic.json
+    """
+    out_dir = Path(out_dir)
+    rows = {log_type: 0 for log_type in LOG_SOURCES}
+    total_bytes = 0
+
+    for date_str in profile.dates:
+        day_dir = out_dir / date_str
+        day_dir.mkdir(parents=True, exist_ok=True)
+        for log_type, source in LOG_SOURCES.items():
+            df = generate_day(profile, date_str, log_type, scale, seed)
+            if df is None:
+                continue
+            path = day_dir / source['file']
+            df.to_csv(path, index=False, encoding=source['encoding'], errors='replace')
+            rows[log_type] += len(df)
+            total_bytes += path.stat().st_size
+
+    manifest = {
+        'source': str(profile.data_dir),
+        'scale': scale,
+        'seed': seed,
+        'rows': rows,
+        'bytes': total_bytes,
+    }
+    with open(out_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_manifest(out_dir):
+    """读取已生成目录的生成参数，不存在时为None"""
+    path = Path(out_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按样例数据生成指定倍数的合成日志')
+    parser.add_argument('--source', default=str(Path(__file__).parent.parent / '选题二——企业日志数据'),
+                        help='样例数据目录')
+    parser.add_argument('--output', required=True, help='输出目录')
+    parser.add_argument('--scale', type=int, default=1, help='相对样例的行数倍数')
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED, help='随机种子')
+    args = parser.parse_args()
+
+    manifest = generate_logs(LogProfile(args.source), args.output, args.scale, args.seed)
+    print(f"已生成 {args.scale} 倍合成日志到 {args.output}:")
+    for log_type, count in manifest['rows'].items():
+        print(f"  {LOG_SOURCES[log_type]['label']}记录: {count}")
+    print(f"  文件总大小: {manifest['bytes'] / (1024**2):.1f} MB")
@@ -0,0 +1,201 @@
+"""
+测试公共部分：把analysis目录加入模块搜索路径，并生成格式与样例数据相同的合成日志
+"""
+
+import contextlib
+import io
+import json
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_processor import LogDataProcessor  # noqa: E402
+from log_loader import DATETIME_FORMAT, LOG_SOURCES, load_log_file  # noqa: E402
+
+
+# 合成日志的日期（含一个周末），每天的随机种子为日期序号
+SYNTHETIC_DATES = ['2017-11-03', '2017-11-04', '2017-11-05']
+
+EMPLOYEES = [str(1000 + i) for i in range(12)]
+EMPLOYEE_IPS = [f'10.64.105.{i}' for i in range(12)]
+SERVER_IPS = ['10.50.50.44', '10.7.133.16', '10.5.71.60']
+HOSTS = [
+    'www.baidu.com', 'WWW.TAOBAO.COM', 'email.hightech.com', 'oa.hightech.com', 'news.sina.com.cn',
+    'www.ifeng.com', 'www.so.com', 'v.6.cn', 'www.amazon.cn', 'www.alibaba.com', 'www.acfun.tv',
+    'mail.qq.com', 'www.example.org', 'sports.sina.com.cn',
+]
+SUBJECTS = ['周报', '会议通知', '新葡京娱乐', '彩票中奖', '项目进度', '红包']
+
+
+def _times(rng, day, n, start_hour=0, end_hour=24):
+    """当天[start_hour, end_hour)内n个随机时间，按时间排序"""
+    seconds = np.sort(rng.integers(start_hour * 3600, end_hour * 3600, n))
+    return pd.Timestamp(day) + pd.to_timedelta(seconds, unit='s')
+
+
+def _format(times):
+    return pd.Series(times).dt.strftime(DATETIME_FORMAT).to_numpy()
+
+
+def synthetic_day(day, seed):
+    """
+    生成一天的五类日志
+
+    Returns:
+        dict: 日志类型 -> DataFrame（各列为CSV中的字符串/数值，列顺序与样例数据相同）
+    """
+    rng = np.random.default_rng(seed)
+
+    # 登录：随机登录 + 一个用户集中失败（暴力破解）+ 一个用户凌晨集中登录
+    n = 300
+    login = pd.DataFrame({
+        'time': _times(rng, day, n, 7, 22),
+        'user': rng.choice(EMPLOYEES, n),
+        'sip': rng.choice(EMPLOYEE_IPS, n),
+        'dip': rng.choice(SERVER_IPS, n),
+        'state': rng.choice(['success', 'error'], n, p=[0.85, 0.15]),
+        'proto': rng.choice(['ssh', 'mysql', 'sqlserver'], n),
+    })
+    burst = pd.DataFrame({
+        'time': _times(rng, day, 14, 10, 12), 'user': EMPLOYEES[seed % len(EMPLOYEES)], 'sip': '10.64.105.200',
+        'dip': SERVER_IPS[0], 'state': 'error', 'proto': 'ssh',
+    })
+    night = pd.DataFrame({
+        'time': _times(rng, day, 8, 2, 3), 'user': 'root', 'sip': '10.64.105.201',
+        'dip': SERVER_IPS[1], 'state': 'success', 'proto': 'ssh',
+    })
+    login = pd.concat([login, burst, night], ignore_index=True).sort_values('time', kind='stable')
+    login['sport'] = rng.integers(1024, 65535, len(login))
+    login['dport'] = np.where(login['proto'] == 'ssh', 22, 3306)
+    login['time'] = _format(login['time'])
+    login = login[['proto', 'dip', 'dport', 'sip', 'sport', 'state', 'time', 'user']]
+
+    # 网页访问
+    n = 400
+    weblog = pd.DataFrame({
+        'time': _format(_times(rng, day, n, 8, 20)),
+        'sip': rng.choice(EMPLOYEE_IPS, n),
+        'sport': rng.integers(1024, 65535, n).astype(object),
+        'dip': rng.choice(['220.181.112.244', '54.222.60.218', '10.5.71.60'], n),
+        'dport': rng.choice([80, 443, 8080], n),
+        'host': rng.choice(HOSTS, n),
+    })
+    # 缺失的端口与host
+    weblog.loc[rng.choice(n, 5, replace=False), 'sport'] = None
+    weblog.loc[rng.choice(n, 3, replace=False), 'host'] = None
+
+    # 邮件：普通邮件、垃圾邮件与监控告警/恢复邮件
+    n = 150
+    alarm_items = [f'{index:032x}' for index in range(3)]
+    subjects = rng.choice(SUBJECTS, n).astype(object)
+    alerts = rng.choice(n, 30, replace=False)
+    subjects[alerts] = [
+        f"[{'ALARM' if k % 3 else 'RECOVER'}:{500 + k % 4}]HOST_5XX{alarm_items[k % 3]}" for k in range(30)
+    ]
+    email = pd.DataFrame({
+        'time': _format(_times(rng, day, n, 8, 20)),
+        'proto': 'smtp',
+        'sip': rng.choice(EMPLOYEE_IPS + ['10.116.216.71'], n),
+        'sport': rng.integers(1024, 65535, n),
+        'dip': '10.5.71.60',
+        'dport': 25,
+        'from': rng.choice([f'{user}@hightech.com' for user in EMPLOYEES] + ['spam@qq.com', 'work@hightech.com'], n),
+        'to': rng.choice([f'{user}@hightech.com' for user in EMPLOYEES], n),
+        'subject': subjects,
+    })
+
+    # TCP连接：包含少量超大流量与缺失的流量长度
+    n = 500
+    stime = _times(rng, day, n)
+    tcplog = pd.DataFrame({
+        'stime': _format(stime),
+        'dtime': _format(stime + pd.to_timedelta(rng.integers(0, 900, n), unit='s')),
+        'proto': rng.choice(['http', 'ssh', 'smtp', 'mysql'], n),
+        'dip': rng.choice(SERVER_IPS + ['54.222.60.218'], n),
+        'dport': rng.choice([80, 22, 25, 3306], n),
+        'sip': rng.choice(EMPLOYEE_IPS + ['10.1.4.17', '10.1.5.9'], n),
+        'sport': rng.integers(1024, 65535, n),
+        'uplink_length': rng.lognormal(7, 2, n).astype(np.int64).astype(object),
+        'downlink_length': rng.lognormal(8, 2, n).astype(np.int64).astype(object),
+    })
+    tcplog.loc[rng.choice(n, 4, replace=False), 'uplink_length'] = None
+
+    # 打卡：部分员工没有签到或签退
+    checkin = _times(rng, day, len(EMPLOYEES), 6, 10)
+    checkout = checkin + pd.to_timedelta(rng.integers(2 * 3600, 14 * 3600, len(EMPLOYEES)), unit='s')
+    checking = pd.DataFrame({
+        'id': EMPLOYEES, 'day': day, 'checkin': _format(checkin), 'checkout': _format(checkout),
+    })
+    checking.loc[0, 'checkin'] = '0'
+    checking.loc[1, 'checkout'] = '0'
+
+    return {'login': login, 'weblog': weblog, 'email': email, 'tcplog': tcplog, 'checking': checking}
+
+
+def write_synthetic_logs(data_dir, dates=SYNTHETIC_DATES):
+    """按样例数据的目录结构（每天一个目录）写出合成日志"""
+    data_dir = Path(data_dir)
+    for seed, day in enumerate(dates):
+        day_dir = data_dir / day
+        day_dir.mkdir(parents=True, exist_ok=True)
+        for log_type, df in synthetic_day(day, seed).items():
+            source = LOG_SOURCES[log_type]
+            df.to_csv(day_dir / source['file'], index=False, encoding=source['encoding'])
+    return data_dir
+
+
+@pytest.fixture(scope='session')
+def synthetic_dir(tmp_path_factory):
+    """写有合成日志的数据目录（整个测试会话共用，测试不应修改）"""
+    return write_synthetic_logs(tmp_path_factory.mktemp('logs'))
+
+
+@pytest.fixture(scope='session')
+def synthetic_frames(synthetic_dir):
+    """合成日志第一天各类日志加载后的DataFrame"""
+    day_dir = synthetic_dir / SYNTHETIC_DATES[0]
+    return {
+        log_type: load_log_file(day_dir / source['file'], log_type)[0]
+        for log_type, source in LOG_SOURCES.items()
+    }
+
+
+def run_analysis(data_dir, output_dir, **options):
+    """
+    运行完整分析并读取输出的JSON
+
+    Returns:
+        dict: 文件名 -> 解析后的JSON（不含每次运行都不同的run_metrics.json与分析时间）
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        LogDataProcessor(data_dir, output_dir=output_dir, **options).run_full_analysis()
+    outputs = {
+        path.name: json.loads(path.read_text(encoding='utf-8'))
+        for path in sorted(Path(output_dir).glob('*.json')) if path.name != 'run_metrics.json'
+    }
+    outputs['analysis_summary.json'].pop('analysis_time')
+    return outputs
+
+
+def assert_same(left, right, path='$'):
+    """逐项比较两个JSON值，浮点数按相对误差1e-9比较（求和顺序不同）"""
+    if isinstance(left, float) or isinstance(right, float):
+        assert isinstance(left, (int, float)) and isinstance(right, (int, float)), path
+        assert math.isclose(left, right, rel_tol=1e-9, abs_tol=1e-12) or (left != left and right != right), \
+            f'{path}: {left} != {right}'
+    elif isinstance(left, dict):
+        assert isinstance(right, dict) and list(left) == list(right), f'{path}: {list(left)} != {list(right)}'
+        for key in left:
+            assert_same(left[key], right[key], f'{path}/{key}')
+    elif isinstance(left, list):
+        assert isinstance(right, list) and len(left) == len(right), f'{path}: 长度不同'
+        for index, (a, b) in enumerate(zip(left, right)):
+            assert_same(a, b, f'{path}[{index}]')
+    else:
+        assert left == right, f'{path}: {left!r} != {right!r}'
@@ -0,0 +1,89 @@
+"""
+规则表分类：与原先逐行apply的判断结果一致
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import HOSTS, SUBJECTS
+from host_classifier import (EXTERNAL_DOMAINS, HostClassifier, MultiPatternMatcher, external_mask,
+                             website_categories)
+from streaming import SPAM_CLASSIFIER, SPAM_KEYWORDS
+
+
+def old_is_external(host):
+    return any(domain in str(host).lower() for domain in EXTERNAL_DOMAINS)
+
+
+def old_categorize_website(host):
+    host = str(host).lower()
+    if 'hightech.com' in host:
+        return '内部系统'
+    elif any(x in host for x in ['baidu', 'so.com']):
+        return '搜索引擎'
+    elif any(x in host for x in ['taobao', 'alibaba', 'amazon']):
+        return '电商'
+    elif any(x in host for x in ['sina', 'ifeng', '6.cn']):
+        return '新闻娱乐'
+    else:
+        return '其他'
+
+
+def old_is_spam(subject):
+    return any(kw in str(subject) for kw in SPAM_KEYWORDS)
+
+
+@pytest.fixture(scope='module')
+def hosts():
+    rng = np.random.default_rng(11)
+    extra = ['baidu.com.hightech.com', 'sina.taobao.com', 'SO.COM', 'x6.cnn', 'nan', '', 'qq.comm']
+    values = rng.choice(HOSTS + extra, 2000).astype(object)
+    values[rng.random(2000) < 0.05] = None
+    return pd.Series(values)
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_external_mask_matches_apply(hosts, categorical):
+    values = hosts.astype('category') if categorical else hosts
+    expected = hosts.apply(old_is_external)
+    pd.testing.assert_series_equal(external_mask(values), expected, check_names=False)
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_website_categories_match_apply(hosts, categorical):
+    values = hosts.astype('category') if categorical else hosts
+    expected = hosts.apply(old_categorize_website)
+    assert (website_categories(values) == expected).all()
+
+
+def test_spam_classifier_matches_apply():
+    rng = np.random.default_rng(5)
+    subjects = pd.Series(rng.choice(SUBJECTS + ['QQ.COM红包', 'qq.com', '[ALARM:1]HOST'], 1000).astype(object))
+    subjects[::97] = None
+    expected = subjects.apply(old_is_spam)
+    assert (SPAM_CLASSIFIER.classify(subjects).astype(bool) == expected).all()
+
+
+def test_matcher_finds_overlapping_patterns():
+    matcher = MultiPatternMatcher(['he', 'she', 'his', 'hers'])
+    assert matcher.find_all('ushers') == {0, 1, 3}
+    assert matcher.find_all('') == set()
+
+
+def test_host_rules_from_json(tmp_path, hosts):
+    rules = {'external_domains': ['example.org'], 'category_rules': [['示例', ['example']]]}
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(rules, ensure_ascii=False), encoding='utf-8')
+    classifier = HostClassifier.from_json(path)
+
+    expected_external = hosts.apply(lambda host: 'example.org' in str(host).lower())
+    assert (classifier.external_mask(hosts) == expected_external).all()
+    assert set(classifier.website_categories(hosts)) == {'示例', '其他'}
+    assert classifier.to_dict()['default_category'] == '其他'
+
+    path.write_text(json.dumps({'unknown': []}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        HostClassifier.from_json(path)
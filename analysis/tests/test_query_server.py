@@ -0,0 +1,99 @@
+"""
+本地查询服务：时间范围取整、与完整分析一致的结果、ETag与304
+"""
+
+import contextlib
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from conftest import assert_same, run_analysis
+from data_processor import LogDataProcessor
+from query_server import QueryIndex, QueryService, make_server, parse_hour
+
+
+@pytest.fixture(scope='module')
+def processor(synthetic_dir, tmp_path_factory):
+    processor = LogDataProcessor(synthetic_dir, output_dir=tmp_path_factory.mktemp('query') / 'output')
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.load_all_data()
+    return processor
+
+
+@pytest.fixture(scope='module')
+def server(processor):
+    server = make_server(QueryService(QueryIndex(processor)), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, headers=None):
+    """返回(状态码, 响应头, 响应体)"""
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_parse_hour_rounds_range_ends():
+    assert str(parse_hour('2017-11-03 10:30')) == '2017-11-03T10'
+    assert str(parse_hour('2017-11-03 10:30', end=True)) == '2017-11-03T11'
+    assert str(parse_hour('2017-11-03 10:00', end=True)) == '2017-11-03T10'
+    assert str(parse_hour('2017-11-03', end=True)) == '2017-11-04T00'
+
+
+def test_hourly_logins_range(server, processor):
+    status, _, body = get(f'{server}/api/hourly_logins?start=2017-11-03%2010:30&end=2017-11-04%2009:15')
+    assert status == 200
+    result = json.loads(body)
+    assert (result['start'], result['end']) == ('2017-11-03T10', '2017-11-04T10')
+
+    times = processor.login_df['time']
+    expected = ((times >= pd.Timestamp('2017-11-03 10:00')) & (times < pd.Timestamp('2017-11-04 10:00'))).sum()
+    assert sum(row['total'] for row in result['result']['series']) == expected
+    assert sum(result['result']['by_hour_of_day'].values()) == expected
+
+
+def test_threats_over_full_range_match_analysis(server, synthetic_dir, tmp_path):
+    status, _, body = get(f'{server}/api/threats')
+    assert status == 200
+    threats = json.loads(body)['result']
+    batch = run_analysis(synthetic_dir, tmp_path / 'output')['security_threats.json']
+    assert threats['total_threats'] > 0
+    assert_same(threats['threats'], batch['threats'])
+
+
+def test_etag_and_not_modified(server):
+    url = f'{server}/api/traffic_by_proto?start=2017-11-04&end=2017-11-04'
+    status, headers, body = get(url)
+    etag = headers['ETag']
+    assert status == 200 and etag and body
+
+    status, headers, body = get(url, {'If-None-Match': etag})
+    assert status == 304
+    assert headers['ETag'] == etag
+    assert body == b''
+
+    # 范围不同时结果不同，ETag也不同
+    _, other, _ = get(f'{server}/api/traffic_by_proto?start=2017-11-03&end=2017-11-04')
+    assert other['ETag'] != etag
+    status, _, _ = get(url, {'If-None-Match': other['ETag']})
+    assert status == 200
+
+
+def test_errors(server):
+    assert get(f'{server}/api/unknown')[0] == 404
+    assert get(f'{server}/other')[0] == 404
+    status, _, body = get(f'{server}/api/hourly_logins?start=not-a-date')
+    assert status == 400
+    assert 'error' in json.loads(body)
@@ -0,0 +1,74 @@
+"""
+近似统计草图：估计值落在各草图给出的误差上界内
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import DistinctCounter, HeavyHitters, QuantileSketch
+
+
+ERROR = 0.01
+
+
+@pytest.fixture(scope='module')
+def zipf_keys():
+    """长尾分布的键（如源IP），分成若干块"""
+    rng = np.random.default_rng(7)
+    keys = rng.zipf(1.3, 200000) % 50000
+    return np.array_split(keys, 9)
+
+
+def test_heavy_hitters_within_bounds(zipf_keys):
+    exact = pd.Series(np.concatenate(zipf_keys)).value_counts()
+
+    # 各块单独累积后合并，与跨块/跨天的用法相同
+    sketch = HeavyHitters(ERROR)
+    for chunk in zipf_keys:
+        sketch.merge(HeavyHitters(ERROR).update(pd.Series(chunk).value_counts()))
+
+    assert sketch.total == exact.sum()
+    assert len(sketch.counts) <= sketch.capacity
+    assert sketch.bound() <= ERROR * sketch.total
+
+    # 保存的键：真实值位于[counts - errors, counts]
+    true = exact.reindex(sketch.counts.index, fill_value=0)
+    assert (true <= sketch.counts).all()
+    assert (true >= sketch.counts - sketch.errors).all()
+
+    # 未保存的键真实值不超过floor，真实值大于floor的键一定被保存
+    untracked = exact.drop(sketch.counts.index, errors='ignore')
+    assert untracked.max() <= sketch.bound()
+    assert set(exact[exact > sketch.bound()].index) <= set(sketch.counts.index)
+
+
+def test_quantile_sketch_rank_error():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(8, 2, 200000)
+    sketch = QuantileSketch(ERROR)
+    for chunk in np.array_split(values, 9):
+        sketch.merge(QuantileSketch(ERROR).update(chunk))
+
+    ordered = np.sort(values)
+    assert sketch.count == len(values)
+    for q in [0.01, 0.25, 0.5, 0.9, 0.99]:
+        estimate = sketch.quantile(q)
+        rank = np.searchsorted(ordered, estimate, side='right')
+        assert abs(rank - q * len(values)) <= ERROR * len(values)
+
+    threshold = np.quantile(values, 0.99)
+    assert abs(sketch.count_above(threshold) - (values > threshold).sum()) <= ERROR * len(values)
+
+
+@pytest.mark.parametrize('distinct', [50, 5000, 200000])
+def test_distinct_counter_relative_error(distinct):
+    rng = np.random.default_rng(distinct)
+    values = rng.choice(np.arange(distinct, dtype=np.uint64) * 2654435761 % (1 << 32), distinct * 3)
+    counter = DistinctCounter()
+    for chunk in np.array_split(values, 5):
+        counter.merge(DistinctCounter().update(chunk))
+
+    exact = len(np.unique(values))
+    # 3倍标准误差
+    assert abs(counter.estimate() - exact) <= 3 * counter.error * exact + 1
@@ -0,0 +1,95 @@
+"""
+时间窗口检测：detect_bursts与逐事件计数的参考实现一致，compact_events不改变检测结果
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from window_detection import BURST_KEYS, compact_events, detect_bursts
+
+
+def brute_force_bursts(events, threshold, window):
+    """参考实现：对每个键逐个事件计数窗口内的事件数，重叠的命中窗口合并为一个时段"""
+    window_seconds = int(window.total_seconds())
+    events = events.dropna(subset=['time'])
+    rows = []
+    for key, group in events.groupby(BURST_KEYS, sort=True):
+        times = group['time'].sort_values(kind='stable').tolist()
+        seconds = [int(t.timestamp()) for t in times]
+        burst = None
+        for i, start in enumerate(seconds):
+            count = sum(1 for t in seconds[i:] if t < start + window_seconds)
+            if count <= threshold:
+                continue
+            last = i + count - 1
+            if burst is not None and i <= burst['last']:
+                burst['last'] = max(burst['last'], last)
+                burst['max_count'] = max(burst['max_count'], count)
+            else:
+                if burst is not None:
+                    rows.append(burst)
+                burst = {'key': key, 'first': i, 'last': last, 'max_count': count, 'times': times}
+        if burst is not None:
+            rows.append(burst)
+    return [
+        (*burst['key'], burst['times'][burst['first']], burst['times'][burst['last']],
+         burst['max_count'], burst['last'] - burst['first'] + 1)
+        for burst in rows
+    ]
+
+
+def random_events(rng, n, days=1):
+    """少量键上的随机事件，含同一秒的事件与缺失的时间"""
+    seconds = rng.integers(0, 86400 * days, n)
+    # 一部分事件集中在几个短时段内
+    dense = rng.random(n) < 0.4
+    seconds[dense] = rng.choice(rng.integers(0, 86400 * days, 4), dense.sum()) + rng.integers(0, 1800, dense.sum())
+    events = pd.DataFrame({
+        'time': pd.Timestamp('2017-11-01') + pd.to_timedelta(np.sort(seconds), unit='s'),
+        'user': rng.choice(['1001', '1002', 'root'], n),
+        'sip': rng.choice([167772161, 167772162], n).astype(np.uint32),
+        'dip': np.full(n, 3232235777, dtype=np.uint32),
+    })
+    events.loc[rng.random(n) < 0.02, 'time'] = pd.NaT
+    return events
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_detect_bursts_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    events = random_events(rng, int(rng.integers(1, 300)))
+    threshold = int(rng.integers(1, 10))
+    window = pd.Timedelta(minutes=int(rng.integers(1, 240)))
+
+    result = detect_bursts(events, threshold, window)
+    actual = [
+        (row.user, row.sip, row.dip, row.window_start, row.window_end, row.max_count, row.total_count)
+        for row in result.itertuples(index=False)
+    ]
+    assert actual == brute_force_bursts(events, threshold, window)
+
+
+def test_detect_bursts_empty():
+    events = pd.DataFrame({'time': pd.Series([pd.NaT], dtype='datetime64[ns]'),
+                           'user': ['1001'], 'sip': [1], 'dip': [2]})
+    assert detect_bursts(events, 1, pd.Timedelta(hours=1)).empty
+    assert detect_bursts(events.iloc[:0], 1, pd.Timedelta(hours=1)).empty
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_compacted_days_give_same_bursts(seed):
+    # 按天依次合并并压缩（与增量模式中LoginAccumulator的用法相同）
+    rng = np.random.default_rng(seed)
+    events = random_events(rng, int(rng.integers(50, 600)), days=4).dropna(subset=['time'])
+    threshold = int(rng.integers(1, 8))
+    window = pd.Timedelta(minutes=int(rng.integers(1, 600)))
+
+    state = None
+    for _, day in events.groupby(events['time'].dt.date):
+        day = compact_events(day.reset_index(drop=True), threshold, window)
+        state = day if state is None else compact_events(pd.concat([state, day], ignore_index=True),
+                                                         threshold, window)
+    assert len(state) <= len(events)
+    pd.testing.assert_frame_equal(detect_bursts(state, threshold, window).reset_index(drop=True),
+                                  detect_bursts(events, threshold, window).reset_index(drop=True))
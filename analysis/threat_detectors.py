@@ -0,0 +1,263 @@
+"""
+网络监测数据分析与可视化 - 威胁检测器模块
+每个检测器声明所需的日志聚合统计，输出威胁列表；用register_detector注册即可加入安全威胁检测，
+无需修改LogDataProcessor，各检测器在分析流程中作为独立阶段并发执行
+"""
+
+import pandas as pd
+
+from ip_index import decode_index, decode_ips, subnet_rollup
+from log_loader import DATETIME_FORMAT
+from streaming import error_bounds
+from window_detection import BRUTE_FORCE_HIGH_THRESHOLD, detect_bursts, window_label
+
+
+class Detection:
+    """检测器的结果"""
+
+    def __init__(self, threats=None, messages=None, extra=None):
+        """
+        Args:
+            threats: 威胁记录列表
+            messages: 按顺序打印的检测摘要
+            extra: 写入security_threats.json的附加字段
+        """
+        self.threats = threats or []
+        self.messages = messages or []
+        self.extra = extra or {}
+
+
+class ThreatDetector:
+    """已注册的检测器"""
+
+    def __init__(self, name, inputs, func):
+        """
+        Args:
+            name: 检测器名称
+            inputs: 所需的日志聚合统计（LOG_SOURCES中的日志类型）
+            func: func(processor, **summaries) -> Detection
+        """
+        self.name = name
+        self.inputs = list(inputs)
+        self.func = func
+
+    def detect(self, processor, **summaries):
+        return self.func(processor, **summaries)
+
+
+# 按注册顺序执行与输出的检测器
+THREAT_DETECTORS = []
+
+
+def register_detector(name, inputs):
+    """
+    注册威胁检测器的装饰器
+
+    Args:
+        name: 检测器名称
+        inputs: 所需的日志聚合统计，如['login']，以同名关键字参数传入
+    """
+    def decorator(func):
+        THREAT_DETECTORS.append(ThreatDetector(name, inputs, func))
+        return func
+    return decorator
+
+
+def run_detectors(processor, summary):
+    """
+    依次执行THREAT_DETECTORS中的各检测器
+
+    Args:
+        processor: LogDataProcessor（提供检测阈值等参数）
+        summary: 函数，日志类型 -> 聚合统计，每类日志只调用一次
+
+    Returns:
+        dict: 检测器名称 -> Detection
+    """
+    summaries = {}
+    detections = {}
+    for detector in THREAT_DETECTORS:
+        for log_type in detector.inputs:
+            if log_type not in summaries:
+                summaries[log_type] = summary(log_type)
+        detections[detector.name] = detector.detect(
+            processor, **{log_type: summaries[log_type] for log_type in detector.inputs}
+        )
+    return detections
+
+
+def combine_detections(detections):
+    """
+    按注册顺序汇总各检测器的结果
+
+    Returns:
+        (dict, list): security_threats.json的内容，以及按顺序的检测摘要
+    """
+    threats = []
+    messages = []
+    extra = {}
+    for detector in THREAT_DETECTORS:
+        detection = detections[detector.name]
+        messages.extend(detection.messages)
+        threats.extend(detection.threats)
+        for key, value in detection.extra.items():
+            if isinstance(value, dict):
+                extra.setdefault(key, {}).update(value)
+            else:
+                extra[key] = value
+
+    result = {
+        'total_threats': len(threats),
+        'high_severity': sum(1 for t in threats if t['severity'] == 'high'),
+        'medium_severity': sum(1 for t in threats if t['severity'] == 'medium'),
+        'threats': threats,
+        'abnormal_traffic_subnets': extra.pop('abnormal_traffic_subnets', {})
+    }
+    # 检测器的其他附加字段，如近似模式下未进入草图的IP的计数上界untracked_bounds
+    result.update(extra)
+    return result, messages
+
+
+def burst_records(bursts):
+    """将时间窗口检测结果转换为威胁记录字段"""
+    if len(bursts) == 0:
+        return []
+    records = pd.DataFrame({
+        'user': bursts['user'].astype(str),
+        'sip': decode_ips(bursts['sip']),
+        'dip': decode_ips(bursts['dip']),
+        'count': bursts['total_count'].astype(int),
+        'max_window_count': bursts['max_count'].astype(int),
+        'window_start': bursts['window_start'].dt.strftime(DATETIME_FORMAT),
+        'window_end': bursts['window_end'].dt.strftime(DATETIME_FORMAT),
+    })
+    return records.to_dict('records')
+
+
+@register_detector('brute_force', ['login'])
+def detect_brute_force(processor, login):
+    """暴力破解：同一(用户, 源IP, 目的IP)在时间窗口内集中登录失败"""
+    if not login['has_user']:
+        return Detection()
+
+    bursts = detect_bursts(
+        login['failure_events'], processor.brute_force_threshold, processor.brute_force_window
+    )
+    threats = []
+    for burst in burst_records(bursts):
+        threats.append({
+            'type': '暴力破解',
+            'severity': 'high' if burst['count'] > BRUTE_FORCE_HIGH_THRESHOLD else 'medium',
+            'description': (f"用户 {burst['user']} 从 {burst['sip']} 登录 {burst['dip']} "
+                            f"在 {burst['window_start']} ~ {burst['window_end']} 内失败 {burst['count']} 次"
+                            f"（{window_label(processor.brute_force_window)}内最多 {burst['max_window_count']} 次）"),
+            **burst
+        })
+
+    return Detection(threats, [f"检测到疑似暴力破解: {len(bursts)} 个时段 ({bursts['user'].nunique()} 个用户)"])
+
+
+@register_detector('night_activity', ['login'])
+def detect_night_activity(processor, login):
+    """非工作时间异常活动：同一(用户, 源IP, 目的IP)在时间窗口内集中凌晨登录"""
+    if not login['has_time'] or login['night_logins'] == 0:
+        return Detection()
+
+    night_logins = login['night_logins']
+    night_bursts = detect_bursts(login['night_events'], processor.night_threshold, processor.night_window)
+    threats = []
+    for burst in burst_records(night_bursts):
+        threats.append({
+            'type': '非工作时间活动',
+            'severity': 'medium',
+            'description': (f"用户 {burst['user']} 从 {burst['sip']} 登录 {burst['dip']} "
+                            f"在凌晨 {burst['window_start']} ~ {burst['window_end']} 内登录 {burst['count']} 次"
+                            f"（{window_label(processor.night_window)}内最多 {burst['max_window_count']} 次）"),
+            **burst
+        })
+
+    return Detection(threats, [f"检测到凌晨登录: {night_logins} 次，集中时段 {len(night_bursts)} 个"])
+
+
+@register_detector('heavy_senders', ['email'])
+def detect_heavy_senders(processor, email):
+    """数据泄露风险：发送超过50封邮件的内部账户"""
+    if not email['has_from']:
+        return Detection()
+
+    sender_counts = email['sender_counts']
+    heavy_senders = sender_counts[sender_counts > 50]
+    threats = []
+    for sender, count in heavy_senders.items():
+        threats.append({
+            'type': '异常邮件发送',
+            'severity': 'medium',
+            'description': f'{sender} 发送了 {count} 封邮件',
+            'user': str(sender),
+            'count': int(count)
+        })
+
+    return Detection(threats, [f"检测到大量发送邮件: {len(heavy_senders)} 个账户"])
+
+
+@register_detector('abnormal_traffic', ['tcplog'])
+def detect_abnormal_traffic(processor, tcplog):
+    """异常流量：流量超过各源IP平均值3倍的IP，并按/24子网汇总"""
+    ip_traffic = tcplog['ip_traffic']
+    if ip_traffic is None:
+        return Detection(extra={'abnormal_traffic_subnets': {}})
+
+    avg_traffic = tcplog['avg_ip_traffic']
+    abnormal_ips = ip_traffic[ip_traffic > avg_traffic * 3]
+    bounds = error_bounds(tcplog, 'ip_traffic', abnormal_ips)
+    if bounds is not None:
+        bounds = decode_index(bounds)
+
+    threats = []
+    for ip, traffic in decode_index(abnormal_ips).items():
+        threats.append({
+            'type': '异常流量',
+            'severity': 'high' if traffic > avg_traffic * 5 else 'medium',
+            'description': f'IP {ip} 产生异常流量 {traffic/(1024**2):.2f} MB',
+            'ip': str(ip),
+            'traffic_mb': float(traffic / (1024**2))
+        })
+        if bounds is not None:
+            threats[-1]['traffic_mb_error'] = float(bounds[ip] / (1024**2))
+
+    messages = [f"检测到异常流量IP: {len(abnormal_ips)} 个"]
+    extra = {}
+
+    # 近似模式下未进入草图的IP也可能超过阈值
+    sketch = tcplog['sketches'].get('ip_traffic')
+    if sketch is not None:
+        if sketch.bound() >= avg_traffic * 3:
+            messages.append(f"  注意: 近似模式下未跟踪项的计数上界为 {sketch.bound()}，不低于阈值，结果可能有遗漏")
+        extra['untracked_bounds'] = {'ip_traffic': sketch.bound()}
+
+    # 异常流量IP按/24子网汇总
+    abnormal_subnets = pd.DataFrame({
+        'ips': subnet_rollup(pd.Series(1, index=abnormal_ips.index), 24),
+        'traffic_mb': subnet_rollup(abnormal_ips, 24) / (1024**2),
+    })
+    extra['abnormal_traffic_subnets'] = abnormal_subnets.to_dict('index')
+    return Detection(threats, messages, extra)
+
+
+@register_detector('spam_attack', ['email'])
+def detect_spam_attack(processor, email):
+    """垃圾邮件攻击：垃圾邮件超过100封"""
+    if not email['has_from']:
+        return Detection()
+
+    spam_count = email['spam_emails']
+    threats = []
+    if spam_count > 100:
+        threats.append({
+            'type': '垃圾邮件攻击',
+            'severity': 'high',
+            'description': f'检测到 {spam_count} 封垃圾邮件',
+            'count': int(spam_count)
+        })
+
+    return Detection(threats, [f"检测到垃圾邮件: {spam_count} 封"])
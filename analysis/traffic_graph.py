@@ -0,0 +1,202 @@
+"""
+网络监测数据分析与可视化 - 流量图模块
+将全部连接按(源IP, 目的IP)汇总为边（流量字节数与连接数），边表可跨块、跨天合并；
+由边表构建scipy稀疏邻接矩阵，用稀疏矩阵运算计算各节点的度、扇出/扇入、加权PageRank与弱连通分量，
+并导出按PageRank剪枝的前K个节点的子图用于网络拓扑可视化
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+
+# PageRank的阻尼系数、收敛阈值（L1）与最大迭代次数
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOL = 1e-10
+PAGERANK_MAX_ITER = 100
+
+# 导出子图保留的节点数与边数
+TOP_NODES = 50
+TOP_LINKS = 200
+
+# 可参与建图的日志（均有sip/dip列），只有tcpLog有流量字节数
+GRAPH_SOURCES = ['tcplog', 'login', 'weblog']
+
+
+def pair_keys(sip, dip):
+    """uint32的源IP与目的IP组合为一个uint64边键"""
+    return (np.asarray(sip, dtype=np.uint64) << np.uint64(32)) | np.asarray(dip, dtype=np.uint64)
+
+
+def split_pair_keys(keys):
+    """uint64边键拆分为(源IP, 目的IP)两个uint32数组"""
+    keys = np.asarray(keys, dtype=np.uint64)
+    return (keys >> np.uint64(32)).astype(np.uint32), (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def edge_counts(sip, dip, traffic=None):
+    """
+    一块数据按(源IP, 目的IP)汇总的边
+
+    Args:
+        sip, dip: uint32编码的IP数组
+        traffic: 每条连接的字节数，None表示只计连接数（login、weblog）
+
+    Returns:
+        DataFrame，索引为边键（见pair_keys，升序），列bytes与flows
+    """
+    codes, keys = pd.factorize(pair_keys(sip, dip), sort=True)
+    flows = np.bincount(codes, minlength=len(keys))
+    if traffic is None:
+        edge_bytes = np.zeros(len(keys), dtype=np.int64)
+    else:
+        edge_bytes = np.bincount(codes, weights=np.asarray(traffic, dtype=np.float64), minlength=len(keys))
+    return pd.DataFrame(
+        {'bytes': edge_bytes.astype(np.int64), 'flows': flows.astype(np.int64)},
+        index=pd.Index(keys, name='edge'),
+    )
+
+
+def merge_edges(tables):
+    """
+    合并多个边表，同一条边的字节数与连接数相加
+
+    各边表的边键升序且不重复，合并只需对边键取并集后按位置累加，不经过groupby
+    """
+    tables = [table for table in tables if table is not None]
+    if not tables:
+        return pd.DataFrame({'bytes': np.zeros(0, dtype=np.int64), 'flows': np.zeros(0, dtype=np.int64)},
+                            index=pd.Index(np.zeros(0, dtype=np.uint64), name='edge'))
+    if len(tables) == 1:
+        return tables[0]
+    # 整数排序后去重，比np.unique的哈希去重快
+    keys = np.sort(np.concatenate([table.index.to_numpy(dtype=np.uint64) for table in tables]))
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    merged = {'bytes': np.zeros(len(keys), dtype=np.int64), 'flows': np.zeros(len(keys), dtype=np.int64)}
+    for table in tables:
+        positions = np.searchsorted(keys, table.index.to_numpy(dtype=np.uint64))
+        for column, values in merged.items():
+            values[positions] += table[column].to_numpy(dtype=np.int64)
+    return pd.DataFrame(merged, index=pd.Index(keys, name='edge'))
+
+
+class TrafficGraph:
+    """由边表构建的有向图，节点为IP，邻接矩阵为CSR稀疏矩阵"""
+
+    def __init__(self, edges, weight='bytes'):
+        """
+        Args:
+            edges: edge_counts格式的边表（可由多个边表合并）
+            weight: PageRank使用的边权，'bytes'或'flows'
+        """
+        sip, dip = split_pair_keys(edges.index.to_numpy())
+        # 节点为出现过的全部IP（升序），src/dst为各边两端的节点编号
+        self.nodes = np.unique(np.concatenate([sip, dip]))
+        self.src = np.searchsorted(self.nodes, sip)
+        self.dst = np.searchsorted(self.nodes, dip)
+        self.edge_bytes = edges['bytes'].to_numpy(dtype=np.int64)
+        self.edge_flows = edges['flows'].to_numpy(dtype=np.int64)
+        self.weight = weight
+        self._metrics = None
+
+        n = len(self.nodes)
+        self.flows = sparse.csr_matrix((self.edge_flows, (self.src, self.dst)), shape=(n, n))
+        self.bytes = sparse.csr_matrix((self.edge_bytes, (self.src, self.dst)), shape=(n, n))
+
+    @property
+    def node_count(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return len(self.src)
+
+    def pagerank(self, damping=PAGERANK_DAMPING, tol=PAGERANK_TOL, max_iter=PAGERANK_MAX_ITER):
+        """
+        加权PageRank（幂迭代），没有出边（或出边权为0）的节点把分值均分给全部节点
+
+        Returns:
+            (各节点的PageRank数组, 迭代次数)
+        """
+        n = self.node_count
+        if n == 0:
+            return np.zeros(0), 0
+        matrix = (self.bytes if self.weight == 'bytes' else self.flows).astype(np.float64)
+        out_weight = np.asarray(matrix.sum(axis=1)).ravel()
+        dangling = out_weight == 0
+        scale = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+        # 转置后的行归一化矩阵：rank_new = damping * transition.T @ rank + 均匀分配部分
+        transition_t = (sparse.diags(scale) @ matrix).T.tocsr()
+
+        rank = np.full(n, 1.0 / n)
+        for iteration in range(1, max_iter + 1):
+            updated = damping * (transition_t @ rank)
+            updated += (damping * rank[dangling].sum() + 1 - damping) / n
+            converged = np.abs(updated - rank).sum() < tol
+            rank = updated
+            if converged:
+                break
+        return rank, iteration
+
+    def components(self):
+        """
+        弱连通分量，按节点数从大到小编号（0为最大分量）
+
+        Returns:
+            (分量个数, 各节点的分量编号, 各分量的节点数)
+        """
+        count, labels = connected_components(self.flows, directed=True, connection='weak')
+        sizes = np.bincount(labels, minlength=count)
+        order = np.argsort(-sizes, kind='stable')
+        rank = np.empty(count, dtype=np.int64)
+        rank[order] = np.arange(count)
+        return count, rank[labels], sizes[order]
+
+    def node_metrics(self):
+        """
+        各节点的度量，首次调用时计算并缓存
+
+        Returns:
+            DataFrame，索引为uint32 IP；列degree（不区分方向的邻居数）、fan_out（不同目的IP数）、
+            fan_in（不同源IP数）、bytes_out/bytes_in、flows_out/flows_in、pagerank与component
+        """
+        if self._metrics is not None:
+            return self._metrics
+        pattern = (self.flows != 0).astype(np.int8)
+        undirected = ((pattern + pattern.T) != 0).tocsr()
+        rank, _ = self.pagerank()
+        _, labels, _ = self.components()
+        metrics = pd.DataFrame({
+            'degree': np.diff(undirected.indptr),
+            'fan_out': np.diff(pattern.indptr),
+            'fan_in': np.diff(pattern.tocsc().indptr),
+            'bytes_out': np.asarray(self.bytes.sum(axis=1)).ravel(),
+            'bytes_in': np.asarray(self.bytes.sum(axis=0)).ravel(),
+            'flows_out': np.asarray(self.flows.sum(axis=1)).ravel(),
+            'flows_in': np.asarray(self.flows.sum(axis=0)).ravel(),
+            'pagerank': rank,
+            'component': labels,
+        }, index=pd.Index(self.nodes, name='ip'))
+        self._metrics = metrics
+        return metrics
+
+    def subgraph(self, top_nodes=TOP_NODES, top_links=TOP_LINKS):
+        """
+        按PageRank剪枝的子图：PageRank最高的top_nodes个节点之间流量（或连接数）最大的top_links条边
+
+        Returns:
+            (节点度量DataFrame, 边DataFrame[sip, dip, bytes, flows])，IP均为uint32
+        """
+        kept = self.node_metrics().nlargest(top_nodes, 'pagerank')
+        keep_mask = np.zeros(self.node_count, dtype=bool)
+        keep_mask[np.searchsorted(self.nodes, kept.index.to_numpy())] = True
+        inside = keep_mask[self.src] & keep_mask[self.dst]
+        links = pd.DataFrame({
+            'sip': self.nodes[self.src[inside]],
+            'dip': self.nodes[self.dst[inside]],
+            'bytes': self.edge_bytes[inside],
+            'flows': self.edge_flows[inside],
+        })
+        links = links.nlargest(top_links, self.weight).reset_index(drop=True)
+        return kept, links
@@ -0,0 +1,129 @@
+"""
+网络监测数据分析与可视化 - tcpLog聚合内核
+对一块tcpLog数据只扫描一次流量列：用一次np.bincount得到 日期×小时×协议×源IP/24子网 的
+OLAP立方体（见olap_cube），再从立方体上卷得到各维边际；
+源IP与(源IP, 目的IP)边各用一次bincount，最大流量连接用argpartition选出
+"""
+
+import numpy as np
+import pandas as pd
+
+from ip_index import subnet_of
+from olap_cube import COUNT, Cube, time_dims
+from traffic_graph import edge_counts
+
+
+def _top_positions(values, k):
+    """
+    取最大的k个值的位置，并列时靠前的优先（与DataFrame.nlargest(keep='first')一致）
+    """
+    n = len(values)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if n > k:
+        threshold = np.partition(values, n - k)[n - k]
+        candidates = np.flatnonzero(values >= threshold)
+    else:
+        candidates = np.arange(n)
+    order = np.argsort(-values[candidates], kind='stable')
+    return candidates[order[:k]]
+
+
+def traffic_cube(df, traffic):
+    """
+    tcpLog的 日期×小时×协议×源IP/24子网 立方体
+
+    Args:
+        df: tcpLog数据
+        traffic: 每条连接的流量（上行+下行）
+
+    Returns:
+        Cube，度量为traffic（流量和）与count（连接数）；时间缺失的记录日期与小时为NaT/NaN
+    """
+    if 'stime' in df.columns:
+        stime = df['stime'].to_numpy(dtype='datetime64[ns]')
+    else:
+        stime = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+    days, hours = time_dims(stime)
+    return Cube.build({
+        'date': days,
+        'hour': hours,
+        'proto': df['proto'],
+        'subnet': subnet_of(df['sip'], 24),
+    }, {'traffic': traffic})
+
+
+def cube_marginals(cube, has_time=True):
+    """
+    从流量立方体上卷得到按协议、小时、日期的汇总
+
+    Returns:
+        dict: proto_traffic(sum/count), hourly_traffic, daily_traffic；
+              has_time为False（无stime列）时hourly_traffic与daily_traffic为None
+    """
+    proto = cube.rollup('proto').frame()
+    proto_traffic = pd.DataFrame({'sum': proto['traffic'], 'count': proto[COUNT]},
+                                 index=pd.Index(proto.index.astype(object), name='proto'))
+    if not has_time:
+        return {'proto_traffic': proto_traffic, 'hourly_traffic': None, 'daily_traffic': None}
+
+    hourly = cube.rollup('hour').frame()['traffic']
+    hourly.index = pd.Index(hourly.index.astype(np.int64), name='hour')
+    daily = cube.rollup('date').frame()['traffic']
+    daily.index = pd.Index(np.asarray(daily.index.date, dtype=object), name='date')
+    return {'proto_traffic': proto_traffic, 'hourly_traffic': hourly, 'daily_traffic': daily}
+
+
+def aggregate_traffic(df, top_flows=100, quantile=None, quantile_sketch=None):
+    """
+    计算一块tcpLog数据的全部流量统计
+
+    Args:
+        df: 含uplink_length/downlink_length/proto/sip/dip/stime列的tcpLog数据
+        top_flows: 返回的最大流量连接条数
+        quantile: 需要计算的流量分位数（如0.99），None表示不计算
+        quantile_sketch: 近似模式下累积每条连接流量的QuantileSketch
+
+    Returns:
+        dict: total_traffic, cube（见traffic_cube）, proto_traffic(sum/count), hourly_traffic, daily_traffic,
+              ip_traffic, edges（见traffic_graph.edge_counts）, largest_flows，以及要求时的quantile_threshold与above_quantile；
+              无stime列时hourly_traffic与daily_traffic为None
+    """
+    # 缺失的长度计为0
+    traffic = (df['uplink_length'].to_numpy(dtype=np.int64, na_value=0)
+               + df['downlink_length'].to_numpy(dtype=np.int64, na_value=0))
+    weights = traffic.astype(np.float64)
+    result = {'total_traffic': int(traffic.sum())}
+
+    # 日期×小时×协议×源IP/24子网 立方体，一次bincount得到流量和与连接数，各维边际由上卷得到
+    cube = traffic_cube(df, traffic)
+    result['cube'] = cube
+    result.update(cube_marginals(cube, has_time='stime' in df.columns))
+
+    # 源IP流量
+    sip_codes, sips = pd.factorize(df['sip'], sort=True)
+    valid_sip = sip_codes >= 0
+    ip_sum = np.bincount(sip_codes[valid_sip], weights=weights[valid_sip], minlength=len(sips))
+    result['ip_traffic'] = pd.Series(
+        ip_sum.astype(np.int64), index=pd.Index(np.asarray(sips), name='sip'), name='total_traffic'
+    )
+
+    # 按(源IP, 目的IP)汇总的边，用于流量图
+    result['edges'] = edge_counts(df['sip'].to_numpy(), df['dip'].to_numpy(), traffic)
+
+    # 最大流量连接
+    positions = _top_positions(traffic, top_flows)
+    result['largest_flows'] = pd.DataFrame({
+        'sip': df['sip'].to_numpy()[positions],
+        'dip': df['dip'].to_numpy()[positions],
+        'total_traffic': traffic[positions],
+    })
+
+    if quantile is not None:
+        threshold = np.quantile(traffic, quantile)
+        result['quantile_threshold'] = float(threshold)
+        result['above_quantile'] = int((traffic > threshold).sum())
+    if quantile_sketch is not None:
+        quantile_sketch.update(traffic)
+
+    return result
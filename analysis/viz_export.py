@@ -0,0 +1,162 @@
+"""
+网络监测数据分析与可视化 - 可视化数据导出模块
+分布预先分箱为直方图、时间序列按指定粒度降采样，每个图表的点数有上限，输出大小与日志行数无关；
+除JSON外可另外写出gzip压缩的JSON与每个图表一个Arrow IPC文件（前端可用apache-arrow直接读取类型化数组）
+"""
+
+import gzip
+import importlib.util
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# 可选的导出格式，json总是写出
+VIZ_FORMATS = ['json', 'gzip', 'arrow']
+
+# 时间序列的默认粒度
+DEFAULT_RESOLUTION = '1h'
+
+# 员工工作时长直方图的分箱边界（小时，左闭右开）
+WORK_HOURS_BINS = [0, 4, 6, 8, 10, 12, 14, 24]
+
+# 各图表的点数上限，超过时时间序列按整数倍放宽粒度，拓扑的边按流量截取
+CHART_BUDGETS = {
+    'daily_traffic': 366,
+    'traffic_timeline': 720,
+    'network_topology': 100,
+}
+
+
+def histogram(values, edges=WORK_HOURS_BINS):
+    """
+    将数值分箱计数
+
+    Args:
+        values: 数值数组，NaN不计入
+        edges: 递增的分箱边界，各箱左闭右开
+
+    Returns:
+        dict: edges（分箱边界）、counts（各箱计数）、outside（不在边界范围内的个数）
+    """
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    positions = np.searchsorted(edges, values, side='right') - 1
+    inside = (positions >= 0) & (positions < len(edges) - 1)
+    counts = np.bincount(positions[inside], minlength=len(edges) - 1)
+    return {
+        'edges': [float(edge) for edge in edges],
+        'counts': counts.tolist(),
+        'outside': int((~inside).sum()),
+    }
+
+
+def downsample(series, resolution, max_points):
+    """
+    时间序列按粒度分桶求和，桶数超过max_points时粒度按整数倍放宽；没有数据的桶不输出
+
+    Args:
+        series: 以时间（或日期）为索引的数值Series
+        resolution: 粒度，如'1h'、'1D'
+        max_points: 点数上限
+
+    Returns:
+        (以桶起始时间为索引的Series, 实际粒度Timedelta)
+    """
+    step = pd.Timedelta(resolution)
+    if len(series) == 0:
+        return series, step
+    index = pd.DatetimeIndex(pd.to_datetime(series.index))
+    start = index.min().floor(step)
+    buckets = np.asarray((index - start) // step, dtype=np.int64)
+    factor = max(1, math.ceil((buckets.max() + 1) / max_points))
+    width = step * factor
+    grouped = pd.Series(series.to_numpy()).groupby(buckets // factor).sum()
+    grouped.index = start + grouped.index.to_numpy() * width
+    return grouped, width
+
+
+def time_labels(index, width):
+    """桶起始时间的文本标签，按天及以上粒度时只保留日期"""
+    if width % pd.Timedelta('1D') == pd.Timedelta(0):
+        return [ts.strftime('%Y-%m-%d') for ts in index]
+    return [ts.strftime('%Y-%m-%d %H:%M') for ts in index]
+
+
+def topology(nodes, links):
+    """
+    流量子图转换为网络拓扑的节点与边
+
+    Args:
+        nodes: 以IP字符串为索引、含pagerank与component列的节点度量
+        links: 含sip/dip（字符串）、bytes与flows列的边
+
+    Returns:
+        dict: nodes与links（value为流量KB，flows为连接数）
+    """
+    return {
+        'nodes': [
+            {'id': ip, 'pagerank': float(row['pagerank']), 'component': int(row['component'])}
+            for ip, row in zip(nodes.index, nodes[['pagerank', 'component']].to_dict('records'))
+        ],
+        'links': pd.DataFrame({
+            'source': links['sip'].to_numpy(),
+            'target': links['dip'].to_numpy(),
+            'value': links['bytes'].to_numpy(dtype='float64') / 1024,
+            'flows': links['flows'].to_numpy(),
+        }).to_dict('records'),
+    }
+
+
+def chart_frame(name, chart):
+    """单个图表转换为列式DataFrame（用于Arrow导出）"""
+    if name == 'work_hours_distribution':
+        return pd.DataFrame({
+            'start': chart['edges'][:-1], 'end': chart['edges'][1:], 'count': chart['counts'],
+        })
+    if name == 'network_topology':
+        return pd.DataFrame(chart['links'], columns=['source', 'target', 'value', 'flows'])
+    if chart and all(isinstance(value, dict) for value in chart.values()):
+        # 如hourly_logins：{状态: {小时: 次数}}
+        frame = pd.DataFrame(chart).fillna(0)
+        frame.index = frame.index.astype(str)
+        return frame.rename_axis('label').reset_index()
+    return pd.DataFrame({'label': [str(label) for label in chart], 'value': list(chart.values())})
+
+
+def write_visualization(viz_data, output_dir, formats=('json',)):
+    """
+    写出可视化数据
+
+    Args:
+        viz_data: 图表名称 -> 图表数据
+        output_dir: 输出目录
+        formats: VIZ_FORMATS中的格式：json为visualization_data.json（紧凑格式），
+            gzip为visualization_data.json.gz，arrow为visualization/<图表>.arrow（需要pyarrow）
+
+    Returns:
+        dict: 格式 -> 写出的路径
+    """
+    text = json.dumps(viz_data, ensure_ascii=False, separators=(',', ':'), default=str)
+    paths = {'json': output_dir / 'visualization_data.json'}
+    with open(paths['json'], 'w', encoding='utf-8') as f:
+        f.write(text)
+
+    if 'gzip' in formats:
+        paths['gzip'] = output_dir / 'visualization_data.json.gz'
+        # mtime固定为0，相同数据生成相同文件，便于缓存与比对
+        with gzip.GzipFile(paths['gzip'], 'wb', mtime=0) as f:
+            f.write(text.encode('utf-8'))
+
+    if 'arrow' in formats:
+        if importlib.util.find_spec('pyarrow') is None:
+            print("未安装pyarrow，跳过Arrow格式的可视化数据")
+        else:
+            paths['arrow'] = output_dir / 'visualization'
+            paths['arrow'].mkdir(exist_ok=True)
+            for name, chart in viz_data.items():
+                chart_frame(name, chart).to_feather(paths['arrow'] / f'{name}.arrow')
+
+    return paths
@@ -0,0 +1,139 @@
+"""
+网络监测数据分析与可视化 - 时间窗口检测模块
+按(用户, 源IP, 目的IP)检测短时间内的集中事件（如登录失败、凌晨登录）：
+按键和时间排序后用searchsorted求出每个事件起始的窗口内事件数，全程向量化，不对每个用户循环
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# 暴力破解：同一(用户, 源IP, 目的IP)在窗口内登录失败超过阈值，失败次数超过BRUTE_FORCE_HIGH_THRESHOLD时为高危
+BRUTE_FORCE_WINDOW = pd.Timedelta(hours=6)
+BRUTE_FORCE_THRESHOLD = 10
+BRUTE_FORCE_HIGH_THRESHOLD = 20
+
+# 非工作时间活动：同一(用户, 源IP, 目的IP)在窗口内凌晨(0-6点)登录超过阈值
+NIGHT_WINDOW = pd.Timedelta(hours=1)
+NIGHT_THRESHOLD = 5
+
+# 检测的键
+BURST_KEYS = ['user', 'sip', 'dip']
+
+
+def window_label(window):
+    """时间窗口的中文描述，如'6小时'、'10分钟'"""
+    minutes = int(window.total_seconds() // 60)
+    if minutes % 60 == 0:
+        return f'{minutes // 60}小时'
+    return f'{minutes}分钟'
+
+
+def _window_counts(events, window, keys, time_col):
+    """
+    按(键, 时间)排序后求每个事件起始的窗口[t, t+window)内的事件数
+
+    Returns:
+        None（没有有效时间）或dict: valid（时间有效的行）、times、key_frame、codes（各有效行的键编号）、
+        seconds（各有效行的秒数）、order（排序）、ends（排序后每个窗口结束位置）、counts（排序后每个窗口的事件数）
+    """
+    times = events[time_col].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(times)
+    if not valid.any():
+        return None
+
+    key_frame = events.loc[valid, keys]
+    codes = key_frame.groupby(keys, sort=True, observed=True).ngroup().to_numpy()
+    seconds = times[valid].astype('datetime64[s]').astype(np.int64)
+
+    # 组合键：不同键之间相隔超过时间跨度与窗口之和，窗口不会跨键
+    window_seconds = int(window.total_seconds())
+    offsets = seconds - seconds.min()
+    span = int(offsets.max()) + window_seconds + 1
+    combined = codes.astype(np.int64) * span + offsets
+    order = np.argsort(combined, kind='stable')
+    combined = combined[order]
+
+    ends = np.searchsorted(combined, combined + window_seconds, side='left')
+    return {
+        'valid': valid, 'times': times[valid], 'key_frame': key_frame, 'codes': codes, 'seconds': seconds,
+        'order': order, 'ends': ends, 'counts': ends - np.arange(len(combined)),
+    }
+
+
+def compact_events(events, threshold, window, keys=BURST_KEYS, time_col='time'):
+    """
+    只保留之后的detect_bursts仍可能用到的事件
+
+    保留落在某个命中窗口（事件数超过threshold）内的事件，以及与这批事件的最早/最晚时间相距不到window的事件
+    （它们的窗口可能与之前或之后的事件相连）；其余事件所在的每个窗口都只含这批事件且未命中，删除后检测结果不变。
+    前提是之后合并的事件都不早于这批事件的最晚时间、之前的都不晚于最早时间（按天分区依次合并时成立）
+
+    Args:
+        events: 事件DataFrame，含keys与time_col列
+        threshold: 窗口内事件数阈值
+        window: 窗口长度（pd.Timedelta）
+
+    Returns:
+        DataFrame: 保留的事件，顺序不变
+    """
+    windows = _window_counts(events, window, keys, time_col)
+    if windows is None:
+        return events.iloc[:0]
+
+    # 命中窗口覆盖的事件：差分数组标记每个命中窗口[起点, 结束位置)
+    hits = np.flatnonzero(windows['counts'] > threshold)
+    marks = np.zeros(len(windows['order']) + 1, dtype=np.int64)
+    np.add.at(marks, hits, 1)
+    np.add.at(marks, windows['ends'][hits], -1)
+    covered = np.empty(len(windows['order']), dtype=bool)
+    covered[windows['order']] = np.cumsum(marks[:-1]) > 0
+
+    seconds = windows['seconds']
+    window_seconds = int(window.total_seconds())
+    near_edge = (seconds - window_seconds < seconds.min()) | (seconds + window_seconds > seconds.max())
+    return events.loc[windows['valid']].loc[covered | near_edge].reset_index(drop=True)
+
+
+def detect_bursts(events, threshold, window, keys=BURST_KEYS, time_col='time'):
+    """
+    找出同一键在任意长度为window的时间窗口内事件数超过threshold的时段
+
+    以每个事件为窗口起点，窗口内事件数 = searchsorted(起点时间 + window) - 起点位置；
+    同一键上相互重叠的命中窗口合并为一个时段
+
+    Args:
+        events: 事件DataFrame，含keys与time_col列
+        threshold: 窗口内事件数阈值（超过即命中）
+        window: 窗口长度（pd.Timedelta）
+        keys: 分组键列
+        time_col: 事件时间列
+
+    Returns:
+        DataFrame: keys + window_start, window_end（时段内首个与最后一个命中窗口所含事件的时间范围）,
+                   max_count（任一窗口内的最大事件数）, total_count（时段内事件数），按键排序
+    """
+    columns = keys + ['window_start', 'window_end', 'max_count', 'total_count']
+    windows = _window_counts(events, window, keys, time_col)
+    if windows is None:
+        return pd.DataFrame(columns=columns)
+
+    codes, order, ends, counts = windows['codes'], windows['order'], windows['ends'], windows['counts']
+    hits = np.flatnonzero(counts > threshold)
+    if len(hits) == 0:
+        return pd.DataFrame(columns=columns)
+
+    # 同一键上起点不晚于前一命中窗口最后事件的命中合并为一个时段
+    last = ends[hits] - 1
+    new_burst = np.ones(len(hits), dtype=bool)
+    new_burst[1:] = (codes[order][hits[1:]] != codes[order][hits[:-1]]) | (hits[1:] > last[:-1])
+
+    sorted_times = windows['times'][order]
+    first_hit = hits[new_burst]
+    last_event = np.maximum.reduceat(last, np.flatnonzero(new_burst))
+    result = windows['key_frame'].iloc[order[first_hit]].reset_index(drop=True)
+    result['window_start'] = sorted_times[first_hit]
+    result['window_end'] = sorted_times[last_event]
+    result['max_count'] = np.maximum.reduceat(counts[hits], np.flatnonzero(new_burst))
+    result['total_count'] = last_event - first_hit + 1
+    return result[columns]
@@ -7,11 +7,14 @@ const EmployeeBehaviorChart = ({ data }) => {
   if (!data) return <div>暂无数据</div>
 
   const getWorkHoursOption = () => {
-    // 计算工作时长分布
-    const bins = [0, 4, 6, 8, 10, 12, 14]
+    // 计算工作时长分布：分析输出为已分箱的直方图 {edges, counts}，也兼容原始时长数组
+    const histogram = data.workHours && !Array.isArray(data.workHours) ? data.workHours : null
+    const bins = histogram ? histogram.edges : [0, 4, 6, 8, 10, 12, 14]
     const distribution = bins.slice(0, -1).map((bin, idx) => {
       const nextBin = bins[idx + 1]
-      const count = data.workHours?.filter(h => h >= bin && h < nextBin).length || 0
+      const count = histogram
+        ? histogram.counts[idx]
+        : data.workHours?.filter(h => h >= bin && h < nextBin).length || 0
       return {
         name: `${bin}-${nextBin}小时`,
         value: count